@@ -0,0 +1,102 @@
+# ------------------------------------------------------------
+# Benchmark: scoring ของ recommend_foods (before / after)
+# ------------------------------------------------------------
+# legacy  - vectorizer.transform(history) + cosine_similarity + วน np.argsort ทั้ง catalog ใน Python
+#           (เช็ค name in list และเทียบ calories ทีละแถว)
+# current - FoodIndex: profile จากแถวที่คำนวณไว้แล้ว + mask + argpartition
+#
+# ใช้ catalog สังเคราะห์ (ไม่ต้องมีฐานข้อมูล) และตรวจว่าผลลัพธ์สองแบบตรงกัน
+#
+# ตัวอย่าง:
+#   python recommend_scoring_benchmark.py --foods 100000 --history 30 --iterations 50
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from flask_app.food_index import FoodIndex  # noqa: E402
+
+THAI_CHARS = "กขคงจฉชซญดตถทนบปผพฟมยรลวสหอะาิีึืุูเแโใไ่้๊๋็์ "
+
+
+def synthetic_foods(n, seed):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        names.add("".join(rng.choice(THAI_CHARS) for _ in range(rng.randint(6, 20))).strip())
+    return [{'food_id': i + 1, 'food_name': name, 'calories': rng.randint(50, 900)}
+            for i, name in enumerate(sorted(names))]
+
+
+def legacy_recommend(index, history, remaining, top_n):
+    user_profile = np.asarray(index.vectorizer.transform(history).mean(axis=0))
+    similarities = cosine_similarity(user_profile, index.matrix).flatten()
+    result = []
+    for idx in np.argsort(similarities)[::-1]:
+        food = index.foods[idx]
+        if food['food_name'] in history or food['calories'] > remaining:
+            continue
+        result.append(food['food_id'])
+        if len(result) >= top_n:
+            break
+    return result
+
+
+def current_recommend(index, history, remaining, top_n):
+    rows, unknown = index.rows_for_names(history)
+    scores = index.similarities(index.profile(rows, unknown))
+    return [int(index.ids[row]) for row, _ in
+            index.top_foods(scores, top_n, exclude_rows=rows, max_calories=remaining)]
+
+
+def run(name, fn, index, users, args):
+    latencies = []
+    results = []
+    for history, remaining in users:
+        started = time.perf_counter()
+        results.append(fn(index, history, remaining, args.top_n))
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    n = len(latencies)
+    print(f"{name:8s} p50 = {statistics.median(latencies):8.3f} ms  "
+          f"p99 = {latencies[min(n - 1, int(n * 0.99))]:8.3f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recommend_foods scoring")
+    parser.add_argument("--foods", type=int, default=100000)
+    parser.add_argument("--history", type=int, default=30)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    foods = synthetic_foods(args.foods, args.seed)
+    started = time.perf_counter()
+    index = FoodIndex.build("synthetic", foods)
+    print(f"index: {index.matrix.shape[0]} foods x {index.matrix.shape[1]} features, "
+          f"nnz = {index.matrix.nnz}, build = {time.perf_counter() - started:.2f}s")
+
+    rng = random.Random(args.seed + 1)
+    users = [([food['food_name'] for food in rng.sample(foods, args.history)], rng.randint(200, 1500))
+             for _ in range(args.iterations)]
+
+    legacy = run("legacy", legacy_recommend, index, users, args)
+    current = run("current", current_recommend, index, users, args)
+    mismatches = sum(1 for a, b in zip(legacy, current) if a != b)
+    print(f"result mismatches: {mismatches}/{len(users)}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+# ------------------------------------------------------------
+# Benchmark: save_meal_to_db round trips + latency (before / after)
+# ------------------------------------------------------------
+# legacy  - ขั้นตอนเดิม: validate user (connection 1), validate food (connection 2),
+#           insert (connection 3, START TRANSACTION + commit), recompute calories
+#           SELECT SUM + UPDATE (connection 4, commit แยก)
+# current - save_meal_to_db ปัจจุบัน (connection เดียว transaction เดียว)
+#
+# นับ round trip ทุกคำสั่งที่ส่งถึง MySQL (execute, commit, rollback, START TRANSACTION, ping)
+# และจำนวน connection ที่ยืมจาก pool / เปิดใหม่
+# ต้องมีฐานข้อมูลจริง (.env) พร้อม user ที่มีแถว DailyCalories ของวันนี้ และ food_id ที่มีอยู่
+# ** สคริปต์นี้เขียนข้อมูลจริงลง Meals/MealDetails/AIAnalysis **
+#
+# ตัวอย่าง:
+#   python save_meal_benchmark.py --user-id 1 --food-id 1 --iterations 200
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from flask_app import db_pool  # noqa: E402
+from flask_app import food_detect  # noqa: E402
+from flask_app.db_pool import get_pool  # noqa: E402
+
+
+class RoundTripCounter:
+    def __init__(self):
+        self.round_trips = 0
+        self.acquires = 0
+        self.connects = 0
+
+    def reset(self):
+        self.round_trips = self.acquires = self.connects = 0
+
+
+counter = RoundTripCounter()
+
+
+class CountingCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, *args, **kwargs):
+        counter.round_trips += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        # mysql-connector รวม INSERT ... VALUES เป็น statement เดียว
+        counter.round_trips += 1
+        return self._cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class CountingConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._conn.cursor(*args, **kwargs))
+
+    def _counted(self, name, *args, **kwargs):
+        counter.round_trips += 1
+        return getattr(self._conn, name)(*args, **kwargs)
+
+    def commit(self):
+        return self._counted('commit')
+
+    def rollback(self):
+        return self._counted('rollback')
+
+    def start_transaction(self, *args, **kwargs):
+        return self._counted('start_transaction', *args, **kwargs)
+
+    def ping(self, *args, **kwargs):
+        return self._counted('ping', *args, **kwargs)
+
+    def is_connected(self):
+        return self._counted('is_connected')
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def install_counters():
+    pool = get_pool()
+    connect = pool._connect
+    acquire = pool.acquire
+
+    def counting_connect():
+        counter.connects += 1
+        return CountingConnection(connect())
+
+    def counting_acquire(timeout=None):
+        counter.acquires += 1
+        return acquire(timeout)
+
+    pool._connect = counting_connect
+    pool.acquire = counting_acquire
+
+
+# ============================================
+# ขั้นตอนเดิม (ก่อนรวมเป็น transaction เดียว)
+# ============================================
+def legacy_save_meal(user_id, food_id, confidence_score):
+    with db_pool.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM users WHERE user_id = %s", (user_id,))
+        assert cur.fetchone() is not None
+        cur.close()
+
+    with db_pool.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM Foods WHERE food_id = %s", (food_id,))
+        assert cur.fetchone() is not None
+        cur.close()
+
+    with db_pool.get_connection() as conn:
+        cur = conn.cursor()
+        conn.start_transaction()
+        cur.execute("""
+            INSERT INTO Meals (user_id, date)
+            VALUES (%s, CURDATE())
+            ON DUPLICATE KEY UPDATE meal_id = LAST_INSERT_ID(meal_id)
+        """, (user_id,))
+        meal_id = cur.lastrowid
+        cur.execute("""
+            INSERT INTO MealDetails (meal_id, food_id, meal_time)
+            VALUES (%s, %s, CURTIME())
+        """, (meal_id, food_id))
+        cur.execute("""
+            INSERT INTO AIAnalysis (user_id, food_id, confidence_score)
+            VALUES (%s, %s, %s)
+        """, (user_id, food_id, confidence_score))
+        conn.commit()
+        cur.close()
+
+    with db_pool.get_connection() as conn:
+        cur = conn.cursor(dictionary=True)
+        cur.execute("""
+            SELECT SUM(f.calories) AS totalCalories
+            FROM Meals m
+            JOIN MealDetails md ON m.meal_id = md.meal_id
+            JOIN Foods f ON md.food_id = f.food_id
+            WHERE m.user_id = %s AND m.date = CURDATE()
+        """, (user_id,))
+        total = cur.fetchone()['totalCalories'] or 0
+        cur.execute("""
+            UPDATE DailyCalories
+            SET consumed_calories = %s
+            WHERE user_id = %s AND date = CURDATE()
+        """, (total, user_id))
+        conn.commit()
+        cur.close()
+
+
+def current_save_meal(user_id, food_id, confidence_score):
+    result = food_detect.save_meal_to_db(user_id, {'food_id': food_id, 'confidence_score': confidence_score})
+    assert result.get('success'), result
+
+
+def run(name, fn, args):
+    for _ in range(args.warmup):
+        fn(args.user_id, args.food_id, 0.9)
+
+    counter.reset()
+    latencies = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        fn(args.user_id, args.food_id, 0.9)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    n = args.iterations
+    print(f"{name:8s} round trips/save = {counter.round_trips / n:5.2f}  "
+          f"pool acquires/save = {counter.acquires / n:4.2f}  "
+          f"new connections = {counter.connects}  "
+          f"p50 = {statistics.median(latencies):7.2f} ms  "
+          f"p99 = {latencies[min(n - 1, int(n * 0.99))]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark save_meal_to_db round trips and latency")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--food-id", type=int, required=True)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    args = parser.parse_args()
+
+    install_counters()
+    run("legacy", legacy_save_meal, args)
+    run("current", current_save_meal, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# ------------------------------------------------------------
+# Benchmark: sport KNN แบบ exact (SportMatrix.neighbors) เทียบกับ ANN (SportAnnIndex)
+# ------------------------------------------------------------
+# ใช้ผู้ใช้สังเคราะห์ (ไม่ต้องมีฐานข้อมูล) รายงาน recall@k และ latency ของแต่ละค่า tables/bits/probes
+# ตรวจด้วยว่า save/load และ with_updates (ผู้ใช้ใหม่ + ผู้ใช้ที่เพิ่มกีฬา) ให้ผลเท่ากับ build ใหม่
+# ข้อมูลจริงใช้ python -m flask_app.sport_ann evaluate
+#
+# ตัวอย่าง:
+#   python sport_ann_benchmark.py --users 1000000 --sample 200 --grid 8x12,12x14 --probes 0,1,2
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from flask_app.sport_matrix import SportMatrix  # noqa: E402
+from flask_app.sport_ann import SportAnnIndex, evaluate_recall  # noqa: E402
+from sport_recommend_benchmark import synthetic_pairs  # noqa: E402
+
+
+def check_updates(matrix, pairs, names, args):
+    """index ที่ update แบบ incremental + save/load ต้องได้ candidate เท่ากับ build จาก matrix ล่าสุด"""
+    rng = random.Random(args.seed + 3)
+    extra = [(args.users + i, rng.randint(1, args.sports)) for i in range(1, 201)]
+    extra += [(rng.randint(1, args.users), rng.randint(1, args.sports)) for _ in range(200)]
+    updated_matrix = matrix.apply(extra, {}, watermark=matrix.watermark + len(extra))
+
+    index = SportAnnIndex.build(matrix, 8, 12, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "sport_ann_index.npz"
+        index.save(path)
+        index = SportAnnIndex.load(path)
+    index = index.with_updates(updated_matrix, {user_id for user_id, _ in extra}, updated_matrix.watermark)
+
+    # idf ที่ใช้ hash ตรึงไว้ตอน build จึงเทียบกับ index ที่ hash ทุกคนด้วย idf ชุดเดิม
+    fresh = SportAnnIndex(8, 12, args.seed, index.idf, updated_matrix.user_ids,
+                          index.hash_rows(updated_matrix, np.arange(len(updated_matrix.user_ids))),
+                          updated_matrix.watermark, None)
+    rows = rng.sample(range(len(updated_matrix.user_ids)), 200)
+    for row in rows:
+        codes = fresh.hash_rows(updated_matrix, [row])[0]
+        if not np.array_equal(index.candidates(codes, 1, 10 ** 9), fresh.candidates(codes, 1, 10 ** 9)):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sport ANN index")
+    parser.add_argument("--users", type=int, default=300000)
+    parser.add_argument("--sports", type=int, default=60)
+    parser.add_argument("--sample", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--grid", default="8x12,12x14", help="tables x bits คั่นด้วย ,")
+    parser.add_argument("--probes", default="0,1,2")
+    parser.add_argument("--max-candidates", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pairs = synthetic_pairs(args.users, args.sports, args.seed)
+    names = {sport_id: f"กีฬา{sport_id}" for sport_id in range(1, args.sports + 1)}
+    matrix = SportMatrix.build(pairs, names, watermark=len(pairs))
+    print(f"matrix: {len(matrix.user_ids)} users x {len(matrix.sport_ids)} sports, nnz = {matrix.by_user.nnz}")
+
+    print(f"incremental update + save/load == rebuild: {check_updates(matrix, pairs, names, args)}")
+
+    rows = random.Random(args.seed + 1).sample(range(len(matrix.user_ids)), args.sample)
+    for spec in args.grid.split(','):
+        tables, bits = (int(value) for value in spec.split('x'))
+        started = time.perf_counter()
+        index = SportAnnIndex.build(matrix, tables, bits, args.seed)
+        print(f"\n{tables} tables x {bits} bits: build = {time.perf_counter() - started:.2f}s")
+        for probes in (int(value) for value in args.probes.split(',')):
+            print(evaluate_recall(matrix, index, rows, args.k, probes, args.max_candidates))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# ------------------------------------------------------------
+# Benchmark: sport recommend แบบ item-item (SportItemModel) เทียบกับ user KNN (SportMatrix)
+# ------------------------------------------------------------
+# ตรวจว่า (1) count ที่บวกแบบ incremental (cooccurrence_increments เป็นช่วง ๆ) เท่ากับนับทั้งหมดทีเดียว
+# และ (2) similarity ใน neighbor_lists ตรงกับ cosine ของคอลัมน์กีฬาในเมทริกซ์ผู้ใช้ x กีฬา
+# แล้ววัด latency ต่อ request ของทั้งสอง engine (item ไม่ขึ้นกับจำนวนผู้ใช้)
+#
+# ตัวอย่าง:
+#   python sport_item_benchmark.py --users 1000000 --iterations 200
+
+import argparse
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from flask_app.sport_matrix import SportMatrix  # noqa: E402
+from flask_app.sport_item import (  # noqa: E402
+    SportItemModel, cooccurrence_counts, cooccurrence_increments, neighbor_lists,
+)
+from sport_recommend_benchmark import synthetic_pairs, timed  # noqa: E402
+
+
+def check_incremental(pairs, steps=5):
+    """แบ่ง pairs เป็นช่วง (เหมือน watermark) แล้วบวก count ทีละช่วง รวมคู่ซ้ำกับที่เคยเห็นด้วย"""
+    rng = random.Random(1)
+    shuffled = pairs[:]
+    rng.shuffle(shuffled)
+    step = max(1, len(shuffled) // steps)
+    counts = {}
+    for start in range(0, len(shuffled), step):
+        seen = shuffled[:start]
+        window = shuffled[start:start + step] + rng.sample(seen, min(len(seen), 100))
+        users = {user_id for user_id, _ in window}
+        old = [(user_id, sport_id) for user_id, sport_id in seen if user_id in users]
+        for key, n in cooccurrence_increments(old, window).items():
+            counts[key] = counts.get(key, 0) + n
+    return counts == cooccurrence_counts(pairs)
+
+
+def check_similarities(matrix, lists):
+    columns = matrix.by_sport.toarray()
+    norms = np.linalg.norm(columns, axis=1)
+    worst = 0.0
+    for sport_id, items in lists.items():
+        a = matrix.sport_col[sport_id]
+        for neighbor, score in items:
+            b = matrix.sport_col[neighbor]
+            worst = max(worst, abs(columns[a] @ columns[b] / (norms[a] * norms[b]) - score))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark item-item sport recommendations")
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--sports", type=int, default=60)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--top-m", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pairs = synthetic_pairs(args.users, args.sports, args.seed)
+    names = {sport_id: f"กีฬา{sport_id}" for sport_id in range(1, args.sports + 1)}
+    matrix = SportMatrix.build(pairs, names, watermark=len(pairs))
+    lists = neighbor_lists(cooccurrence_counts(pairs), args.top_m)
+    model = SportItemModel({sport_id: tuple(items) for sport_id, items in lists.items()}, None, None)
+
+    ok_incremental = check_incremental(synthetic_pairs(5000, args.sports, args.seed + 1))
+    small = SportMatrix.build(pairs[:20000], names, 0)
+    worst = check_similarities(small, neighbor_lists(cooccurrence_counts(pairs[:20000]), args.top_m))
+    print(f"incremental counts == full count: {ok_incremental}, max |score - column cosine| = {worst:.2e}")
+
+    rng = random.Random(args.seed + 1)
+    targets = [rng.randint(1, args.users) for _ in range(args.iterations)]
+    p50, p99 = timed(matrix.recommend, [(u, args.top_n, 5) for u in targets])
+    print(f"knn   p50 = {p50:9.3f} ms  p99 = {p99:9.3f} ms")
+    p50, p99 = timed(model.recommend, [(matrix, u, args.top_n) for u in targets])
+    print(f"item  p50 = {p50:9.3f} ms  p99 = {p99:9.3f} ms")
+    return 0 if ok_incremental and worst < 1e-6 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
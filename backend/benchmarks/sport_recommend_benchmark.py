@@ -0,0 +1,137 @@
+# ------------------------------------------------------------
+# Benchmark: recommend_sports (before / after)
+# ------------------------------------------------------------
+# legacy  - ต่อชื่อกีฬาของทุกผู้ใช้เป็น string แล้ว fit TfidfVectorizer ใหม่ + cosine_similarity ทุก request
+#           (ไม่นับเวลา query ทั้งตารางที่ legacy ทำเพิ่มอีกหนึ่งครั้งต่อ request)
+# current - SportMatrix: sparse row x matrix (กีฬา x ผู้ใช้) ครั้งเดียว
+#
+# ตรวจด้วยว่า (1) matrix ที่สร้างแบบ incremental (build + apply เป็นช่วง ๆ) เท่ากับ build ทีเดียว
+# และ (2) similarity ตรงกับ cosine ของ dense matrix (b * idf) ที่คำนวณตรง ๆ
+#
+# ตัวอย่าง:
+#   python sport_recommend_benchmark.py --users 100000 --sports 60 --iterations 50
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from flask_app.sport_matrix import SportMatrix  # noqa: E402
+
+
+def synthetic_pairs(users, sports, seed):
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(sports)]  # กีฬายอดนิยมมีคนเล่นมากกว่า
+    pairs = []
+    for user_id in range(1, users + 1):
+        played = set(rng.choices(range(1, sports + 1), weights=weights, k=rng.randint(1, 6)))
+        pairs.extend((user_id, sport_id) for sport_id in sorted(played))
+    return pairs
+
+
+def legacy_recommend(profiles, user_id, top_n, k_neighbors):
+    user_ids = list(profiles.keys())
+    texts = [' '.join(profiles[uid]) for uid in user_ids]
+    matrix = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4)).fit_transform(texts)
+    target = user_ids.index(user_id)
+    similarities = cosine_similarity(matrix[target], matrix).flatten()
+    k_neighbors = min(k_neighbors, len(user_ids) - 1)
+    counts = {}
+    for idx in np.argsort(-similarities)[1:k_neighbors + 1]:
+        for sport in profiles[user_ids[idx]]:
+            if sport not in profiles[user_id]:
+                counts[sport] = counts.get(sport, 0) + 1
+    return [name for name, _ in sorted(counts.items(), key=lambda x: x[1], reverse=True)[:top_n]]
+
+
+def check_incremental(pairs, names):
+    full = SportMatrix.build(pairs, names, watermark=len(pairs))
+    step = max(1, len(pairs) // 5)
+    incremental = SportMatrix.build(pairs[:step], names, watermark=step)
+    for start in range(step, len(pairs), step):
+        # ส่งคู่ซ้ำกับที่มีอยู่ด้วย (DISTINCT ต่อช่วง watermark ไม่กันคู่ที่เคยเห็นแล้ว)
+        incremental = incremental.apply(pairs[start - 1:start + step], {}, watermark=start + step)
+
+    order = [incremental.user_row[user_id] for user_id in full.user_ids]
+    cols = [incremental.sport_col[sport_id] for sport_id in full.sport_ids]
+    same_matrix = (incremental.by_user[order][:, cols] != full.by_user).nnz == 0
+    same_df = np.array_equal(incremental.df[cols], full.df)
+    return same_matrix and same_df
+
+
+def check_similarities(matrix, rows):
+    dense = matrix.by_user.toarray() * np.sqrt(matrix.idf_sq)
+    worst = 0.0
+    for row in rows:
+        expected = cosine_similarity(dense[row:row + 1], dense).ravel()
+        for neighbor, sim in matrix.neighbors(row, 10):
+            worst = max(worst, abs(expected[neighbor] - sim))
+        top = np.sort(np.delete(expected, row))[::-1][:10]
+        got = sorted((sim for _, sim in matrix.neighbors(row, 10)), reverse=True)
+        worst = max(worst, max((abs(a - b) for a, b in zip(top, got)), default=0.0))
+    return worst
+
+
+def timed(fn, args_list):
+    latencies = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recommend_sports")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--sports", type=int, default=60)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--k-neighbors", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    pairs = synthetic_pairs(args.users, args.sports, args.seed)
+    names = {sport_id: f"กีฬา{sport_id}" for sport_id in range(1, args.sports + 1)}
+
+    started = time.perf_counter()
+    matrix = SportMatrix.build(pairs, names, watermark=len(pairs))
+    print(f"matrix: {len(matrix.user_ids)} users x {len(matrix.sport_ids)} sports, "
+          f"nnz = {matrix.by_user.nnz}, build = {time.perf_counter() - started:.2f}s")
+
+    new_pairs = synthetic_pairs(200, args.sports, args.seed + 2)
+    new_pairs = [(user_id + args.users, sport_id) for user_id, sport_id in new_pairs]
+    started = time.perf_counter()
+    matrix.apply(new_pairs, {}, watermark=len(pairs) + len(new_pairs))
+    print(f"incremental apply of {len(new_pairs)} pairs = {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    ok_incremental = check_incremental(pairs[:20000], names)
+    worst = check_similarities(SportMatrix.build(pairs[:20000], names, 0), range(0, 2000, 97))
+    print(f"incremental == full build: {ok_incremental}, max |similarity - dense cosine| = {worst:.2e}")
+
+    rng = random.Random(args.seed + 1)
+    targets = [rng.randint(1, args.users) for _ in range(args.iterations)]
+
+    if not args.skip_legacy:
+        profiles = {}
+        for user_id, sport_id in pairs:
+            profiles.setdefault(user_id, []).append(names[sport_id])
+        p50, p99 = timed(legacy_recommend, [(profiles, u, args.top_n, args.k_neighbors) for u in targets])
+        print(f"legacy   p50 = {p50:9.3f} ms  p99 = {p99:9.3f} ms")
+    p50, p99 = timed(matrix.recommend, [(u, args.top_n, args.k_neighbors) for u in targets])
+    print(f"current  p50 = {p50:9.3f} ms  p99 = {p99:9.3f} ms")
+    return 0 if ok_incremental and worst < 1e-5 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,11 @@
-import mysql.connector
 from mysql.connector import Error
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from datetime import datetime
 from contextlib import contextmanager
 import logging
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+import sys
 
 # -----------------------------------------------------
 # Load environment variables
@@ -16,6 +13,12 @@ import os
 BASE_DIR = Path(__file__).resolve().parent.parent
 PROJECT_ROOT = BASE_DIR.parent
 load_dotenv(str(PROJECT_ROOT / '.env'))
+sys.path.insert(0, str(PROJECT_ROOT / 'src'))
+
+from flask_app.db_pool import get_pool
+from flask_app.food_catalog import food_catalog
+from flask_app.food_index import food_index
+from flask_app.food_history import food_history
 
 # -----------------------------------------------------
 # Logging setup
@@ -26,6 +29,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# -----------------------------------------------------
+# Batch recommendation config
+# -----------------------------------------------------
+# จำนวน user_id ต่อ query (WHERE user_id IN (...))
+RECOMMEND_BATCH_QUERY_CHUNK = int(os.getenv('RECOMMEND_BATCH_QUERY_CHUNK', '1000'))
+# จำนวนผู้ใช้ต่อ matrix product (คุมขนาด matrix ผู้ใช้ x อาหาร ในหน่วยความจำ)
+RECOMMEND_BATCH_SCORE_CHUNK = int(os.getenv('RECOMMEND_BATCH_SCORE_CHUNK', '256'))
+
+MSG_NO_HISTORY = 'ผู้ใช้ยังไม่มีประวัติการกิน'
+MSG_NO_CALORIES = 'ไม่พบข้อมูลแคลอรีหรือแคลอรีเหลือไม่เพียงพอ'
+MSG_NO_MATCH = 'ไม่พบอาหารที่เหมาะสม'
+MSG_SUCCESS = 'แนะนำอาหารสำเร็จ'
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _result(success, message, user_history=(), remaining_calories=0, recommendations=()):
+    return {
+        'success': success,
+        'message': message,
+        'user_history': list(user_history),
+        'remaining_calories': float(remaining_calories or 0),
+        'recommendations': list(recommendations)
+    }
+
+
+def _recommendation_result(index, user_history, remaining_calories, top):
+    """แปลง [(row, score), ...] จาก index เป็นผลลัพธ์ของ recommend_foods"""
+    recommendations = [{
+        'food_id': index.foods[row]['food_id'],
+        'name': index.foods[row]['food_name'],
+        'calories': float(index.foods[row]['calories']),
+        'similarity_score': round(score, 4)
+    } for row, score in top]
+    if not recommendations:
+        return _result(False, MSG_NO_MATCH, user_history, remaining_calories)
+    return _result(True, MSG_SUCCESS, user_history, remaining_calories, recommendations)
+
 # -----------------------------------------------------
 # FoodRecommendationSystem
 # -----------------------------------------------------
@@ -42,75 +86,50 @@ class FoodRecommendationSystem:
             'database': database or os.getenv('DB_NAME', 'calories_app')
         }
         logger.info(f"Initializing DB connection to: {self.db_config['host']}/{self.db_config['database']}")
-        
-        self.vectorizer = None
-        self.food_vectors = None
-        self.food_data = None  # Cache ข้อมูลอาหาร
+        self.db_pool = get_pool(**self.db_config)
+
+        # TF-IDF index ของชื่ออาหาร (persist ลงไฟล์ + refresh ตาม version ของ Foods catalog)
+        self.food_index = food_index
+        # ประวัติอาหารรายผู้ใช้ (LRU, save path เขียนทับหลัง commit)
+        self.food_history = food_history
 
     # -------------------------------------------------
     # Database Connection
     # -------------------------------------------------
     @contextmanager
     def _get_connection(self):
-        """สร้าง connection กับ database แบบ context manager"""
-        conn = None
+        """ยืม connection จาก pool ที่ใช้ร่วมกัน แบบ context manager"""
         try:
-            conn = mysql.connector.connect(**self.db_config)
-            yield conn
+            with self.db_pool.connection() as conn:
+                yield conn
         except Error as e:
             logger.error(f"Database connection failed: {e}")
             raise RuntimeError("Database connection failed. Please try again later.")
-        finally:
-            if conn and conn.is_connected():
-                conn.close()
 
     # -------------------------------------------------
     # Data Retrieval
     # -------------------------------------------------
     def get_all_foods(self):
-        """ดึงข้อมูลอาหารทั้งหมดจากตาราง Foods"""
+        """ดึงข้อมูลอาหารทั้งหมดจาก Foods catalog cache (เรียงตาม food_name)"""
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor(dictionary=True)
-                cursor.execute("""
-                    SELECT food_id, food_name, calories
-                    FROM Foods
-                    ORDER BY food_name
-                """)
-                foods = cursor.fetchall()
-                cursor.close()
-                logger.info(f"Fetched {len(foods)} foods from database")
-                return foods
+            foods = food_catalog.all_foods()
+            logger.info(f"Fetched {len(foods)} foods from catalog")
+            return foods
         except Exception as e:
             logger.error(f"Error fetching foods: {e}")
             return []
 
     def get_user_food_history(self, user_id):
-        """ดึงประวัติอาหารของผู้ใช้ (ล่าสุดก่อน)"""
+        """ดึงประวัติอาหารของผู้ใช้ (ล่าสุดก่อน) จาก cache ประวัติรายผู้ใช้ (miss แล้วค่อย query)"""
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor(dictionary=True)
-                cursor.execute("""
-                    SELECT DISTINCT f.food_name, MAX(m.date) as latest_date
-                    FROM MealDetails md
-                    JOIN Meals m ON md.meal_id = m.meal_id
-                    JOIN Foods f ON md.food_id = f.food_id
-                    WHERE m.user_id = %s
-                    GROUP BY f.food_name
-                    ORDER BY latest_date DESC
-                """, (user_id,))
-                results = cursor.fetchall()
-                cursor.close()
-                
-                history = [row['food_name'] for row in results]
-                return history
+            return self.food_history.food_names(user_id)
         except Exception as e:
             logger.error(f"Error fetching user history (user_id={user_id}): {e}")
             return []
 
     def get_remaining_calories(self, user_id, date=None):
-        """ดึงแคลอรีที่เหลือของผู้ใช้ (วันปัจจุบัน)"""
-        date = datetime.now().strftime('%Y-%m-%d')
+        """ดึงแคลอรีที่เหลือของผู้ใช้ (วันที่ date, ค่าเริ่มต้นวันนี้)"""
+        date = date or datetime.now().strftime('%Y-%m-%d')
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor(dictionary=True)
@@ -134,97 +153,115 @@ class FoodRecommendationSystem:
     # -------------------------------------------------
     # Core Recommendation Logic
     # -------------------------------------------------
-    def _prepare_food_vectors(self):
-        """โหลดและแปลงชื่ออาหารเป็นเวกเตอร์ TF-IDF (char-level)"""
-        all_foods = self.get_all_foods()
-        if not all_foods:
-            raise RuntimeError("No food data found in database")
-
-        food_names = [food['food_name'] for food in all_foods]
-        self.vectorizer = TfidfVectorizer(
-            analyzer='char',
-            ngram_range=(1, 3),
-            lowercase=True,
-            strip_accents='unicode'
-        )
-        self.food_vectors = self.vectorizer.fit_transform(food_names)
-        self.food_data = all_foods
-        logger.info(f"Prepared {len(self.food_data)} food vectors")
-
     def recommend_foods(self, user_id, date=None, top_n=3):
         """แนะนำอาหารสำหรับผู้ใช้ตามประวัติและแคลอรีที่เหลือ"""
         try:
             user_history = self.get_user_food_history(user_id)
             if not user_history:
-                return {
-                    'success': False,
-                    'message': 'ผู้ใช้ยังไม่มีประวัติการกิน',
-                    'user_history': [],
-                    'remaining_calories': 0,
-                    'recommendations': []
-                }
+                return _result(False, MSG_NO_HISTORY)
 
             remaining_calories = self.get_remaining_calories(user_id, date)
             if remaining_calories is None or remaining_calories <= 0:
-                return {
-                    'success': False,
-                    'message': 'ไม่พบข้อมูลแคลอรีหรือแคลอรีเหลือไม่เพียงพอ',
-                    'user_history': user_history,
-                    'remaining_calories': float(remaining_calories or 0),
-                    'recommendations': []
-                }
-
-            if self.food_vectors is None or self.vectorizer is None:
-                self._prepare_food_vectors()
-
-            # สร้าง user profile vector จากอาหารที่เคยทาน
-            user_vec = self.vectorizer.transform(user_history)
-            user_profile = np.asarray(user_vec.mean(axis=0))
-
-            # คำนวณ cosine similarity
-            similarities = cosine_similarity(user_profile, self.food_vectors).flatten()
-
-            # เลือกอาหารแนะนำที่เหมาะสม
-            recommendations = []
-            for idx in np.argsort(similarities)[::-1]:
-                food = self.food_data[idx]
-                if food['food_name'] in user_history or food['calories'] > remaining_calories:
-                    continue
-                recommendations.append({
-                    'food_id': food['food_id'],
-                    'name': food['food_name'],
-                    'calories': float(food['calories']),
-                    'similarity_score': round(float(similarities[idx]), 4)
-                })
-                if len(recommendations) >= top_n:
-                    break
-
-            if not recommendations:
-                return {
-                    'success': False,
-                    'message': 'ไม่พบอาหารที่เหมาะสม',
-                    'user_history': user_history,
-                    'remaining_calories': float(remaining_calories),
-                    'recommendations': []
-                }
-
-            return {
-                'success': True,
-                'message': 'แนะนำอาหารสำเร็จ',
-                'user_history': user_history,
-                'remaining_calories': float(remaining_calories),
-                'recommendations': recommendations
-            }
+                return _result(False, MSG_NO_CALORIES, user_history, remaining_calories)
+
+            # ใช้ index ชุดเดียวตลอด request (refresher อาจสลับ index ใหม่เข้ามาระหว่างนี้)
+            index = self.food_index.get()
+
+            # user profile = mean ของแถวใน index ของอาหารที่เคยทาน (ไม่ต้อง tokenize ประวัติใหม่)
+            history_rows, unknown_names = index.rows_for_names(user_history)
+            similarities = index.similarities(index.profile(history_rows, unknown_names))
+
+            # ตัดอาหารที่เคยทานและเกินแคลอรีที่เหลือด้วย mask แล้วเลือก top_n ด้วย argpartition
+            top = index.top_foods(similarities, top_n, exclude_rows=history_rows,
+                                  max_calories=remaining_calories)
+            return _recommendation_result(index, user_history, remaining_calories, top)
 
         except Exception as e:
             logger.exception(f"Error in recommend_foods for user_id={user_id}: {e}")
-            return {
-                'success': False,
-                'message': f'เกิดข้อผิดพลาด: {str(e)}',
-                'user_history': [],
-                'remaining_calories': 0,
-                'recommendations': []
-            }
+            return _result(False, f'เกิดข้อผิดพลาด: {str(e)}')
+
+    # -------------------------------------------------
+    # Batch Recommendation (หลายผู้ใช้ในครั้งเดียว)
+    # -------------------------------------------------
+    def get_users_food_history(self, user_ids):
+        """ประวัติอาหารของหลายผู้ใช้ด้วย query แบบ set-based คืน {user_id: [food_name ล่าสุดก่อน]}"""
+        histories = {}
+        with self._get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            for chunk in _chunks(user_ids, RECOMMEND_BATCH_QUERY_CHUNK):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f"""
+                    SELECT m.user_id, f.food_name, MAX(m.date) AS latest_date
+                    FROM MealDetails md
+                    JOIN Meals m ON md.meal_id = m.meal_id
+                    JOIN Foods f ON md.food_id = f.food_id
+                    WHERE m.user_id IN ({placeholders})
+                    GROUP BY m.user_id, f.food_name
+                    ORDER BY m.user_id, latest_date DESC
+                """, tuple(chunk))
+                for row in cursor.fetchall():
+                    histories.setdefault(row['user_id'], []).append(row['food_name'])
+            cursor.close()
+        return histories
+
+    def get_users_remaining_calories(self, user_ids, date=None):
+        """แคลอรีที่เหลือของหลายผู้ใช้ (วันที่ date, ค่าเริ่มต้นวันนี้) คืน {user_id: remaining_calories}"""
+        date = date or datetime.now().strftime('%Y-%m-%d')
+        remaining = {}
+        with self._get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            for chunk in _chunks(user_ids, RECOMMEND_BATCH_QUERY_CHUNK):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f"""
+                    SELECT user_id, remaining_calories
+                    FROM DailyCalories
+                    WHERE date = %s AND user_id IN ({placeholders})
+                """, (date, *chunk))
+                for row in cursor.fetchall():
+                    remaining[row['user_id']] = row['remaining_calories']
+            cursor.close()
+        return remaining
+
+    def recommend_foods_batch(self, user_ids, date=None, top_n=3):
+        """
+        แนะนำอาหารให้หลายผู้ใช้ในครั้งเดียว (push campaign / batch job)
+        - ประวัติ + แคลอรีที่เหลือของทุกคนมาจาก query แบบ set-based ไม่ใช่สอง query ต่อคน
+        - ประวัติของผู้ใช้กลุ่มละ RECOMMEND_BATCH_SCORE_CHUNK คนเป็น sparse matrix ผู้ใช้ x อาหาร
+          similarity ของทั้งกลุ่มได้จาก matrix product ครั้งเดียว
+        - อาหารที่เคยทาน / เกินแคลอรีที่เหลือของแต่ละคนถูกตัดด้วย mask
+        คืน {user_id: ผลลัพธ์รูปแบบเดียวกับ recommend_foods} เรียงตาม user_ids
+        DB error จะ raise ออกไป (ไม่กลืนเป็นผลลัพธ์ว่างของทุกคน)
+        """
+        user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+        if not user_ids:
+            return {}
+        histories = self.get_users_food_history(user_ids)
+        remaining = self.get_users_remaining_calories(user_ids, date)
+
+        results = {}
+        eligible = []
+        for user_id in user_ids:
+            user_history = histories.get(user_id)
+            remaining_calories = remaining.get(user_id)
+            if not user_history:
+                results[user_id] = _result(False, MSG_NO_HISTORY)
+            elif remaining_calories is None or remaining_calories <= 0:
+                results[user_id] = _result(False, MSG_NO_CALORIES, user_history, remaining_calories)
+            else:
+                eligible.append(user_id)
+
+        if eligible:
+            index = self.food_index.get()
+            for chunk in _chunks(eligible, RECOMMEND_BATCH_SCORE_CHUNK):
+                history_matrix, profiles = index.history_matrix([histories[user_id] for user_id in chunk])
+                scores = index.batch_similarities(profiles)
+                tops = index.batch_top_foods(scores, top_n, history=history_matrix,
+                                             max_calories=[float(remaining[user_id]) for user_id in chunk])
+                for user_id, top in zip(chunk, tops):
+                    results[user_id] = _recommendation_result(index, histories[user_id], remaining[user_id], top)
+
+        logger.info(f"Batch food recommendation: {len(user_ids)} users, {len(eligible)} scored")
+        return {user_id: results[user_id] for user_id in user_ids}
 
 if __name__ == "__main__":
     print("🚀 Starting Food Recommendation System...")
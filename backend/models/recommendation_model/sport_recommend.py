@@ -1,17 +1,28 @@
 # File: backend/models/recommendation_model/sport_recommend.py
 # Purpose: Sport Recommendation System using KNN + Cosine Similarity
 # แนะนำกีฬาตามประวัติการออกกำลังกายของผู้ใช้ (รองรับภาษาไทย)
+# ใช้ sparse matrix ผู้ใช้ x กีฬา ที่อัปเดตแบบ incremental (flask_app.sport_matrix) แทนการ fit TF-IDF ทุก request
+# ผู้ใช้จำนวนมาก (>= SPORT_ANN_MIN_USERS) หา neighbor ผ่าน ANN index (flask_app.sport_ann) แทน exact KNN
+# engine='item' แนะนำจาก list กีฬาใกล้เคียงที่คำนวณไว้ล่วงหน้า (flask_app.sport_item) แทน KNN ของผู้ใช้
 
 import os
-import mysql.connector
-from datetime import datetime
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import sys
+from pathlib import Path
 import logging
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
+
+from flask_app.db_pool import get_pool
+from flask_app.sport_matrix import sport_matrix
+from flask_app.sport_ann import sport_ann
+from flask_app.sport_item import sport_item
+
 logger = logging.getLogger(__name__)
 
+ENGINE_KNN = 'knn'
+ENGINE_ITEM = 'item'
+ENGINES = (ENGINE_KNN, ENGINE_ITEM)
+
 
 class SportRecommendationSystem:
     """
@@ -21,162 +32,54 @@ class SportRecommendationSystem:
     """
 
     def __init__(self, host='localhost', user='root', password='', database='calories_app'):
-        """Initialize database connection และ TF-IDF vectorizer"""
+        """Initialize database connection และ matrix ผู้ใช้ x กีฬา ที่ใช้ร่วมกันทั้ง process"""
         self.host = host
         self.user = user
         self.password = password
         self.database = database
-
-        # TF-IDF vectorizer แบบ char-level สำหรับภาษาไทย
-        self.vectorizer = TfidfVectorizer(
-            analyzer='char_wb',   # เหมาะกับภาษาไทยที่ไม่มีช่องว่าง
-            ngram_range=(2, 4)    # 2-4 ตัวอักษร เพื่อจับคำยาว
-        )
-
-    def _get_connection(self):
-        """สร้าง connection กับฐานข้อมูล MySQL"""
-        try:
-            conn = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                charset='utf8mb4',      # รองรับภาษาไทย
-                collation='utf8mb4_general_ci'
-            )
-            return conn
-        except mysql.connector.Error as e:
-            logger.error(f"Database connection error: {e}")
-            raise
-
-    # ================================
-    # Data Retrieval
-    # ================================
-
-    def get_user_sport_history(self, user_id):
-        """ดึงรายชื่อกีฬาที่ผู้ใช้เคยทำ (เรียงตามความถี่)"""
-        try:
-            conn = self._get_connection()
-            cursor = conn.cursor(dictionary=True)
-
-            query = """
-            SELECT DISTINCT s.sport_id, s.sport_name, COUNT(*) as frequency
-            FROM Activity a
-            JOIN ActivityDetail ad ON a.activity_id = ad.activity_id
-            JOIN Sports s ON ad.sport_id = s.sport_id
-            WHERE a.user_id = %s
-            GROUP BY s.sport_id, s.sport_name
-            ORDER BY frequency DESC
-            """
-            cursor.execute(query, (user_id,))
-            results = cursor.fetchall()
-            cursor.close()
-            conn.close()
-
-            return [sport['sport_name'] for sport in results]
-
-        except Exception as e:
-            logger.error(f"Error getting sport history: {e}")
-            return []
-
-    def get_user_profiles(self):
-        """
-        ดึง user profile ของทุกคน
-        คืนค่า dict: {user_id: [sport_name1, sport_name2, ...]}
-        """
-        try:
-            conn = self._get_connection()
-            cursor = conn.cursor(dictionary=True)
-
-            query = """
-            SELECT DISTINCT a.user_id, s.sport_name
-            FROM Activity a
-            JOIN ActivityDetail ad ON a.activity_id = ad.activity_id
-            JOIN Sports s ON ad.sport_id = s.sport_id
-            ORDER BY a.user_id, s.sport_name
-            """
-            cursor.execute(query)
-            results = cursor.fetchall()
-            cursor.close()
-            conn.close()
-
-            user_profiles = {}
-            for row in results:
-                uid = row['user_id']
-                sport = row['sport_name']
-                user_profiles.setdefault(uid, []).append(sport)
-            return user_profiles
-
-        except Exception as e:
-            logger.error(f"Error getting user profiles: {e}")
-            return {}
+        self.db_pool = get_pool(host=host, user=user, password=password, database=database)
+        self.sport_matrix = sport_matrix
+        self.sport_ann = sport_ann
+        self.sport_item = sport_item
 
     # ================================
     # Recommendation Logic
     # ================================
 
-    def recommend_sports(self, user_id, top_n=3, k_neighbors=5):
+    def recommend_sports(self, user_id, top_n=3, k_neighbors=5, engine=ENGINE_KNN):
         """
         แนะนำกีฬาสำหรับผู้ใช้
-        - ใช้ประวัติของ user_id
-        - KNN + Cosine similarity กับ user profiles อื่น
+        - ใช้ประวัติของ user_id (แถวของผู้ใช้ใน matrix)
+        - engine='knn': KNN + Cosine similarity กับผู้ใช้อื่น (sparse row x matrix ครั้งเดียว)
+        - engine='item': รวม list กีฬาใกล้เคียงของกีฬาที่เคยเล่น (ไม่ใช้ k_neighbors)
         - คืนค่า top_n sports ใหม่ที่ยังไม่เคยทำ
         """
+        if engine not in ENGINES:
+            return {'success': False, 'error': f"Unknown engine: {engine}"}
         try:
-            # ดึงประวัติการออกกำลังกายของผู้ใช้
-            user_history = self.get_user_sport_history(user_id)
-            if not user_history:
-                return {
-                    'success': False,
-                    'message': 'ไม่พบประวัติการออกกำลังกายของผู้ใช้นี้'
-                }
-
-            # ดึง user profiles ของทุกคน
-            user_profiles = self.get_user_profiles()
-            if not user_profiles or user_id not in user_profiles:
-                return {
-                    'success': False,
-                    'message': 'ไม่สามารถดึงข้อมูลผู้ใช้สำหรับการแนะนำ'
-                }
-
-            user_ids = list(user_profiles.keys())
-            texts = [' '.join(user_profiles[uid]) for uid in user_ids]
-
-            # TF-IDF vectorization
-            tfidf_matrix = self.vectorizer.fit_transform(texts)
-
-            target_idx = user_ids.index(user_id)
-            similarities = cosine_similarity(tfidf_matrix[target_idx], tfidf_matrix).flatten()
-
-            # เลือก k_neighbors ที่ใกล้เคียงที่สุด
-            k_neighbors = min(k_neighbors, len(user_ids) - 1)
-            similar_indices = np.argsort(-similarities)[1:k_neighbors + 1]
-
-            # เก็บจำนวนครั้งที่กีฬาปรากฏใน neighbors
-            similar_sports = {}
-            for idx in similar_indices:
-                uid = user_ids[idx]
-                for sport in user_profiles[uid]:
-                    if sport not in user_history:
-                        similar_sports[sport] = similar_sports.get(sport, 0) + 1
-
-            if not similar_sports:
-                return {'success': False, 'message': 'ไม่มีกีฬาใหม่ที่แนะนำได้'}
-
-            # จัดอันดับและคืน top_n
-            recommendations = sorted(
-                similar_sports.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:top_n]
-
-            return {
-                'success': True,
-                'user_id': user_id,
-                'recommendations': [name for name, _ in recommendations],
-                'timestamp': datetime.now().isoformat()
-            }
+            matrix = self.sport_matrix.get_for_user(user_id)
+            if engine == ENGINE_ITEM:
+                return self.sport_item.get().recommend(matrix, user_id, top_n=top_n)
+            return matrix.recommend(user_id, top_n=top_n, k_neighbors=k_neighbors,
+                                    neighbor_index=self.sport_ann.get_for(matrix))
 
         except Exception as e:
             logger.error(f"Error in recommend_sports: {e}")
             return {'success': False, 'error': str(e)}
+
+    def recommend_sports_batch(self, user_ids, top_n=3, k_neighbors=5):
+        """
+        แนะนำกีฬาให้หลายผู้ใช้ (ใช้โดย job refresh ของ recommendation store)
+        ดึง activity ใหม่เข้า matrix ก่อนครั้งเดียว แล้วใช้ matrix ชุดเดียวกันทั้งกลุ่ม
+        คืน {user_id: ผลลัพธ์รูปแบบเดียวกับ recommend_sports} DB error จะ raise ออกไป
+        """
+        user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+        if not user_ids:
+            return {}
+        matrix = self.sport_matrix.latest()
+        neighbor_index = self.sport_ann.get_for(matrix)
+        results = {user_id: matrix.recommend(user_id, top_n=top_n, k_neighbors=k_neighbors,
+                                             neighbor_index=neighbor_index)
+                   for user_id in user_ids}
+        logger.info(f"Batch sport recommendation: {len(user_ids)} users")
+        return results
@@ -139,6 +139,29 @@ INSERT INTO `aianalysis` VALUES (1,1,19,0.96,'2025-10-26 10:41:12'),(2,1,57,0.96
 /*!40000 ALTER TABLE `aianalysis` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `calorierollups`
+--
+
+DROP TABLE IF EXISTS `calorierollups`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `calorierollups` (
+  `user_id` int NOT NULL,
+  `period` enum('day','week','month') NOT NULL,
+  `period_start` date NOT NULL,
+  `consumed_calories` decimal(12,2) NOT NULL DEFAULT '0.00',
+  `burned_calories` decimal(12,2) NOT NULL DEFAULT '0.00',
+  `protein_gram` decimal(12,2) NOT NULL DEFAULT '0.00',
+  `fat_gram` decimal(12,2) NOT NULL DEFAULT '0.00',
+  `carbohydrate_gram` decimal(12,2) NOT NULL DEFAULT '0.00',
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`user_id`,`period`,`period_start`),
+  KEY `idx_period_start` (`period`,`period_start`),
+  CONSTRAINT `calorierollups_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `dailycalories`
 --
@@ -160,6 +183,7 @@ CREATE TABLE `dailycalories` (
   `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`daily_calorie_id`),
   UNIQUE KEY `uk_user_date` (`user_id`,`date`),
+  KEY `idx_date_updated_at` (`date`,`updated_at`),
   CONSTRAINT `dailycalories_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`),
   CONSTRAINT `chk_activity_level` CHECK ((`activity_level` in (1.2,1.4,1.6,1.7,1.9))),
   CONSTRAINT `chk_burned_calories` CHECK ((`burned_calories` >= 0)),
@@ -197,6 +221,8 @@ CREATE TABLE `foods` (
   `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`food_id`),
   KEY `admin_id` (`admin_id`),
+  KEY `idx_food_name` (`food_name`),
+  KEY `idx_updated_at` (`updated_at`),
   CONSTRAINT `foods_ibfk_1` FOREIGN KEY (`admin_id`) REFERENCES `admin` (`admin_id`),
   CONSTRAINT `chk_calories` CHECK ((`calories` > 0)),
   CONSTRAINT `chk_carbohydrate_gram` CHECK ((`carbohydrate_gram` >= 0)),
@@ -272,6 +298,79 @@ INSERT INTO `meals` VALUES (1,1,'2025-10-26'),(3,1,'2025-10-28'),(5,1,'2025-10-2
 /*!40000 ALTER TABLE `meals` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `recommendations`
+--
+
+DROP TABLE IF EXISTS `recommendations`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `recommendations` (
+  `user_id` int NOT NULL,
+  `kind` enum('food','sport') NOT NULL,
+  `for_date` date DEFAULT NULL,
+  `top_n` int NOT NULL,
+  `k_neighbors` int DEFAULT NULL,
+  `payload` json NOT NULL,
+  `computed_at` timestamp NOT NULL,
+  PRIMARY KEY (`user_id`,`kind`),
+  CONSTRAINT `recommendations_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `refreshwatermarks`
+--
+
+DROP TABLE IF EXISTS `refreshwatermarks`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `refreshwatermarks` (
+  `name` varchar(64) NOT NULL,
+  `value` varchar(64) DEFAULT NULL,
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `sportcooccurrence`
+--
+
+DROP TABLE IF EXISTS `sportcooccurrence`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `sportcooccurrence` (
+  `sport_a` int NOT NULL,
+  `sport_b` int NOT NULL,
+  `users` int NOT NULL,
+  PRIMARY KEY (`sport_a`,`sport_b`),
+  KEY `sport_b` (`sport_b`),
+  CONSTRAINT `sportcooccurrence_ibfk_1` FOREIGN KEY (`sport_a`) REFERENCES `sports` (`sport_id`) ON DELETE CASCADE,
+  CONSTRAINT `sportcooccurrence_ibfk_2` FOREIGN KEY (`sport_b`) REFERENCES `sports` (`sport_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `sportneighbors`
+--
+
+DROP TABLE IF EXISTS `sportneighbors`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `sportneighbors` (
+  `sport_id` int NOT NULL,
+  `rank` int NOT NULL,
+  `neighbor_sport_id` int NOT NULL,
+  `score` double NOT NULL,
+  `computed_at` timestamp NOT NULL,
+  PRIMARY KEY (`sport_id`,`rank`),
+  KEY `neighbor_sport_id` (`neighbor_sport_id`),
+  CONSTRAINT `sportneighbors_ibfk_1` FOREIGN KEY (`sport_id`) REFERENCES `sports` (`sport_id`) ON DELETE CASCADE,
+  CONSTRAINT `sportneighbors_ibfk_2` FOREIGN KEY (`neighbor_sport_id`) REFERENCES `sports` (`sport_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `sports`
 --
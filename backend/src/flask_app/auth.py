@@ -0,0 +1,256 @@
+# File: backend/src/flask_app/auth.py
+# Purpose: JWT auth ที่ใช้ร่วมกันทุก blueprint (food detect / recommendation)
+#
+# token ที่ verify แล้วถูก cache ไว้ (key = sha256 ของ token) จนถึง exp ของ token
+# request ถัดไปใน session เดียวกันจึงไม่ต้อง HMAC-verify + parse JSON ซ้ำ
+# token ที่ verify ไม่ผ่านจะไม่ถูก cache (กัน token ขยะดัน entry ดี ๆ ออกจาก cache)
+
+import os
+import time
+import hmac
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
+
+import jwt
+from jwt import ExpiredSignatureError, InvalidTokenError
+from flask import request, jsonify
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]  # backend
+load_dotenv(str(PROJECT_ROOT / ".env"))
+
+# ============================================
+# Configuration
+# ============================================
+JWT_SECRET = os.getenv('JWT_SECRET')
+JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
+
+if not JWT_SECRET:
+    logger.critical("❌ JWT_SECRET missing in environment")
+    raise RuntimeError("JWT_SECRET is not set in .env")
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '4096'))
+# อายุสูงสุดของ entry (token ที่ไม่มี exp หรือ exp ไกลมาก) 0 = ปิด cache
+AUTH_TOKEN_CACHE_MAX_TTL_S = float(os.getenv('AUTH_TOKEN_CACHE_MAX_TTL_S', '900'))
+
+# token ของ internal API (batch job / push campaign) ส่งมาใน header X-Internal-Token
+# ไม่ตั้งค่า = ปิด internal endpoint ทั้งหมด
+INTERNAL_API_TOKEN = os.getenv('INTERNAL_API_TOKEN', '')
+
+# claim ที่ใช้เป็น user id (Node backend ใช้ "id" token รุ่นเก่าใช้ userId/user_id/sub)
+USER_ID_CLAIMS = ('id', 'userId', 'user_id', 'sub')
+
+
+def user_id_from_payload(payload):
+    for claim in USER_ID_CLAIMS:
+        value = payload.get(claim)
+        if value is not None and value != '':
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+# ============================================
+# Verified-token cache
+# ============================================
+class TokenCache:
+    def __init__(self, max_entries=AUTH_TOKEN_CACHE_SIZE, max_ttl_s=AUTH_TOKEN_CACHE_MAX_TTL_S):
+        self.max_entries = int(max_entries)
+        self.max_ttl = float(max_ttl_s)
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # digest -> (expires_at (epoch), user_id)
+
+        # metrics
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_ttl > 0
+
+    def get(self, digest):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[digest]
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, digest, user_id, exp=None):
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.max_ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        with self._lock:
+            self._entries[digest] = (expires_at, user_id)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _reinit_after_fork(self):
+        self._lock = threading.Lock()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_ttl_s": self.max_ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+
+class FailureCounters:
+    """จำนวน request ที่ auth ไม่ผ่าน แยกตามเหตุผล (นับจากหลาย request thread จึงต้องมี lock)"""
+
+    def __init__(self, reasons=("expired", "invalid", "missing")):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(reasons, 0)
+
+    def add(self, reason):
+        with self._lock:
+            self._counts[reason] += 1
+
+    def _reinit_after_fork(self):
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+token_cache = TokenCache()
+_failures = FailureCounters()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=token_cache._reinit_after_fork)
+    os.register_at_fork(after_in_child=_failures._reinit_after_fork)
+
+
+def _token_digest(token):
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+class AuthError(Exception):
+    """token ไม่ถูกต้อง/หมดอายุ (message ส่งกลับให้ client ได้)"""
+
+
+def verify_jwt(token):
+    """verify token (ใช้ cache ถ้ามี) คืน user_id หรือ raise AuthError"""
+    if not token:
+        _failures.add("missing")
+        raise AuthError("Invalid or missing token")
+
+    digest = _token_digest(token)
+    user_id = token_cache.get(digest)
+    if user_id is not None:
+        return user_id
+
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except ExpiredSignatureError:
+        _failures.add("expired")
+        raise AuthError("Token expired")
+    except InvalidTokenError:
+        _failures.add("invalid")
+        raise AuthError("Invalid token")
+
+    user_id = user_id_from_payload(payload)
+    if user_id is None:
+        _failures.add("invalid")
+        raise AuthError("Invalid token")
+
+    token_cache.put(digest, user_id, payload.get('exp'))
+    return user_id
+
+
+def bearer_token(auth_header):
+    if not auth_header:
+        return None
+    scheme, _, token = auth_header.partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    return token.strip() or None
+
+
+def verify_token(token):
+    """รับ token (มีหรือไม่มี 'Bearer ' นำหน้าก็ได้) คืน user_id หรือ None"""
+    if token and token[:7].lower() == "bearer ":
+        token = token[7:].strip()
+    try:
+        return verify_jwt(token)
+    except AuthError:
+        return None
+
+
+# ============================================
+# Decorator
+# ============================================
+def require_auth(f):
+    """ตรวจ JWT จาก Authorization: Bearer <token> แล้วใส่ user_id ลง request"""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        try:
+            request.user_id = verify_jwt(bearer_token(request.headers.get("Authorization")))
+        except AuthError as e:
+            return jsonify({"success": False, "message": str(e)}), 401
+        return f(*args, **kwargs)
+    return wrapper
+
+
+def verify_user_access(user_id_from_token, user_id_from_path):
+    """ตรวจสอบว่า user ที่ทำ request (request.user_id จาก require_auth) ตรงกับ userId ใน path"""
+    try:
+        return int(user_id_from_token) == int(user_id_from_path)
+    except (TypeError, ValueError):
+        return False
+
+
+def require_internal_token(f):
+    """สำหรับ endpoint ภายใน (ไม่ใช่ของผู้ใช้): ตรวจ X-Internal-Token กับ INTERNAL_API_TOKEN"""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if not INTERNAL_API_TOKEN:
+            return jsonify({"success": False, "message": "Internal API is disabled"}), 403
+        token = request.headers.get("X-Internal-Token", "")
+        if not hmac.compare_digest(token.encode('utf-8'), INTERNAL_API_TOKEN.encode('utf-8')):
+            _failures.add("invalid")
+            return jsonify({"success": False, "message": "Invalid internal token"}), 401
+        return f(*args, **kwargs)
+    return wrapper
+
+
+def auth_stats():
+    stats = token_cache.stats()
+    stats["failures"] = _failures.snapshot()
+    return stats
@@ -0,0 +1,138 @@
+# File: backend/src/flask_app/calorie_reconcile.py
+# Purpose: ซ่อม DailyCalories.consumed_calories ให้ตรงกับ Meals/MealDetails/Foods
+#
+# save_meal_to_db อัปเดต consumed_calories แบบ delta (+ calories ของอาหารที่บันทึก)
+# ยอดอาจคลาดเคลื่อนได้เมื่อ admin แก้ calories ของ Foods, แถว DailyCalories ถูกสร้างหลังบันทึกมื้อ
+# หรือมีการลบ MealDetails job นี้คำนวณยอดใหม่แบบ bulk ทีละวันแล้วแก้เฉพาะแถวที่ไม่ตรง
+#
+# ตัวอย่าง (จาก backend/src):
+#   python -m flask_app.calorie_reconcile --from 2026-01-01 --to 2026-01-31
+#   python -m flask_app.calorie_reconcile --days 7 --dry-run
+
+import argparse
+import logging
+import sys
+from datetime import date, datetime, timedelta
+
+from flask_app.db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+# ยอดของแต่ละ (user_id, date) จากมื้ออาหารจริง เทียบกับค่าที่เก็บไว้
+_DRIFT_QUERY = """
+    SELECT dc.user_id, dc.date, dc.consumed_calories AS stored,
+           COALESCE(t.total, 0) AS actual
+    FROM DailyCalories dc
+    LEFT JOIN (
+        SELECT m.user_id, SUM(f.calories) AS total
+        FROM Meals m
+        JOIN MealDetails md ON m.meal_id = md.meal_id
+        JOIN Foods f ON md.food_id = f.food_id
+        WHERE m.date = %s
+        GROUP BY m.user_id
+    ) t ON t.user_id = dc.user_id
+    WHERE dc.date = %s
+      AND NOT (COALESCE(dc.consumed_calories, 0) <=> COALESCE(t.total, 0))
+"""
+
+_REPAIR_QUERY = """
+    UPDATE DailyCalories dc
+    LEFT JOIN (
+        SELECT m.user_id, SUM(f.calories) AS total
+        FROM Meals m
+        JOIN MealDetails md ON m.meal_id = md.meal_id
+        JOIN Foods f ON md.food_id = f.food_id
+        WHERE m.date = %s
+        GROUP BY m.user_id
+    ) t ON t.user_id = dc.user_id
+    SET dc.consumed_calories = COALESCE(t.total, 0)
+    WHERE dc.date = %s
+      AND NOT (COALESCE(dc.consumed_calories, 0) <=> COALESCE(t.total, 0))
+"""
+
+
+def _date_range(date_from, date_to):
+    day = date_from
+    while day <= date_to:
+        yield day
+        day += timedelta(days=1)
+
+
+def reconcile_day(conn, day, dry_run=False):
+    """
+    ตรวจ/ซ่อมยอดของวันเดียวใน transaction ของตัวเอง
+    lock แถว DailyCalories ของวันนั้นก่อน แล้วคำนวณยอดแบบ READ COMMITTED
+    save_meal_to_db ที่ทำงานพร้อมกันจึงไม่ถูกเขียนทับ: ตัวที่อัปเดต DailyCalories ไปแล้วต้อง commit
+    ก่อนเราได้ lock (ยอดของมันอยู่ใน SUM) ตัวที่ยังไม่ถึงจะรอ lock แล้วบวก delta ต่อจากค่าที่ซ่อมแล้ว
+    คืน list ของแถวที่คลาดเคลื่อน [{'user_id', 'date', 'stored', 'actual'}, ...]
+    """
+    cur = conn.cursor(dictionary=True)
+    try:
+        conn.start_transaction(isolation_level='READ COMMITTED')
+        if not dry_run:
+            cur.execute("SELECT daily_calorie_id FROM DailyCalories WHERE date = %s FOR UPDATE", (day,))
+            cur.fetchall()
+        cur.execute(_DRIFT_QUERY, (day, day))
+        drifted = cur.fetchall()
+        if drifted and not dry_run:
+            cur.execute(_REPAIR_QUERY, (day, day))
+            conn.commit()
+        else:
+            conn.rollback()
+        return drifted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def reconcile_consumed_calories(date_from, date_to, dry_run=False):
+    """
+    คำนวณ consumed_calories ใหม่ทุกแถวของ DailyCalories ในช่วง [date_from, date_to]
+    คืนสรุป {'days', 'rows_drifted', 'total_drift', 'repaired'}
+    """
+    if date_from > date_to:
+        raise ValueError("date_from must be on or before date_to")
+
+    summary = {'days': 0, 'rows_drifted': 0, 'total_drift': 0.0, 'repaired': not dry_run}
+    with get_pool().connection() as conn:
+        for day in _date_range(date_from, date_to):
+            drifted = reconcile_day(conn, day, dry_run)
+            summary['days'] += 1
+            summary['rows_drifted'] += len(drifted)
+            for row in drifted:
+                drift = float(row['actual']) - float(row['stored'] or 0)
+                summary['total_drift'] += drift
+                logger.info("%s user %s: stored=%s actual=%s (drift %+.2f)",
+                            day, row['user_id'], row['stored'], row['actual'], drift)
+
+    summary['total_drift'] = round(summary['total_drift'], 2)
+    logger.info("✅ Calorie reconcile %s..%s: %d rows drifted%s",
+                date_from, date_to, summary['rows_drifted'], " (dry run)" if dry_run else "")
+    return summary
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute DailyCalories.consumed_calories for a date range")
+    parser.add_argument("--from", dest="date_from", type=_parse_date, help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", type=_parse_date, help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--days", type=int, default=1, help="ใช้เมื่อไม่ระบุ --from: ย้อนหลังกี่วันรวมวันนี้")
+    parser.add_argument("--dry-run", action="store_true", help="รายงานอย่างเดียว ไม่แก้ข้อมูล")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s in %(module)s: %(message)s")
+
+    date_to = args.date_to or date.today()
+    date_from = args.date_from or date_to - timedelta(days=max(args.days, 1) - 1)
+    summary = reconcile_consumed_calories(date_from, date_to, args.dry_run)
+    print(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
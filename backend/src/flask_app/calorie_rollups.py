@@ -0,0 +1,338 @@
+# File: backend/src/flask_app/calorie_rollups.py
+# Purpose: ยอดรวมแคลอรี/สารอาหารรายผู้ใช้ต่อวัน สัปดาห์ (เริ่มวันจันทร์) และเดือน (ตาราง CalorieRollups)
+#
+# - consumed/protein/fat/carb: save_meal_to_db / save_meals_to_db บวกเข้าแถววัน สัปดาห์ และเดือนของมื้อ
+#   ด้วย statement เดียวใน transaction เดียวกับการบันทึกมื้อ (add_meal_rollups)
+# - burned: กิจกรรมบันทึกผ่าน backend Node จึงใช้ job บวก ActivityDetail ที่ใหม่กว่า watermark
+#   (python -m flask_app.calorie_rollups --loop 60)
+# - --rebuild คำนวณช่วงวันที่ใหม่จาก Meals/MealDetails/Foods และ Activity/ActivityDetail
+#   (backfill ครั้งแรก, admin แก้ค่าของ Foods, ลบมื้อ/กิจกรรม)
+# - summarize() ตอบยอดของช่วงวันใด ๆ จากแถวเดือนเต็ม + สัปดาห์เต็ม + วันที่เหลือที่หัว/ท้ายช่วง
+#   ช่วง 1 ปีอ่านราว 20-30 แถวแทนการ scan มื้ออาหารทุกแถว
+#
+# ตัวอย่าง (จาก backend/src):
+#   python -m flask_app.calorie_rollups                                  # บวก burned ที่ค้างอยู่รอบเดียว
+#   python -m flask_app.calorie_rollups --rebuild --from 2025-01-01      # backfill ถึงวันนี้
+#   python -m flask_app.calorie_rollups --loop 60
+
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import date, datetime, timedelta
+
+from mysql.connector import Error, errorcode
+
+from flask_app.db_pool import get_pool
+from flask_app.refresh_state import read_watermarks, write_watermarks
+
+logger = logging.getLogger(__name__)
+
+# เปิดหลังสร้างตาราง CalorieRollups และ backfill ด้วย --rebuild แล้ว
+# (ปิด = save path ไม่เขียน rollup และ /api/calorie-summary ตอบ 503)
+CALORIE_ROLLUPS_ENABLED = os.getenv('CALORIE_ROLLUPS_ENABLED', 'false').lower() == 'true'
+# ช่วงยาวสุดของ /api/calorie-summary
+CALORIE_SUMMARY_MAX_DAYS = int(os.getenv('CALORIE_SUMMARY_MAX_DAYS', '3660'))
+
+PERIOD_DAY = 'day'
+PERIOD_WEEK = 'week'
+PERIOD_MONTH = 'month'
+PERIODS = (PERIOD_DAY, PERIOD_WEEK, PERIOD_MONTH)
+
+WATERMARK_ACTIVITY_DETAIL = 'calorie_rollups.activity_detail_id'
+
+METRICS = ('consumed_calories', 'burned_calories', 'protein_gram', 'fat_gram', 'carbohydrate_gram')
+
+_PERIODS_TABLE = "(SELECT 'day' AS period UNION ALL SELECT 'week' UNION ALL SELECT 'month')"
+
+
+# วันเริ่มต้นของงวดที่วัน {day} อยู่ (สัปดาห์เริ่มวันจันทร์)
+_PERIOD_START_SQL = {
+    PERIOD_DAY: "{day}",
+    PERIOD_WEEK: "{day} - INTERVAL WEEKDAY({day}) DAY",
+    PERIOD_MONTH: "{day} - INTERVAL (DAYOFMONTH({day}) - 1) DAY",
+}
+
+
+def _period_start_sql(day):
+    """SQL ของวันเริ่มต้นงวดตาม p.period (ใช้คู่กับ _PERIODS_TABLE AS p)"""
+    cases = ' '.join(f"WHEN '{period}' THEN {sql.format(day=day)}" for period, sql in _PERIOD_START_SQL.items())
+    return f"CASE p.period {cases} END"
+
+
+# ============================================
+# Period helpers (Python ใช้กฎเดียวกับ SQL ด้านบน)
+# ============================================
+def period_start(period, day):
+    if period == PERIOD_WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == PERIOD_MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def period_end(period, day):
+    start = period_start(period, day)
+    if period == PERIOD_WEEK:
+        return start + timedelta(days=6)
+    if period == PERIOD_MONTH:
+        return (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start
+
+
+def _weeks_and_days(start, end):
+    segments = []
+    day = start
+    while day <= end:
+        if day.weekday() == 0 and day + timedelta(days=6) <= end:
+            segments.append((PERIOD_WEEK, day))
+            day += timedelta(days=7)
+        else:
+            segments.append((PERIOD_DAY, day))
+            day += timedelta(days=1)
+    return segments
+
+
+def plan_range(start, end):
+    """
+    แถว rollup ที่รวมกันแล้วได้ช่วง [start, end] พอดี [(period, period_start), ...]
+    เดือนเต็มที่อยู่ในช่วง + สัปดาห์เต็ม/วัน สำหรับส่วนหัวก่อนเดือนแรกและส่วนท้ายหลังเดือนสุดท้าย
+    """
+    first_month = start if start.day == 1 else period_end(PERIOD_MONTH, start) + timedelta(days=1)
+    months = []
+    month = first_month
+    while period_end(PERIOD_MONTH, month) <= end:
+        months.append((PERIOD_MONTH, month))
+        month = period_end(PERIOD_MONTH, month) + timedelta(days=1)
+    if not months:
+        return _weeks_and_days(start, end)
+    return (_weeks_and_days(start, first_month - timedelta(days=1)) + months +
+            _weeks_and_days(month, end))
+
+
+# ============================================
+# Write path
+# ============================================
+def add_meal_rollups(cur, user_id, food_counts, meal_date=None):
+    """
+    บวกแคลอรี/สารอาหารของ {food_id: จำนวน} เข้าแถววัน/สัปดาห์/เดือนของ meal_date
+    (None = วันนี้ CURDATE() เหมือน Meals) ใช้ cursor ของ transaction ที่บันทึกมื้อ (ผู้เรียก commit)
+    อาหารที่ไม่มีใน Foods ถูกข้าม ถ้ายังไม่มีตาราง CalorieRollups จะ log แล้วข้าม (มื้อยังบันทึกได้)
+    """
+    if not CALORIE_ROLLUPS_ENABLED or not food_counts:
+        return
+    items = ' UNION ALL '.join(['SELECT %s AS food_id, %s AS n'] * len(food_counts))
+    params = [user_id, meal_date]
+    for food_id, count in food_counts.items():
+        params.extend((food_id, count))
+    query = f"""
+        INSERT INTO CalorieRollups
+            (user_id, period, period_start, consumed_calories, protein_gram, fat_gram, carbohydrate_gram)
+        SELECT %s, p.period, {_period_start_sql('d.day')},
+               SUM(f.calories * i.n), SUM(COALESCE(f.protein_gram, 0) * i.n),
+               SUM(COALESCE(f.fat_gram, 0) * i.n), SUM(COALESCE(f.carbohydrate_gram, 0) * i.n)
+        FROM (SELECT COALESCE(CAST(%s AS DATE), CURDATE()) AS day) AS d
+        CROSS JOIN ({items}) AS i
+        JOIN Foods f ON f.food_id = i.food_id
+        CROSS JOIN {_PERIODS_TABLE} AS p
+        GROUP BY p.period, d.day
+        ON DUPLICATE KEY UPDATE
+            consumed_calories = consumed_calories + VALUES(consumed_calories),
+            protein_gram = protein_gram + VALUES(protein_gram),
+            fat_gram = fat_gram + VALUES(fat_gram),
+            carbohydrate_gram = carbohydrate_gram + VALUES(carbohydrate_gram)
+    """
+    try:
+        cur.execute(query, params)
+    except Error as e:
+        # statement ที่ error ไม่ทำให้ transaction ของมื้อถูก rollback
+        if e.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+        logger.error("CalorieRollups table missing, meal saved without rollup "
+                     "(create it and run --rebuild, or set CALORIE_ROLLUPS_ENABLED=false): %s", e)
+
+
+def refresh_burned():
+    """
+    บวก calories_burned ของ ActivityDetail ที่ใหม่กว่า watermark เข้า rollup (transaction เดียวกับ watermark)
+    คืนสรุป {'from', 'to', 'rows'}
+    """
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            since = int(read_watermarks(cur, [WATERMARK_ACTIVITY_DETAIL]).get(WATERMARK_ACTIVITY_DETAIL, 0))
+            cur.execute("SELECT COALESCE(MAX(activity_detail_id), 0) FROM ActivityDetail")
+            upto = cur.fetchone()[0]
+            rows = 0
+            if upto > since:
+                cur.execute(f"""
+                    INSERT INTO CalorieRollups (user_id, period, period_start, burned_calories)
+                    SELECT a.user_id, p.period, {_period_start_sql('a.date')} AS bucket_start,
+                           SUM(COALESCE(ad.calories_burned, 0))
+                    FROM ActivityDetail ad
+                    JOIN Activity a ON a.activity_id = ad.activity_id
+                    CROSS JOIN {_PERIODS_TABLE} AS p
+                    WHERE ad.activity_detail_id > %s AND ad.activity_detail_id <= %s
+                    GROUP BY a.user_id, p.period, bucket_start
+                    ON DUPLICATE KEY UPDATE burned_calories = burned_calories + VALUES(burned_calories)
+                """, (since, upto))
+                rows = cur.rowcount
+                write_watermarks(cur, {WATERMARK_ACTIVITY_DETAIL: upto})
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    return {'from': since, 'to': upto, 'rows': rows}
+
+
+def _rebuild_chunk(conn, date_from, date_to):
+    """
+    คำนวณแถวทุก period ที่ทับช่วง [date_from, date_to] ใหม่ใน transaction เดียว
+    แต่ละ period ลบแล้ว insert ใหม่จากวันต้นงวดแรกถึงวันท้ายงวดสุดท้าย (ไม่เหลือแถวที่นับไม่ครบงวด)
+    burned นับเฉพาะ ActivityDetail ถึง watermark (ที่ใหม่กว่า refresh_burned บวกภายหลัง)
+    """
+    cur = conn.cursor()
+    try:
+        marks = read_watermarks(cur, [WATERMARK_ACTIVITY_DETAIL])
+        if WATERMARK_ACTIVITY_DETAIL in marks:
+            upto = int(marks[WATERMARK_ACTIVITY_DETAIL])
+        else:
+            cur.execute("SELECT COALESCE(MAX(activity_detail_id), 0) FROM ActivityDetail")
+            upto = cur.fetchone()[0]
+            write_watermarks(cur, {WATERMARK_ACTIVITY_DETAIL: upto})
+
+        rows = 0
+        for period in PERIODS:
+            first = period_start(period, date_from)
+            last = period_start(period, date_to)
+            cur.execute("""
+                DELETE FROM CalorieRollups
+                WHERE period = %s AND period_start BETWEEN %s AND %s
+            """, (period, first, last))
+            cur.execute(f"""
+                INSERT INTO CalorieRollups (user_id, period, period_start, consumed_calories, burned_calories,
+                                            protein_gram, fat_gram, carbohydrate_gram)
+                SELECT src.user_id, %s, {_PERIOD_START_SQL[period].format(day='src.day')} AS bucket_start,
+                       SUM(src.consumed), SUM(src.burned), SUM(src.protein), SUM(src.fat), SUM(src.carb)
+                FROM (
+                    SELECT m.user_id, m.date AS day, f.calories AS consumed, 0 AS burned,
+                           COALESCE(f.protein_gram, 0) AS protein, COALESCE(f.fat_gram, 0) AS fat,
+                           COALESCE(f.carbohydrate_gram, 0) AS carb
+                    FROM Meals m
+                    JOIN MealDetails md ON m.meal_id = md.meal_id
+                    JOIN Foods f ON md.food_id = f.food_id
+                    WHERE m.date BETWEEN %s AND %s
+                    UNION ALL
+                    SELECT a.user_id, a.date, 0, COALESCE(ad.calories_burned, 0), 0, 0, 0
+                    FROM Activity a
+                    JOIN ActivityDetail ad ON a.activity_id = ad.activity_id
+                    WHERE a.date BETWEEN %s AND %s AND ad.activity_detail_id <= %s
+                ) AS src
+                GROUP BY src.user_id, bucket_start
+            """, (period, first, period_end(period, date_to),
+                  first, period_end(period, date_to), upto))
+            rows += cur.rowcount
+        conn.commit()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def rebuild(date_from, date_to):
+    """คำนวณ rollup ของช่วง [date_from, date_to] ใหม่ทีละเดือน (transaction สั้น) คืน {'months', 'rows'}"""
+    if date_from > date_to:
+        raise ValueError("date_from must be on or before date_to")
+    summary = {'months': 0, 'rows': 0}
+    with get_pool().connection() as conn:
+        month = period_start(PERIOD_MONTH, date_from)
+        while month <= date_to:
+            chunk_from = max(date_from, month)
+            chunk_to = min(date_to, period_end(PERIOD_MONTH, month))
+            summary['rows'] += _rebuild_chunk(conn, chunk_from, chunk_to)
+            summary['months'] += 1
+            logger.info("Calorie rollups rebuilt for %s..%s", chunk_from, chunk_to)
+            month = period_end(PERIOD_MONTH, month) + timedelta(days=1)
+    return summary
+
+
+# ============================================
+# Read path
+# ============================================
+def summarize(user_id, start, end):
+    """
+    ยอดรวมของผู้ใช้ในช่วง [start, end] จาก rollup (query เดียว)
+    คืน {'start', 'end', 'days', 'totals': {...}, 'rows_read'}
+    """
+    segments = plan_range(start, end)
+    placeholders = ', '.join(['(%s, %s)'] * len(segments))
+    params = [user_id]
+    for period, day in segments:
+        params.extend((period, day))
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT {', '.join(f'COALESCE(SUM({name}), 0)' for name in METRICS)}, COUNT(*)
+            FROM CalorieRollups
+            WHERE user_id = %s AND (period, period_start) IN ({placeholders})
+        """, params)
+        row = cur.fetchone()
+        cur.close()
+
+    totals = {name: round(float(value), 2) for name, value in zip(METRICS, row)}
+    totals['net_calories'] = round(totals['consumed_calories'] - totals['burned_calories'], 2)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': (end - start).days + 1,
+        'totals': totals,
+        'rows_read': int(row[-1]),
+        'segments': len(segments),
+    }
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain CalorieRollups (daily/weekly/monthly totals)")
+    parser.add_argument("--rebuild", action="store_true", help="คำนวณช่วง --from..--to ใหม่จากตารางต้นทาง")
+    parser.add_argument("--from", dest="date_from", type=_parse_date, help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", type=_parse_date, help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--loop", type=float, default=0, help="บวก burned ซ้ำทุก N วินาที (0 = รอบเดียว)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s in %(module)s: %(message)s")
+
+    if args.rebuild:
+        if args.date_from is None:
+            parser.error("--rebuild requires --from")
+        started = time.perf_counter()
+        summary = rebuild(args.date_from, args.date_to or date.today())
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+        print(summary, file=sys.stderr)
+        return 0
+
+    while True:
+        try:
+            summary = refresh_burned()
+            if summary['rows']:
+                logger.info("✅ Calorie rollups: ActivityDetail %s..%s applied", summary['from'], summary['to'])
+            print(summary, file=sys.stderr)
+        except Exception as e:
+            logger.exception("Calorie rollup refresh failed: %s", e)
+            if args.loop <= 0:
+                return 1
+        if args.loop <= 0:
+            return 0
+        time.sleep(args.loop)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
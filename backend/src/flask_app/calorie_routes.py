@@ -0,0 +1,50 @@
+# File: backend/src/flask/calorie_routes.py
+import logging
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+
+# -----------------------------
+# Blueprint & Logger
+# -----------------------------
+calorie_bp = Blueprint("calorie", __name__)
+logger = logging.getLogger(__name__)
+
+from flask_app.auth import require_auth, verify_user_access
+from flask_app.calorie_rollups import CALORIE_ROLLUPS_ENABLED, CALORIE_SUMMARY_MAX_DAYS, summarize
+
+# -----------------------------
+# Helper functions
+# -----------------------------
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+# -----------------------------
+# Routes
+# -----------------------------
+@calorie_bp.route("/api/calorie-summary/<int:userId>", methods=["GET"])
+@require_auth
+def calorie_summary(userId):
+    """ยอดแคลอรีกิน/เผาผลาญ และโปรตีน/ไขมัน/คาร์บ รวมของช่วง ?start=YYYY-MM-DD&end=YYYY-MM-DD (รวมทั้งสองวัน)"""
+    try:
+        if not verify_user_access(request.user_id, userId):
+            return jsonify({"success": False, "message": "Forbidden"}), 403
+        if not CALORIE_ROLLUPS_ENABLED:
+            return jsonify({"success": False, "message": "Calorie summary is disabled"}), 503
+
+        start = parse_date(request.args.get("start"))
+        end = parse_date(request.args.get("end"))
+        if start is None or end is None:
+            return jsonify({"success": False, "message": "start and end are required (YYYY-MM-DD)"}), 400
+        if start > end:
+            return jsonify({"success": False, "message": "start must be on or before end"}), 400
+        if (end - start).days + 1 > CALORIE_SUMMARY_MAX_DAYS:
+            return jsonify({"success": False, "message": f"Range too long. Max {CALORIE_SUMMARY_MAX_DAYS} days"}), 400
+
+        return jsonify({"success": True, "user_id": userId, **summarize(userId, start, end)}), 200
+
+    except Exception as e:
+        logger.exception(f"Error in calorie_summary for user {userId}: {e}")
+        return jsonify({"success": False, "message": "Server error"}), 500
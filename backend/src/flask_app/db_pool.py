@@ -0,0 +1,273 @@
+# File: backend/src/flask_app/db_pool.py
+# Purpose: MySQL connection pool ที่ใช้ร่วมกันระหว่าง food_detect และ recommendation models
+# query ของระบบส่วนใหญ่เล็กมาก เวลาส่วนใหญ่จึงหมดไปกับการเปิด TCP/handshake ใหม่ทุกครั้ง
+# pool นี้เก็บ connection ไว้ใช้ซ้ำ พร้อม health-check, acquire timeout และ metrics
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+import mysql.connector
+from mysql.connector import Error, InterfaceError, OperationalError
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]  # backend
+load_dotenv(str(PROJECT_ROOT / ".env"))
+
+# ============================================
+# Configuration
+# ============================================
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'calories_app'),
+    'port': int(os.getenv('DB_PORT', '3306')),
+    'charset': 'utf8mb4',
+    'autocommit': False,
+    'connection_timeout': 10
+}
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_POOL_ACQUIRE_TIMEOUT_S = float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT_S', '5'))
+# connection ที่ว่างนานกว่านี้จะถูก ping ก่อนส่งให้ผู้ใช้ (กัน connection ที่ server ตัดไปแล้ว)
+DB_POOL_PING_AFTER_S = float(os.getenv('DB_POOL_PING_AFTER_S', '30'))
+
+
+class PoolTimeoutError(Error):
+    """รอ connection จาก pool เกิน acquire timeout"""
+
+
+# ============================================
+# Connection Pool
+# ============================================
+class ConnectionPool:
+    def __init__(self, config, size=DB_POOL_SIZE, acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT_S,
+                 ping_after=DB_POOL_PING_AFTER_S, name="default"):
+        if size < 1:
+            raise ValueError("pool size must be >= 1")
+        self.config = dict(config)
+        self.size = int(size)
+        self.acquire_timeout = acquire_timeout
+        self.ping_after = ping_after
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, last_used) ใช้แบบ LIFO เพื่อให้ connection ที่อุ่นอยู่ถูกใช้ก่อน
+        self._open = 0        # connection ที่เปิดอยู่ทั้งหมด (idle + in use)
+
+        # metrics
+        self._acquires = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._health_check_failures = 0
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.config)
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self.ping_after:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def acquire(self, timeout=None):
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        with self._cond:
+            self._acquires += 1
+            while not self._idle and self._open >= self.size:
+                waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._open >= self.size:
+                        self._timeouts += 1
+                        self._waits += 1
+                        self._wait_time += time.monotonic() - started
+                        raise PoolTimeoutError(
+                            msg=f"Timed out after {timeout}s waiting for a database connection"
+                        )
+            if waited:
+                self._waits += 1
+                self._wait_time += time.monotonic() - started
+
+            if self._idle:
+                conn, last_used = self._idle.pop()
+            else:
+                conn, last_used = None, None
+                self._open += 1
+
+        if conn is not None:
+            if self._is_healthy(conn, last_used):
+                return conn
+            with self._cond:
+                self._health_check_failures += 1
+            logger.warning("Discarding stale pooled connection (pool=%s)", self.name)
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+        # เปิด connection ใหม่นอก lock (slot ถูกจองไว้แล้วใน _open)
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, broken=False):
+        """
+        คืน connection เข้า pool โดยไม่ ping (is_connected() เป็น round trip ทุกครั้ง)
+        connection ที่ตายระหว่างว่างจะถูกจับได้ด้วย ping ตอน acquire ตาม ping_after
+        """
+        if broken:
+            self._discard(conn)
+            return
+        try:
+            # ปิด transaction ค้าง เพื่อไม่ให้ snapshot/lock ติดไปกับผู้ใช้คนถัดไป
+            if conn.in_transaction:
+                conn.rollback()
+        except Error:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        broken = False
+        try:
+            yield conn
+        except (OperationalError, InterfaceError):
+            # connection หลุด/ใช้ต่อไม่ได้ ไม่คืนเข้า pool
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken)
+
+    def close_all(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _reinit_after_fork(self):
+        """
+        ใน process ลูกหลัง fork: socket ของ connection ที่ได้มาจาก parent ใช้ร่วมกันไม่ได้
+        ทิ้งไปโดยไม่ close() (close จะส่ง COM_QUIT ไปตัด connection ของ parent)
+        """
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "name": self.name,
+                "size": self.size,
+                "open": self._open,
+                "idle": idle,
+                "in_use": self._open - idle,
+                "acquires": self._acquires,
+                "waits": self._waits,
+                "wait_time_ms_total": round(self._wait_time * 1000, 3),
+                "wait_time_ms_avg": round(self._wait_time * 1000 / self._waits, 3) if self._waits else 0.0,
+                "timeouts": self._timeouts,
+                "connections_created": self._created,
+                "health_check_failures": self._health_check_failures,
+            }
+
+
+# ============================================
+# Shared pools (หนึ่ง pool ต่อหนึ่งชุด config)
+# ============================================
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(**overrides):
+    """
+    คืน pool ที่ใช้ร่วมกันทั้ง process
+    overrides (host/user/password/database/...) ที่ตรงกับ DB_CONFIG จะได้ pool เดียวกัน
+    """
+    config = dict(DB_CONFIG)
+    config.update({k: v for k, v in overrides.items() if v is not None})
+    key = tuple(sorted((k, str(v)) for k, v in config.items()))
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            name = "default" if not _pools else f"pool-{len(_pools)}"
+            pool = ConnectionPool(config, name=name)
+            _pools[key] = pool
+            logger.info("✅ DB pool '%s' created for %s/%s (size=%d)",
+                        name, config['host'], config['database'], pool.size)
+        return pool
+
+
+@contextmanager
+def get_connection(**overrides):
+    with get_pool(**overrides).connection() as conn:
+        yield conn
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def close_all_pools():
+    """ปิด connection ที่ว่างอยู่ทุก pool (เช่น ก่อน fork worker)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+
+def _reinit_pools_after_fork():
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        pool._reinit_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_pools_after_fork)
@@ -0,0 +1,218 @@
+# File: backend/src/flask_app/food_catalog.py
+# Purpose: In-process cache ของตาราง Foods (ใช้ร่วมกันทั้ง food_detect และ FoodRecommendationSystem)
+# catalog มีขนาดเล็กและแก้ไขโดย admin นาน ๆ ครั้ง จึงโหลดครั้งเดียวแล้ว refresh แบบ incremental
+# จาก foods.updated_at ตาม timer หรือเมื่อมีการ invalidate()
+
+import os
+import time
+import logging
+import threading
+
+from flask_app.db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+FOOD_CATALOG_REFRESH_S = float(os.getenv('FOOD_CATALOG_REFRESH_S', '60'))
+# refresh-on-miss (เช่น food_id ที่ admin เพิ่งเพิ่ม) ทำได้ไม่บ่อยกว่านี้
+FOOD_CATALOG_MISS_REFRESH_S = float(os.getenv('FOOD_CATALOG_MISS_REFRESH_S', '5'))
+
+
+class _Snapshot:
+    """ข้อมูล catalog ชุดหนึ่ง (immutable หลังสร้าง) เพื่อให้อ่านได้โดยไม่ต้อง lock"""
+
+    __slots__ = ("by_id", "by_name", "max_updated_at", "count")
+
+    def __init__(self, by_id):
+        self.by_id = by_id
+        self.by_name = {row['food_name']: row for row in by_id.values()}
+        updated = [row['updated_at'] for row in by_id.values() if row.get('updated_at') is not None]
+        self.max_updated_at = max(updated) if updated else None
+        self.count = len(by_id)
+
+
+class FoodCatalog:
+    def __init__(self, refresh_interval=FOOD_CATALOG_REFRESH_S, miss_refresh_interval=FOOD_CATALOG_MISS_REFRESH_S):
+        self.refresh_interval = refresh_interval
+        self.miss_refresh_interval = miss_refresh_interval
+
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refresher = None
+        self._last_refresh = 0.0
+
+        # metrics
+        self._hits = 0
+        self._misses = 0
+        self._full_loads = 0
+        self._incremental_refreshes = 0
+        self._rows_refreshed = 0
+
+    # -------------------------------------------------
+    # Loading / refreshing
+    # -------------------------------------------------
+    def _fetch(self, query, params=()):
+        with get_pool().connection() as conn:
+            cur = conn.cursor(dictionary=True)
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            cur.close()
+            return rows
+
+    def _full_load(self):
+        rows = self._fetch("SELECT * FROM Foods")
+        self._snapshot = _Snapshot({row['food_id']: row for row in rows})
+        self._full_loads += 1
+        self._last_refresh = time.monotonic()
+        logger.info("✅ Food catalog loaded: %d foods", self._snapshot.count)
+
+    def refresh(self):
+        """
+        Incremental refresh:
+        1) เทียบ COUNT(*) + MAX(updated_at) กับ snapshot ปัจจุบัน ถ้าเท่ากันจบแค่นั้น
+        2) ดึงเฉพาะแถวที่ updated_at >= ค่าล่าสุดที่รู้ แล้ว merge
+        3) ถ้าจำนวนแถวยังไม่ตรง (มีการลบ) จะโหลดใหม่ทั้งหมด
+        """
+        with self._load_lock:
+            current = self._snapshot
+            if current is None:
+                self._full_load()
+                return
+
+            version = self._fetch("SELECT COUNT(*) AS cnt, MAX(updated_at) AS max_updated FROM Foods")[0]
+            self._last_refresh = time.monotonic()
+            if version['cnt'] == current.count and version['max_updated'] == current.max_updated_at:
+                return
+
+            if current.max_updated_at is None:
+                self._full_load()
+                return
+
+            changed = self._fetch("SELECT * FROM Foods WHERE updated_at >= %s", (current.max_updated_at,))
+            by_id = dict(current.by_id)
+            for row in changed:
+                by_id[row['food_id']] = row
+
+            if len(by_id) != version['cnt']:
+                self._full_load()
+                return
+
+            self._snapshot = _Snapshot(by_id)
+            self._incremental_refreshes += 1
+            self._rows_refreshed += len(changed)
+            logger.info("Food catalog refreshed: %d changed rows", len(changed))
+
+    def invalidate(self):
+        """ขอให้ refresh โดยเร็ว (ปลุก background refresher หรือ refresh ทันทีถ้าไม่มี)"""
+        if self._refresher is not None and self._refresher.is_alive():
+            self._wake.set()
+        else:
+            self.refresh()
+
+    def _refresh_loop(self):
+        while True:
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Food catalog refresh failed: %s", e)
+
+    def _ensure_loaded(self, start_refresher=True):
+        snapshot = self._snapshot
+        if snapshot is not None and (not start_refresher or self._refresher is not None or self.refresh_interval <= 0):
+            return snapshot
+        with self._load_lock:
+            if self._snapshot is None:
+                self._full_load()
+            if start_refresher and self.refresh_interval > 0 and self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="food-catalog-refresh", daemon=True
+                )
+                self._refresher.start()
+            return self._snapshot
+
+    def _lookup(self, attr, key, refresh_on_miss):
+        row = getattr(self._ensure_loaded(), attr).get(key)
+        if row is None and refresh_on_miss and \
+                time.monotonic() - self._last_refresh >= self.miss_refresh_interval:
+            self.refresh()
+            row = getattr(self._snapshot, attr).get(key)
+        if row is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return row
+
+    def _reinit_after_fork(self):
+        """ใน process ลูกหลัง fork: snapshot ใช้ต่อได้ แต่ refresher thread ต้องเริ่มใหม่"""
+        self._load_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refresher = None
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def get_by_name(self, food_name, refresh_on_miss=False):
+        return self._lookup('by_name', food_name, refresh_on_miss)
+
+    def get_by_id(self, food_id, refresh_on_miss=False):
+        try:
+            food_id = int(food_id)
+        except (TypeError, ValueError):
+            return None
+        return self._lookup('by_id', food_id, refresh_on_miss)
+
+    def get_many_by_name(self, food_names):
+        by_name = self._ensure_loaded().by_name
+        return {name: by_name[name] for name in food_names if name in by_name}
+
+    def get_many_by_id(self, food_ids):
+        by_id = self._ensure_loaded().by_id
+        return {food_id: by_id[food_id] for food_id in food_ids if food_id in by_id}
+
+    def all_foods(self):
+        """อาหารทั้งหมด เรียงตาม food_name (เหมือน ORDER BY food_name)"""
+        snapshot = self._ensure_loaded()
+        return [snapshot.by_name[name] for name in sorted(snapshot.by_name)]
+
+    def version(self):
+        """(MAX(updated_at), COUNT(*)) ของ snapshot ปัจจุบัน"""
+        snapshot = self._ensure_loaded()
+        return snapshot.max_updated_at, snapshot.count
+
+    def preload(self):
+        """
+        โหลด snapshot โดยไม่เริ่ม refresher thread คืน version
+        ใช้ใน gunicorn master ก่อน fork: worker เริ่ม refresher ของตัวเองเมื่อใช้ catalog ครั้งแรก
+        """
+        snapshot = self._ensure_loaded(start_refresher=False)
+        return snapshot.max_updated_at, snapshot.count
+
+    def versioned_foods(self, start_refresher=True):
+        """(version, all_foods) จาก snapshot เดียวกัน (สำหรับ index ที่ต้องผูกกับ version ของข้อมูล)"""
+        snapshot = self._ensure_loaded(start_refresher)
+        foods = [snapshot.by_name[name] for name in sorted(snapshot.by_name)]
+        return (snapshot.max_updated_at, snapshot.count), foods
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "loaded": snapshot is not None,
+            "size": snapshot.count if snapshot else 0,
+            "max_updated_at": snapshot.max_updated_at.isoformat()
+            if snapshot and snapshot.max_updated_at else None,
+            "hits": self._hits,
+            "misses": self._misses,
+            "full_loads": self._full_loads,
+            "incremental_refreshes": self._incremental_refreshes,
+            "rows_refreshed": self._rows_refreshed,
+            "refresh_interval_s": self.refresh_interval,
+        }
+
+
+# catalog ที่ใช้ร่วมกันทั้ง process
+food_catalog = FoodCatalog()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=food_catalog._reinit_after_fork)
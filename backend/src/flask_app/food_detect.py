@@ -1,24 +1,33 @@
 # File: backend/src/flask/food_detect.py
 import os
-import io
 import json
+import hashlib
+import time
 import logging
+import threading
 from pathlib import Path
 from datetime import datetime
+from collections import Counter
 from contextlib import contextmanager
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 
-import jwt
-import torch
-import torch.nn as nn
-from torchvision import transforms
-from PIL import Image, UnidentifiedImageError
+import numpy as np
 
-import mysql.connector
-from mysql.connector import Error
-from flask import request, jsonify
+from mysql.connector import Error, IntegrityError, errorcode
 from dotenv import load_dotenv
 
+from flask_app.auth import require_auth, verify_token  # noqa: F401 (ย้ายไป auth.py, import จากที่นี่ได้เหมือนเดิม)
+from flask_app.db_pool import get_pool
+from flask_app.food_catalog import food_catalog
+from flask_app.food_history import food_history
+from flask_app.calorie_rollups import add_meal_rollups
+from flask_app.inference_batcher import MicroBatcher
+from flask_app.inference_pool import InferencePool
+from flask_app.prediction_cache import PredictionCache, content_key
+from flask_app.image_preprocess import IMAGE_SIZE, InvalidImageError, decode_image
+from flask_app.uploads import upload_buffer
+from flask_app.inference_backends import BACKENDS, TorchBackend, OnnxRuntimeBackend
+
 # ============================================
 # Setup Logging
 # ============================================
@@ -36,38 +45,42 @@ load_dotenv(str(env_path))
 # ============================================
 # Configuration
 # ============================================
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'database': os.getenv('DB_NAME', 'calories_app'),
-    'port': int(os.getenv('DB_PORT', '3306')),
-    'autocommit': False,
-    'connection_timeout': 10
-}
-
-JWT_SECRET = os.getenv('JWT_SECRET')
-JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
-
-if not JWT_SECRET:
-    logger.critical("❌ JWT_SECRET missing in environment")
-    raise RuntimeError("JWT_SECRET is not set in .env")
+# Micro-batching: รวม request ที่เข้ามาพร้อมกันเป็น forward pass เดียว
+INFER_MAX_BATCH_SIZE = int(os.getenv('INFER_MAX_BATCH_SIZE', '8'))
+INFER_MAX_WAIT_MS = float(os.getenv('INFER_MAX_WAIT_MS', '10'))
+INFER_TIMEOUT_S = float(os.getenv('INFER_TIMEOUT_S', '30'))
+
+# Inference process pool: forward pass รันใน process แยก HTTP worker ทำแค่ decode/preprocess
+# 0 = รัน forward pass ใน process ของ HTTP เอง (เดิม)
+INFERENCE_POOL_PROCESSES = int(os.getenv('INFERENCE_POOL_PROCESSES', '0'))
+# intra-op thread ต่อ inference process (torch.set_num_threads / ORT intra_op_num_threads)
+INFERENCE_POOL_THREADS = int(os.getenv('INFERENCE_POOL_THREADS', '1'))
+# จำนวน batch ที่ค้างอยู่ใน pool ได้พร้อมกัน (slot ละ INFER_MAX_BATCH_SIZE ภาพ) 0 = 2 x processes
+INFERENCE_POOL_SLOTS = int(os.getenv('INFERENCE_POOL_SLOTS', '0'))
+
+# Multi-image prediction (/api/predict-food-batch)
+PREDICT_BATCH_MAX_IMAGES = int(os.getenv('PREDICT_BATCH_MAX_IMAGES', '16'))
+PREDICT_DECODE_WORKERS = int(os.getenv('PREDICT_DECODE_WORKERS', '4'))
+
+# Prediction cache (key = sha256 ของไฟล์ + model version), 0 = ปิด
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '1024'))
+PREDICTION_CACHE_TTL_S = float(os.getenv('PREDICTION_CACHE_TTL_S', '600'))
+
+# Bulk meal logging (/api/save-meals): จำนวนรายการสูงสุดต่อ request
+SAVE_MEALS_MAX_ITEMS = int(os.getenv('SAVE_MEALS_MAX_ITEMS', '50'))
 
 # ============================================
 # Database Connection Manager
 # ============================================
 @contextmanager
 def get_db_connection():
-    conn = None
+    """ยืม connection จาก pool ที่ใช้ร่วมกัน (คืนเข้า pool อัตโนมัติ)"""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        yield conn
+        with get_pool().connection() as conn:
+            yield conn
     except Error as e:
         logger.error("Database connection error: %s", e)
         raise
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
 
 # ============================================
 # Load Model and Classes
@@ -89,84 +102,205 @@ except Exception as e:
 # ============================================
 # Load Model
 # ============================================
-try:
-    MODEL_PATH = PROJECT_ROOT / 'models' / 'food_classification_model' / 'food_model.pth'
-    if not MODEL_PATH.exists():
-        raise FileNotFoundError(f"Model file not found: {MODEL_PATH}")
-
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-
-    from torchvision.models import efficientnet_b0
-    model = efficientnet_b0(pretrained=False)
-    model.classifier[1] = nn.Linear(model.classifier[1].in_features, len(class_to_idx))
-
-    checkpoint_raw = torch.load(MODEL_PATH, map_location=device)
-    checkpoint = checkpoint_raw.get('state_dict', checkpoint_raw)
-
-    def strip_prefix(state_dict, prefixes=('module.', 'backbone.')):
-        cleaned = {}
-        for k, v in state_dict.items():
-            for p in prefixes:
-                if k.startswith(p):
-                    k = k[len(p):]
-            cleaned[k] = v
-        return cleaned
-
-    load_result = model.load_state_dict(strip_prefix(checkpoint), strict=False)
-    if getattr(load_result, 'missing_keys', None):
-        logger.warning("Missing keys: %s", load_result.missing_keys)
-    if getattr(load_result, 'unexpected_keys', None):
-        logger.warning("Unexpected keys: %s", load_result.unexpected_keys)
-
-    model.to(device)
-    model.eval()
-    logger.info("✅ Model loaded successfully on %s", device)
-except Exception as e:
-    logger.exception("❌ Model load error: %s", e)
-    raise
+MODEL_DIR = PROJECT_ROOT / 'models' / 'food_classification_model'
+MODEL_PATH = MODEL_DIR / 'food_model.pth'
+INT8_MODEL_PATH = Path(os.getenv('FOOD_MODEL_INT8_PATH', str(MODEL_DIR / 'food_model_int8.pt')))
+ONNX_MODEL_PATH = Path(os.getenv('FOOD_MODEL_ONNX_PATH', str(MODEL_DIR / 'food_model.onnx')))
+
+# Inference backend: torch (eager PyTorch) | onnx (ONNX Runtime CPU)
+FOOD_INFERENCE_BACKEND = os.getenv('FOOD_INFERENCE_BACKEND', 'torch').lower()
+if FOOD_INFERENCE_BACKEND not in BACKENDS:
+    raise RuntimeError(f"Invalid FOOD_INFERENCE_BACKEND: {FOOD_INFERENCE_BACKEND}")
+
+# Quantized serving mode สำหรับ torch backend: none | static
+FOOD_MODEL_QUANTIZATION = os.getenv('FOOD_MODEL_QUANTIZATION', 'none').lower()
+if FOOD_MODEL_QUANTIZATION not in ('none', 'static'):
+    raise RuntimeError(f"Invalid FOOD_MODEL_QUANTIZATION: {FOOD_MODEL_QUANTIZATION}")
+
+ONNX_INTRA_OP_THREADS = int(os.getenv('ONNX_INTRA_OP_THREADS', '0'))
+
+
+# Warmup: รัน forward pass กับ dummy input ก่อนรับ traffic จริง
+# เพื่อให้ oneDNN/ONNX Runtime เตรียม kernel ของแต่ละ batch size ไว้ก่อน
+MODEL_WARMUP_RUNS = int(os.getenv('MODEL_WARMUP_RUNS', '2'))
+MODEL_WARMUP_BATCH_SIZES = sorted({
+    int(size) for size in os.getenv('MODEL_WARMUP_BATCH_SIZES', f'1,{INFER_MAX_BATCH_SIZE}').split(',')
+    if size.strip()
+})
+
+# โหลดโมเดลใน background thread เพื่อให้ server bind port ได้ทันที
+inference_backend = None
+model_ready = threading.Event()
+model_version = None
+model_status = {'status': 'not_started', 'backend': FOOD_INFERENCE_BACKEND, 'version': None,
+                'error': None, 'load_seconds': None, 'warmup_seconds': None}
+_model_load_lock = threading.Lock()
+_model_load_thread = None
+
+
+def load_inference_backend(threads=None):
+    """โหลด backend ใน process นี้ (threads = จำนวน intra-op thread, None = ค่าตั้งต้นของ backend)"""
+    if FOOD_INFERENCE_BACKEND == 'onnx':
+        return OnnxRuntimeBackend.load(ONNX_MODEL_PATH, ONNX_INTRA_OP_THREADS if threads is None else threads)
+    if threads is not None:
+        import torch
+        torch.set_num_threads(threads)
+    return TorchBackend.load(MODEL_PATH, INT8_MODEL_PATH, len(class_to_idx), FOOD_MODEL_QUANTIZATION)
+
+
+def create_inference_pool():
+    """fork inference process (แต่ละตัวโหลด + warmup โมเดลเอง) แล้วรอจนพร้อม"""
+    pool = InferencePool(
+        load_inference_backend,
+        processes=INFERENCE_POOL_PROCESSES,
+        threads=INFERENCE_POOL_THREADS,
+        num_classes=len(class_to_idx),
+        slots=INFERENCE_POOL_SLOTS,
+        slot_batch_size=INFER_MAX_BATCH_SIZE,
+        input_shape=(3, IMAGE_SIZE, IMAGE_SIZE),
+        timeout_s=INFER_TIMEOUT_S,
+        warmup=warmup_backend,
+    )
+    return pool.start()
+
+
+def compute_model_version():
+    """ระบุ artifact ที่ serve อยู่ (ใช้เป็นส่วนหนึ่งของ prediction cache key)"""
+    if FOOD_INFERENCE_BACKEND == 'onnx':
+        path = ONNX_MODEL_PATH
+    elif FOOD_MODEL_QUANTIZATION == 'static':
+        path = INT8_MODEL_PATH
+    else:
+        path = MODEL_PATH
+    files = [path]
+    if FOOD_INFERENCE_BACKEND == 'onnx':
+        # weights ที่ export แยกเป็น external data (food_model.onnx.data) เปลี่ยนได้โดยไฟล์ .onnx ไม่เปลี่ยน
+        data_path = path.with_name(path.name + '.data')
+        if data_path.exists():
+            files.append(data_path)
+    raw = f"{FOOD_INFERENCE_BACKEND}:{FOOD_MODEL_QUANTIZATION}"
+    for file in files:
+        stat = file.stat()
+        raw += f":{file.name}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+def warmup_backend(backend):
+    dummy = np.zeros((max(MODEL_WARMUP_BATCH_SIZES), 3, IMAGE_SIZE, IMAGE_SIZE), dtype=np.float32)
+    for batch_size in MODEL_WARMUP_BATCH_SIZES:
+        for _ in range(MODEL_WARMUP_RUNS):
+            backend.forward(dummy[:batch_size])
+
+
+def load_model():
+    """โหลด + warmup โมเดล (blocking) แล้วตั้ง model_ready"""
+    global inference_backend, model_version
+    try:
+        model_status['status'] = 'loading'
+        started = time.perf_counter()
+        if INFERENCE_POOL_PROCESSES > 0:
+            # process ใน pool warmup ตัวเองก่อนรายงานว่าพร้อม
+            backend = create_inference_pool()
+        else:
+            backend = load_inference_backend()
+        model_version = model_status['version'] = compute_model_version()
+        model_status['load_seconds'] = round(time.perf_counter() - started, 3)
+        logger.info("✅ Model loaded successfully (backend=%s) in %.2fs", backend.name, model_status['load_seconds'])
+
+        if not isinstance(backend, InferencePool):
+            model_status['status'] = 'warming_up'
+            started = time.perf_counter()
+            warmup_backend(backend)
+            model_status['warmup_seconds'] = round(time.perf_counter() - started, 3)
+            logger.info("✅ Model warmup done (batch sizes=%s, runs=%d) in %.2fs",
+                        MODEL_WARMUP_BATCH_SIZES, MODEL_WARMUP_RUNS, model_status['warmup_seconds'])
+
+        # โหลด Foods catalog ล่วงหน้า เพื่อไม่ให้ request แรกต้องรอ (ถ้า DB ยังไม่พร้อมจะโหลดตอนใช้งานจริง)
+        # ไม่เริ่ม refresher ที่นี่ (อาจเป็น gunicorn master) refresher เริ่มเมื่อใช้ catalog ครั้งแรก
+        try:
+            food_catalog.preload()
+        except Exception as e:
+            logger.warning("Food catalog preload failed: %s", e)
 
-# ============================================
-# Image Transform
-# ============================================
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                         std=[0.229, 0.224, 0.225])
-])
+        inference_backend = backend
+        model_status['status'] = 'ready'
+        model_ready.set()
+    except Exception as e:
+        model_status['status'] = 'failed'
+        model_status['error'] = str(e)
+        logger.exception("❌ Model load error: %s", e)
+
+
+def start_model_loading():
+    """
+    เริ่มโหลดโมเดลใน background thread (เรียกซ้ำได้ จะโหลดครั้งเดียว)
+    ยกเว้น INFERENCE_POOL_PROCESSES > 0: pool ต้อง os.fork ก่อนมี thread อื่นทำงานอยู่
+    จึงโหลดแบบ blocking ใน main thread (dev server: ตอน import flask_server ก่อนเริ่ม serve) คืน None
+    """
+    global _model_load_thread
+    if INFERENCE_POOL_PROCESSES > 0:
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("INFERENCE_POOL_PROCESSES > 0 requires loading the model on the main thread "
+                               "before serving (use gunicorn -c gunicorn.conf.py)")
+        with _model_load_lock:
+            if model_status['status'] == 'not_started':
+                load_model()
+        return None
+    with _model_load_lock:
+        if _model_load_thread is None:
+            _model_load_thread = threading.Thread(target=load_model, name="model-loader", daemon=True)
+            _model_load_thread.start()
+    return _model_load_thread
+
+
+def is_model_ready():
+    return model_ready.is_set()
 
 # ============================================
-# JWT Helpers
+# Batched Inference
 # ============================================
-def verify_token(token: str):
-    try:
-        if not token:
-            return None
-        if token.startswith("Bearer "):
-            token = token[7:].strip()
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return int(payload.get("userId") or payload.get("user_id") or payload.get("sub"))
-    except jwt.ExpiredSignatureError:
-        logger.warning("Token expired")
-        return None
-    except jwt.InvalidTokenError:
-        logger.warning("Invalid token")
-        return None
-    except Exception as e:
-        logger.error("Token verify error: %s", e)
-        return None
+def run_inference_batch(arrays):
+    """รัน forward pass ครั้งเดียวสำหรับหลายภาพ คืน [(class_idx, confidence), ...] ตามลำดับ"""
+    probs = inference_backend.predict_proba(np.stack(arrays))
+    indices = probs.argmax(axis=1)
+    return [(int(idx), float(probs[row, idx])) for row, idx in enumerate(indices)]
+
+
+inference_batcher = MicroBatcher(
+    run_inference_batch,
+    max_batch_size=INFER_MAX_BATCH_SIZE,
+    max_wait_ms=INFER_MAX_WAIT_MS,
+    name="food-detect",
+)
+
+
+# Thread pool สำหรับ decode ภาพแบบขนาน (PIL ปล่อย GIL ระหว่าง decode)
+_decode_pool = ThreadPoolExecutor(max_workers=PREDICT_DECODE_WORKERS, thread_name_prefix="image-decode")
+
+
+def _reinit_decode_pool_after_fork():
+    # thread ของ executor ไม่ได้ตามมาใน process ลูก สร้างใหม่ (thread เริ่มเมื่อมีงานแรก)
+    global _decode_pool
+    _decode_pool = ThreadPoolExecutor(max_workers=PREDICT_DECODE_WORKERS, thread_name_prefix="image-decode")
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_decode_pool_after_fork)
+
+
+prediction_cache = PredictionCache(max_entries=PREDICTION_CACHE_SIZE, ttl_s=PREDICTION_CACHE_TTL_S)
 
 
-def require_auth(f):
-    @wraps(f)
-    def wrapper(*args, **kwargs):
-        token = request.headers.get("Authorization") or request.headers.get("authorization")
-        user_id = verify_token(token)
-        if not user_id:
-            return jsonify({'error': 'Unauthorized', 'message': 'Invalid or missing token'}), 401
-        request.user_id = user_id
-        return f(*args, **kwargs)
-    return wrapper
+def inference_stats():
+    """queue depth / batch size ที่ได้จริง สำหรับ monitoring"""
+    stats = inference_batcher.stats()
+    if isinstance(inference_backend, InferencePool):
+        stats["pool"] = inference_backend.stats()
+    return stats
+
+
+def prediction_cache_stats():
+    return prediction_cache.stats()
 
 # ============================================
 # DB Helper Functions
@@ -186,144 +320,354 @@ def validate_user_exists(user_id):
 
 def validate_food_exists(food_id):
     try:
-        with get_db_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT 1 FROM Foods WHERE food_id = %s", (food_id,))
-            exists = cur.fetchone() is not None
-            cur.close()
-            return exists
+        return food_catalog.get_by_id(food_id, refresh_on_miss=True) is not None
     except Exception as e:
         logger.error("validate_food_exists failed: %s", e)
         return False
 
 
 def get_nutrition_data(food_name):
+    """ข้อมูลโภชนาการจาก Foods catalog cache (ไม่ query DB ใน predict path)"""
     try:
-        with get_db_connection() as conn:
-            cur = conn.cursor(dictionary=True)
-            cur.execute("SELECT * FROM Foods WHERE food_name = %s", (food_name,))
-            result = cur.fetchone()
-            cur.close()
-            return result
+        return food_catalog.get_by_name(food_name)
     except Exception as e:
         logger.error("get_nutrition_data failed: %s", e)
         return None
 
+
+def get_nutrition_data_bulk(food_names):
+    """ข้อมูลโภชนาการหลายเมนู คืน dict {food_name: row}"""
+    try:
+        return food_catalog.get_many_by_name(food_names)
+    except Exception as e:
+        logger.error("get_nutrition_data_bulk failed: %s", e)
+        return {}
+
 # ============================================
 # Save Meal to DB
 # ============================================
-def save_meal_to_db(user_id, data):
+class MealSaveError(Exception):
+    """ข้อมูลที่ส่งมาบันทึกไม่ได้ (ผู้ใช้/อาหารไม่มีในระบบ)"""
+
+
+def _parse_meal_item(data):
+    """ตรวจ/แปลงข้อมูลมื้ออาหารหนึ่งรายการ คืน (food_id, confidence_score, datetime)"""
+    if not isinstance(data, dict):
+        raise MealSaveError('Invalid meal item')
+
+    food_id = data.get('food_id')
+    if not food_id:
+        raise MealSaveError('food_id is required')
+
+    confidence_score = data.get('confidence_score')
+    if confidence_score is not None:
+        try:
+            confidence_score = float(confidence_score)
+        except Exception:
+            raise MealSaveError('Invalid confidence_score')
+        if not (0 <= confidence_score <= 1):
+            raise MealSaveError('confidence_score must be 0-1')
+
+    meal_datetime = data.get('meal_datetime')
+    if meal_datetime:
+        try:
+            dt = datetime.strptime(meal_datetime, '%Y-%m-%d %H:%M:%S')
+        except (TypeError, ValueError):
+            raise MealSaveError('Invalid meal_datetime format. Use YYYY-MM-DD HH:MM:SS')
+    else:
+        dt = datetime.now()
+
+    return food_id, confidence_score, dt
+
+
+def _upsert_meal(cur, user_id, meal_date=None):
+    """
+    แถว Meals ของวัน meal_date (None = วันนี้) สร้างถ้ายังไม่มี
+    FK ไป users ใช้ตรวจว่าผู้ใช้มีอยู่จริง คืน meal_id
+    """
     try:
-        food_id = data.get('food_id')
-        if not food_id:
-            return {'success': False, 'error': 'food_id is required'}
+        # วันนี้ใช้ CURDATE() ของ MySQL เพื่อให้แน่ใจว่าวันที่รีเซ็ตตอนเที่ยงคืนตาม timezone ของ database
+        cur.execute("""
+            INSERT INTO Meals (user_id, date)
+            VALUES (%s, COALESCE(%s, CURDATE()))
+            ON DUPLICATE KEY UPDATE meal_id = LAST_INSERT_ID(meal_id)
+        """, (user_id, meal_date))
+    except IntegrityError as e:
+        if e.errno == errorcode.ER_NO_REFERENCED_ROW_2:
+            raise MealSaveError('User not found')
+        raise
+    return cur.lastrowid
 
-        if not validate_user_exists(user_id):
-            return {'success': False, 'error': 'User not found'}
-        if not validate_food_exists(food_id):
-            return {'success': False, 'error': 'Food not found'}
 
-        confidence_score = data.get('confidence_score')
-        if confidence_score is not None:
-            try:
-                confidence_score = float(confidence_score)
-                if not (0 <= confidence_score <= 1):
-                    return {'success': False, 'error': 'confidence_score must be 0-1'}
-            except Exception:
-                return {'success': False, 'error': 'Invalid confidence_score'}
-
-        meal_datetime = data.get('meal_datetime')
-        if meal_datetime:
-            try:
-                dt = datetime.strptime(meal_datetime, '%Y-%m-%d %H:%M:%S')
-            except ValueError:
-                return {'success': False, 'error': 'Invalid meal_datetime format. Use YYYY-MM-DD HH:MM:SS'}
-        else:
-            dt = datetime.now()
+def _insert_meal(cur, user_id, food_id, meal_time, confidence_score):
+    """
+    Insert Meals/MealDetails/AIAnalysis บน cursor ของ transaction ที่เปิดอยู่
+    ไม่ SELECT ตรวจก่อน ให้ FK ของ Meals (users) และ MealDetails (foods) เป็นตัวตรวจแทน
+    คืน (meal_id, meal_detail_id, analysis_id)
+    """
+    meal_id = _upsert_meal(cur, user_id)
 
-        with get_db_connection() as conn:
-            cur = conn.cursor()
-            conn.start_transaction()
+    try:
+        cur.execute("""
+            INSERT INTO MealDetails (meal_id, food_id, meal_time)
+            VALUES (%s, %s, %s)
+        """, (meal_id, food_id, meal_time))
+    except IntegrityError as e:
+        if e.errno == errorcode.ER_NO_REFERENCED_ROW_2:
+            raise MealSaveError('Food not found')
+        raise
+    meal_detail_id = cur.lastrowid
 
-            # ใช้ CURDATE() ของ MySQL เพื่อให้แน่ใจว่าวันที่รีเซ็ตตอนเที่ยงคืนตาม timezone ของ database
-            cur.execute("""
-                INSERT INTO Meals (user_id, date)
-                VALUES (%s, CURDATE())
-                ON DUPLICATE KEY UPDATE meal_id = LAST_INSERT_ID(meal_id)
-            """, (user_id,))
-            meal_id = cur.lastrowid
+    analysis_id = None
+    if confidence_score is not None:
+        cur.execute("""
+            INSERT INTO AIAnalysis (user_id, food_id, confidence_score)
+            VALUES (%s, %s, %s)
+        """, (user_id, food_id, confidence_score))
+        analysis_id = cur.lastrowid
+
+    return meal_id, meal_detail_id, analysis_id
 
-            cur.execute("""
-                INSERT INTO MealDetails (meal_id, food_id, meal_time)
-                VALUES (%s, %s, %s)
-            """, (meal_id, food_id, dt.time()))
-            meal_detail_id = cur.lastrowid
-
-            analysis_id = None
-            if confidence_score is not None:
-                cur.execute("""
-                    INSERT INTO AIAnalysis (user_id, food_id, confidence_score)
-                    VALUES (%s, %s, %s)
-                """, (user_id, food_id, confidence_score))
-                analysis_id = cur.lastrowid
+
+def save_meal_to_db(user_id, data):
+    """
+    บันทึกมื้ออาหาร + อัปเดต DailyCalories ใน connection เดียว transaction เดียว
+    round trip: INSERT Meals, INSERT MealDetails, (INSERT AIAnalysis), UPDATE DailyCalories,
+    UPSERT CalorieRollups, COMMIT
+    """
+    try:
+        try:
+            food_id, confidence_score, dt = _parse_meal_item(data)
+        except MealSaveError as e:
+            return {'success': False, 'error': str(e)}
+
+        # autocommit ปิดอยู่ statement แรกจะเปิด transaction เอง (ไม่ต้องส่ง START TRANSACTION แยก)
+        # ถ้า error ก่อน commit pool จะ rollback ตอนคืน connection
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            try:
+                meal_id, meal_detail_id, analysis_id = _insert_meal(
+                    cur, user_id, food_id, dt.time(), confidence_score
+                )
+            except MealSaveError as e:
+                conn.rollback()
+                return {'success': False, 'error': str(e)}
+
+            # บวกแคลอรี่ของมื้อนี้เข้ายอดของวัน (ใช้วันปัจจุบันของ MySQL) ใน transaction เดียวกับการ insert
+            calories_updated = _add_consumed_calories(cur, user_id, food_id)
+            # ยอดรายวัน/สัปดาห์/เดือน (CalorieRollups) ใน transaction เดียวกัน
+            add_meal_rollups(cur, user_id, {food_id: 1})
 
             conn.commit()
             cur.close()
 
-            # อัปเดตแคลอรี่รวมของวัน (ใช้วันปัจจุบันของ MySQL)
-            update_consumed_calories(user_id)
+        # หลัง commit เท่านั้น (rollback แล้ว cache ต้องไม่เห็นมื้อนี้)
+        food_history.record(user_id, [food_id])
+        if not calories_updated:
+            logger.warning(f"⚠️ No DailyCalories record found for user {user_id} today")
 
-            result = {
-                'success': True,
-                'meal_id': meal_id,
-                'meal_detail_id': meal_detail_id,
-                'meal_date': dt.strftime('%Y-%m-%d'),
-                'meal_time': dt.strftime('%H:%M:%S'),
-                'message': 'Meal saved successfully'
-            }
-            if analysis_id:
-                result['analysis_id'] = analysis_id
-            return result
+        result = {
+            'success': True,
+            'meal_id': meal_id,
+            'meal_detail_id': meal_detail_id,
+            'meal_date': dt.strftime('%Y-%m-%d'),
+            'meal_time': dt.strftime('%H:%M:%S'),
+            'message': 'Meal saved successfully'
+        }
+        if analysis_id:
+            result['analysis_id'] = analysis_id
+        return result
 
     except Exception as e:
         logger.exception("save_meal_to_db error: %s", e)
         return {'success': False, 'error': 'Database error'}
 
+def _inserted_ids(cur, table, id_column, owner_column, owner_id, first_id, count):
+    """
+    id ของแถวที่ executemany (multi-row INSERT) เพิ่งเพิ่ม อ่านกลับใน transaction เดียวกัน
+    ไม่คำนวณจาก first_id + ลำดับ: auto_increment_increment > 1 (replication/Galera)
+    หรือ innodb_autoinc_lock_mode=2 ทำให้ id ไม่ต่อเนื่อง
+    snapshot ของ transaction (REPEATABLE READ) ถูกสร้างตั้งแต่ SELECT Foods ก่อน insert
+    แถวของ transaction อื่นที่ได้ id ตามหลังจึงมองไม่เห็น
+    """
+    cur.execute(f"""
+        SELECT {id_column} FROM {table}
+        WHERE {owner_column} = %s AND {id_column} >= %s
+        ORDER BY {id_column}
+        LIMIT %s
+    """, (owner_id, first_id, count))
+    ids = [row[0] for row in cur.fetchall()]
+    if len(ids) != count:
+        raise RuntimeError(f"Expected {count} new {table} rows, found {len(ids)}")
+    return ids
+
+
+def save_meals_to_db(user_id, items):
+    """
+    บันทึกหลายมื้อในคราวเดียว (เช่น หลังถ่ายรูปหลายจาน หรือ client offline sync)
+    รายการถูกจัดกลุ่มตามวันของ meal_datetime (ไม่ส่ง = วันนี้) แต่ละวันเขียนแถว Meals,
+    DailyCalories และ CalorieRollups ของวันนั้นเอง ทั้งหมดอยู่ใน connection เดียว transaction เดียว:
+      SELECT Foods (ตรวจ food_id ทั้งหมดใน query เดียว), ต่อวัน: INSERT Meals,
+      INSERT MealDetails (executemany) + SELECT id กลับ, UPDATE DailyCalories, UPSERT CalorieRollups
+      แล้ว INSERT AIAnalysis (executemany) + SELECT id กลับ, COMMIT
+    รายการที่ไม่ผ่านจะมี error ของตัวเอง รายการอื่นยังถูกบันทึก
+    """
+    try:
+        if not isinstance(items, list) or not items:
+            return {'success': False, 'error': 'items must be a non-empty list'}
+        if len(items) > SAVE_MEALS_MAX_ITEMS:
+            return {'success': False, 'error': f'Too many items. Max {SAVE_MEALS_MAX_ITEMS}'}
+
+        results = [None] * len(items)
+        parsed = []  # (index, food_id, confidence_score, dt, meal_date) meal_date None = วันนี้ของ MySQL
+        for i, data in enumerate(items):
+            try:
+                food_id, confidence_score, dt = _parse_meal_item(data)
+                meal_date = dt.date() if data.get('meal_datetime') else None
+                parsed.append((i, int(food_id), confidence_score, dt, meal_date))
+            except (TypeError, ValueError):
+                results[i] = {'success': False, 'error': 'Invalid food_id'}
+            except MealSaveError as e:
+                results[i] = {'success': False, 'error': str(e)}
+
+        saved = []
+        if parsed:
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                food_ids = sorted({item[1] for item in parsed})
+                placeholders = ', '.join(['%s'] * len(food_ids))
+                cur.execute(f"SELECT food_id, calories FROM Foods WHERE food_id IN ({placeholders})", food_ids)
+                calories = {row[0]: row[1] for row in cur.fetchall()}
+
+                by_date = {}
+                for item in parsed:
+                    if item[1] in calories:
+                        saved.append(item)
+                        by_date.setdefault(item[4], []).append(item)
+                    else:
+                        results[item[0]] = {'success': False, 'error': 'Food not found'}
+
+                meal_ids = {}        # index -> meal_id
+                detail_ids = {}      # index -> meal_detail_id
+                for meal_date, group in by_date.items():
+                    try:
+                        meal_id = _upsert_meal(cur, user_id, meal_date)
+                    except MealSaveError as e:
+                        conn.rollback()
+                        return {'success': False, 'error': str(e)}
+
+                    # executemany ของ INSERT ... VALUES ถูกรวมเป็น multi-row INSERT (round trip เดียว)
+                    cur.executemany("""
+                        INSERT INTO MealDetails (meal_id, food_id, meal_time)
+                        VALUES (%s, %s, %s)
+                    """, [(meal_id, food_id, dt.time()) for _, food_id, _, dt, _ in group])
+                    ids = _inserted_ids(cur, 'MealDetails', 'meal_detail_id', 'meal_id', meal_id,
+                                        cur.lastrowid, len(group))
+                    for (i, _, _, _, _), meal_detail_id in zip(group, ids):
+                        meal_ids[i] = meal_id
+                        detail_ids[i] = meal_detail_id
+
+                    cur.execute("""
+                        UPDATE DailyCalories
+                        SET consumed_calories = COALESCE(consumed_calories, 0) + %s
+                        WHERE user_id = %s AND date = COALESCE(%s, CURDATE())
+                    """, (sum(calories[food_id] for _, food_id, _, _, _ in group), user_id, meal_date))
+                    if cur.rowcount == 0:
+                        logger.warning(f"⚠️ No DailyCalories record found for user {user_id} "
+                                       f"on {meal_date or 'today'}")
+                    add_meal_rollups(cur, user_id, Counter(food_id for _, food_id, _, _, _ in group), meal_date)
+
+                scored = [item for item in saved if item[2] is not None]
+                analysis_ids = {}
+                if scored:
+                    cur.executemany("""
+                        INSERT INTO AIAnalysis (user_id, food_id, confidence_score)
+                        VALUES (%s, %s, %s)
+                    """, [(user_id, food_id, score) for _, food_id, score, _, _ in scored])
+                    ids = _inserted_ids(cur, 'AIAnalysis', 'analysis_id', 'user_id', user_id,
+                                        cur.lastrowid, len(scored))
+                    analysis_ids = {item[0]: analysis_id for item, analysis_id in zip(scored, ids)}
+
+                conn.commit()
+                cur.close()
+
+            for meal_date, group in by_date.items():
+                food_history.record(user_id, [food_id for _, food_id, _, _, _ in group], meal_date)
+
+            for i, _, _, dt, _ in saved:
+                result = {
+                    'success': True,
+                    'meal_id': meal_ids[i],
+                    'meal_detail_id': detail_ids[i],
+                    'meal_date': dt.strftime('%Y-%m-%d'),
+                    'meal_time': dt.strftime('%H:%M:%S'),
+                }
+                if i in analysis_ids:
+                    result['analysis_id'] = analysis_ids[i]
+                results[i] = result
+
+        for i, result in enumerate(results):
+            result['index'] = i
+
+        result = {
+            'success': bool(saved),
+            'saved': len(saved),
+            'failed': len(items) - len(saved),
+            'results': results
+        }
+        if not saved:
+            result['error'] = 'No meal items were saved'
+        return result
+
+    except Exception as e:
+        logger.exception("save_meals_to_db error: %s", e)
+        return {'success': False, 'error': 'Database error'}
+
 # ============================================
 # Update Consumed Calories
 # ============================================
+def _add_consumed_calories(cur, user_id, food_id):
+    """
+    บวกแคลอรี่ของอาหารเข้า consumed_calories ของวันนี้แบบ delta (atomic ใน UPDATE เดียว)
+    ไม่ aggregate ทั้งวันใหม่ทุกครั้ง ความคลาดเคลื่อน (เช่น แก้ calories ของ Foods ภายหลัง,
+    แถว DailyCalories ถูกสร้างหลังบันทึกมื้อ) ซ่อมด้วย flask_app.calorie_reconcile
+    คืน True ถ้ามีแถว DailyCalories ของวันนี้
+    """
+    cur.execute("""
+        UPDATE DailyCalories
+        SET consumed_calories = COALESCE(consumed_calories, 0)
+            + (SELECT calories FROM Foods WHERE food_id = %s)
+        WHERE user_id = %s AND date = CURDATE()
+    """, (food_id, user_id))
+    return cur.rowcount > 0
+
+
 def update_consumed_calories(user_id):
-    """อัปเดตแคลอรี่ที่กินไปในวันปัจจุบัน (ใช้ CURDATE() ของ MySQL)"""
+    """
+    คำนวณแคลอรี่ที่กินไปในวันปัจจุบันใหม่ทั้งหมด (ใช้ CURDATE() ของ MySQL)
+    ไม่ได้ใช้ใน save path แล้ว ใช้ซ่อมข้อมูลรายผู้ใช้ (ช่วงหลายวันใช้ calorie_reconcile)
+    """
     try:
         with get_db_connection() as conn:
-            cur = conn.cursor(dictionary=True)
-
-            # คำนวณแคลอรี่รวมจากอาหารที่กินไปในวันปัจจุบัน (ใช้ CURDATE())
-            cur.execute("""
-                SELECT SUM(f.calories) AS totalCalories
-                FROM Meals m
-                JOIN MealDetails md ON m.meal_id = md.meal_id
-                JOIN Foods f ON md.food_id = f.food_id
-                WHERE m.user_id = %s AND m.date = CURDATE()
-            """, (user_id,))
-
-            result = cur.fetchone()
-            total_consumed = result['totalCalories'] if result and result['totalCalories'] else 0
-
-            # อัปเดต consumed_calories ลง DailyCalories (ใช้ CURDATE())
+            cur = conn.cursor()
             # (ต้องมีข้อมูล DailyCalories ของวันนี้อยู่แล้ว)
             cur.execute("""
                 UPDATE DailyCalories
-                SET consumed_calories = %s
+                SET consumed_calories = (
+                    SELECT COALESCE(SUM(f.calories), 0)
+                    FROM Meals m
+                    JOIN MealDetails md ON m.meal_id = md.meal_id
+                    JOIN Foods f ON md.food_id = f.food_id
+                    WHERE m.user_id = %s AND m.date = CURDATE()
+                )
                 WHERE user_id = %s AND date = CURDATE()
-            """, (total_consumed, user_id))
-
-            affected_rows = cur.rowcount
+            """, (user_id, user_id))
+            updated = cur.rowcount > 0
             conn.commit()
             cur.close()
 
-            if affected_rows > 0:
-                logger.info(f"✅ Updated consumed_calories for user {user_id}: {total_consumed} kcal")
+            if updated:
+                logger.info(f"✅ Updated consumed_calories for user {user_id}")
                 return True
             else:
                 logger.warning(f"⚠️ No DailyCalories record found for user {user_id} today")
@@ -336,57 +680,127 @@ def update_consumed_calories(user_id):
 # ============================================
 # Prediction
 # ============================================
+def upload_cache_key(buffer):
+    """prediction cache key จาก buffer ของ request โดยตรง (hash ผ่าน memoryview ไม่ copy เป็น bytes)"""
+    with buffer.getbuffer() as view:
+        return content_key(view, model_version)
+
+
+def build_prediction(idx, confidence, nutrition_lookup):
+    """แปลง class index + confidence เป็น response พร้อมข้อมูลโภชนาการ"""
+    class_folder = idx_to_class.get(idx)
+    if not class_folder:
+        return {'success': False, 'error': 'Unknown class index'}
+
+    food_name = class_names.get(class_folder, class_folder)
+    nutrition = nutrition_lookup(food_name)
+
+    response = {
+        'success': True,
+        'predicted_food': food_name,
+        'confidence': round(confidence, 4)
+    }
+
+    if nutrition:
+        response.update({
+            'food_id': nutrition.get('food_id'),
+            'nutrition': {
+                'calories': float(nutrition.get('calories') or 0),
+                'protein_gram': float(nutrition.get('protein_gram') or 0),
+                'carbohydrate_gram': float(nutrition.get('carbohydrate_gram') or 0),
+                'fat_gram': float(nutrition.get('fat_gram') or 0)
+            }
+        })
+    else:
+        response['warning'] = 'Nutrition data not found'
+    return response
+
+
 def predict_food_image(file):
     try:
-        allowed_ext = {'.jpg', '.jpeg', '.png', '.webp'}
-        filename = (file.filename or "").lower()
-        ext = os.path.splitext(filename)[1]
-        if ext not in allowed_ext:
-            return {'success': False, 'error': f'Invalid file type: {ext}'}
+        if not is_model_ready():
+            return {'success': False, 'error': 'Model is not ready'}
 
-        content = file.read()
-        if len(content) > 10 * 1024 * 1024:
-            return {'success': False, 'error': 'File too large (max 10MB)'}
+        # file ผ่าน validate_image_upload() ที่ route แล้ว ส่ง buffer เดิมให้ decoder โดยตรง
+        buffer = upload_buffer(file)
 
-        try:
-            image = Image.open(io.BytesIO(content)).convert('RGB')
-        except UnidentifiedImageError:
-            return {'success': False, 'error': 'Invalid image file'}
+        # รูปเดิม + โมเดลเดิม ใช้ผลเดิมได้ (request ซ้ำที่มาพร้อมกันจะรอ inference ครั้งเดียว)
+        idx, confidence = prediction_cache.get_or_compute(
+            upload_cache_key(buffer),
+            lambda: inference_batcher.submit(decode_image(buffer), timeout=INFER_TIMEOUT_S),
+        )
+        return build_prediction(idx, confidence, get_nutrition_data)
 
-        tensor = transform(image).unsqueeze(0).to(device)
-        with torch.no_grad():
-            outputs = model(tensor)
-            probs = torch.softmax(outputs, dim=1)[0]
-            idx = torch.argmax(probs).item()
-            confidence = float(probs[idx])
+    except InvalidImageError as e:
+        return {'success': False, 'error': str(e)}
+    except Exception as e:
+        logger.exception("Prediction failed: %s", e)
+        return {'success': False, 'error': 'Prediction failed'}
 
-        class_folder = idx_to_class.get(idx)
-        if not class_folder:
-            return {'success': False, 'error': 'Unknown class index'}
 
-        food_name = class_names.get(class_folder, class_folder)
-        nutrition = get_nutrition_data(food_name)
+def predict_food_images(files):
+    """
+    Predict หลายภาพใน request เดียว
+    - ภาพที่เคย predict แล้ว (prediction cache) ไม่ต้อง decode/inference ซ้ำ
+    - decode/transform แบบขนานด้วย thread pool
+    - forward pass แบบ batch ครั้งเดียว (แบ่งตาม PREDICT_BATCH_MAX_IMAGES)
+    - ดึงโภชนาการทุกเมนูด้วย lookup เดียว
+    คืน list ผลลัพธ์ตามลำดับไฟล์ ภาพที่ผิดพลาดจะมี error เฉพาะภาพนั้น
+    """
+    results = [None] * len(files)
+    if not is_model_ready():
+        return [{'success': False, 'error': 'Model is not ready'} for _ in files]
+
+    predictions = {}
+    pending = []  # (index, buffer, cache_key)
+    for i, file in enumerate(files):
+        buffer = upload_buffer(file)
+        key = upload_cache_key(buffer)
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            predictions[i] = cached
+        else:
+            pending.append((i, buffer, key))
 
-        response = {
-            'success': True,
-            'predicted_food': food_name,
-            'confidence': round(confidence, 4)
-        }
+    decoded = list(_decode_pool.map(_safe_decode_image, [buffer for _, buffer, _ in pending]))
 
-        if nutrition:
-            response.update({
-                'food_id': nutrition.get('food_id'),
-                'nutrition': {
-                    'calories': float(nutrition.get('calories') or 0),
-                    'protein_gram': float(nutrition.get('protein_gram') or 0),
-                    'carbohydrate_gram': float(nutrition.get('carbohydrate_gram') or 0),
-                    'fat_gram': float(nutrition.get('fat_gram') or 0)
-                }
-            })
+    ready = []
+    for (i, _, key), (array, error) in zip(pending, decoded):
+        if error:
+            results[i] = {'success': False, 'error': error}
         else:
-            response['warning'] = 'Nutrition data not found'
-        return response
+            ready.append((i, key, array))
 
+    try:
+        for start in range(0, len(ready), PREDICT_BATCH_MAX_IMAGES):
+            chunk = ready[start:start + PREDICT_BATCH_MAX_IMAGES]
+            outputs = run_inference_batch([array for _, _, array in chunk])
+            for (i, key, _), output in zip(chunk, outputs):
+                predictions[i] = output
+                prediction_cache.put(key, output)
     except Exception as e:
-        logger.exception("Prediction failed: %s", e)
-        return {'success': False, 'error': 'Prediction failed'}
+        logger.exception("Batch prediction failed: %s", e)
+        for i, _, _ in ready:
+            results[i] = {'success': False, 'error': 'Prediction failed'}
+        ready_indices = {i for i, _, _ in ready}
+        predictions = {i: p for i, p in predictions.items() if i not in ready_indices}
+
+    food_names = [
+        class_names.get(idx_to_class[idx], idx_to_class[idx])
+        for idx, _ in predictions.values() if idx in idx_to_class
+    ]
+    nutrition_rows = get_nutrition_data_bulk(food_names)
+
+    for i, (idx, confidence) in predictions.items():
+        results[i] = build_prediction(idx, confidence, nutrition_rows.get)
+    return results
+
+
+def _safe_decode_image(buffer):
+    try:
+        return decode_image(buffer), None
+    except InvalidImageError as e:
+        return None, str(e)
+    except Exception as e:
+        logger.exception("Image decode failed: %s", e)
+        return None, 'Invalid image file'
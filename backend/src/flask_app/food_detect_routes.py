@@ -3,10 +3,8 @@ import logging
 import os
 from pathlib import Path
 from flask import Blueprint, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
-import jwt
-from jwt import ExpiredSignatureError, InvalidTokenError
-from functools import wraps
 
 # -----------------------------
 # Blueprint & Logger
@@ -14,50 +12,28 @@ from functools import wraps
 food_detect_bp = Blueprint("food_detect", __name__)
 logger = logging.getLogger(__name__)
 
-ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+MAX_BATCH_IMAGES = int(os.getenv("PREDICT_BATCH_MAX_IMAGES", "16"))
 
 # -----------------------------
-# Auth decorator: ตรวจสอบ JWT และใส่ user_id ลง request
+# Auth decorator: ตรวจสอบ JWT และใส่ user_id ลง request (ใช้ร่วมกันทุก blueprint)
 # -----------------------------
-def require_auth(f):
-    @wraps(f)
-    def wrapper(*args, **kwargs):
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            return jsonify({"success": False, "message": "Invalid or missing token"}), 401
-
-        token = auth_header.split(" ")[1]
-        try:
-            payload = jwt.decode(token, os.getenv("JWT_SECRET"), algorithms=["HS256"])
-            request.user_id = payload["id"]
-        except ExpiredSignatureError:
-            return jsonify({"success": False, "message": "Token expired"}), 401
-        except InvalidTokenError:
-            return jsonify({"success": False, "message": "Invalid token"}), 401
-
-        return f(*args, **kwargs)
-    return wrapper
+from flask_app.auth import require_auth, verify_user_access
 
 # -----------------------------
 # Helper functions
 # -----------------------------
-def verify_user_access(user_id_from_token, user_id_from_path):
-    """ตรวจสอบว่า user ที่ทำ request ตรงกับ userId ใน path"""
-    try:
-        return int(user_id_from_token) == int(user_id_from_path)
-    except (ValueError, TypeError):
-        return False
-
-def allowed_file(filename: str) -> bool:
-    """ตรวจสอบนามสกุลไฟล์ที่อนุญาต"""
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+def upload_too_large_response():
+    return jsonify({
+        "success": False,
+        "message": f"Request too large. Max {UPLOAD_MAX_BYTES // (1024 * 1024)}MB per image"
+    }), 413
 
 # -----------------------------
 # Import model functions
 # -----------------------------
 try:
-    from flask_app.food_detect import predict_food_image, save_meal_to_db
+    from flask_app.uploads import UPLOAD_MAX_BYTES, max_request_bytes, upload_limit, validate_image_upload
+    from flask_app.food_detect import is_model_ready, predict_food_image, predict_food_images, save_meal_to_db, save_meals_to_db
 except ImportError as e:
     logger.error(f"Cannot import food_detect module: {e}")
     raise
@@ -66,6 +42,7 @@ except ImportError as e:
 # Routes
 # -----------------------------
 @food_detect_bp.route("/api/predict-food/<int:userId>", methods=["POST"])
+@upload_limit(max_request_bytes(1))
 @require_auth
 def predict_food(userId):
     """Predict ชื่ออาหารจากรูปภาพและดึงข้อมูลโภชนาการ"""
@@ -73,19 +50,16 @@ def predict_food(userId):
         if not verify_user_access(request.user_id, userId):
             return jsonify({"success": False, "message": "Forbidden"}), 403
 
+        if not is_model_ready():
+            return jsonify({"success": False, "message": "Model is loading, please retry later"}), 503
+
         if "image" not in request.files:
             return jsonify({"success": False, "message": "No image file uploaded"}), 400
 
         file = request.files["image"]
-        if file.filename == "":
-            return jsonify({"success": False, "message": "Uploaded file has no name"}), 400
-        if not allowed_file(file.filename):
-            return jsonify({"success": False, "message": "Allowed types: png, jpg, jpeg"}), 400
-
-        file.seek(0, os.SEEK_END)
-        if file.tell() > MAX_FILE_SIZE:
-            return jsonify({"success": False, "message": "File too large. Max 5MB"}), 400
-        file.seek(0)
+        error = validate_image_upload(file)
+        if error:
+            return jsonify({"success": False, "message": error}), 400
 
         filename = secure_filename(file.filename)
         logger.info(f"Predicting food for user {userId} with file: {filename}")
@@ -94,10 +68,58 @@ def predict_food(userId):
         result["userId"] = userId
         return jsonify({"success": True, "data": result}), 200
 
+    except RequestEntityTooLarge:
+        return upload_too_large_response()
     except Exception as e:
         logger.exception(f"Error in predict_food for user {userId}: {e}")
         return jsonify({"success": False, "message": "Server error"}), 500
 
+@food_detect_bp.route("/api/predict-food-batch/<int:userId>", methods=["POST"])
+@upload_limit(max_request_bytes(MAX_BATCH_IMAGES))
+@require_auth
+def predict_food_batch(userId):
+    """Predict หลายภาพใน request เดียว (หลาย part ชื่อ image) ผลลัพธ์เรียงตามลำดับที่อัปโหลด"""
+    try:
+        if not verify_user_access(request.user_id, userId):
+            return jsonify({"success": False, "message": "Forbidden"}), 403
+
+        if not is_model_ready():
+            return jsonify({"success": False, "message": "Model is loading, please retry later"}), 503
+
+        files = request.files.getlist("image")
+        if not files:
+            return jsonify({"success": False, "message": "No image file uploaded"}), 400
+        if len(files) > MAX_BATCH_IMAGES:
+            return jsonify({"success": False, "message": f"Too many images. Max {MAX_BATCH_IMAGES}"}), 400
+
+        # ตรวจไฟล์ทีละภาพ ภาพที่ไม่ผ่านจะได้ error ของตัวเองโดยไม่กระทบภาพอื่น
+        results = [None] * len(files)
+        accepted = []
+        for i, file in enumerate(files):
+            error = validate_image_upload(file)
+            if error:
+                results[i] = {"success": False, "error": error}
+                continue
+            accepted.append(i)
+
+        logger.info(f"Batch predicting {len(accepted)}/{len(files)} images for user {userId}")
+
+        predictions = predict_food_images([files[i] for i in accepted]) if accepted else []
+        for i, prediction in zip(accepted, predictions):
+            results[i] = prediction
+
+        for i, (file, result) in enumerate(zip(files, results)):
+            result["index"] = i
+            result["filename"] = secure_filename(file.filename or "")
+
+        return jsonify({"success": True, "data": {"userId": userId, "results": results}}), 200
+
+    except RequestEntityTooLarge:
+        return upload_too_large_response()
+    except Exception as e:
+        logger.exception(f"Error in predict_food_batch for user {userId}: {e}")
+        return jsonify({"success": False, "message": "Server error"}), 500
+
 @food_detect_bp.route("/api/save-meal/<int:userId>", methods=["POST"])
 @require_auth
 def save_meal(userId):
@@ -121,3 +143,32 @@ def save_meal(userId):
     except Exception as e:
         logger.exception(f"Error in save_meal for user {userId}: {e}")
         return jsonify({"success": False, "message": "Server error"}), 500
+
+@food_detect_bp.route("/api/save-meals/<int:userId>", methods=["POST"])
+@require_auth
+def save_meals(userId):
+    """บันทึกหลายมื้อใน request เดียว body: {"items": [{food_id, meal_datetime, confidence_score}, ...]}"""
+    try:
+        if not verify_user_access(request.user_id, userId):
+            return jsonify({"success": False, "message": "Forbidden"}), 403
+
+        data = request.get_json(silent=True)
+        items = data.get("items") if isinstance(data, dict) else data
+        if not items:
+            return jsonify({"success": False, "message": "No meal items provided"}), 400
+
+        logger.info(f"Saving {len(items)} meal items for user {userId}")
+        result = save_meals_to_db(userId, items)
+
+        if not result.get("success"):
+            return jsonify({
+                "success": False,
+                "message": result.get("error", "Cannot save meals"),
+                "data": result if "results" in result else None
+            }), 400
+
+        return jsonify({"success": True, "message": "Meals saved successfully", "data": result}), 201
+
+    except Exception as e:
+        logger.exception(f"Error in save_meals for user {userId}: {e}")
+        return jsonify({"success": False, "message": "Server error"}), 500
@@ -0,0 +1,206 @@
+# File: backend/src/flask_app/food_history.py
+# Purpose: LRU cache ประวัติอาหารของผู้ใช้ (food_id ไม่ซ้ำ + วันที่กินล่าสุด) สำหรับ FoodRecommendationSystem
+#
+# ประวัติของผู้ใช้ที่ใช้งานอยู่ไม่ต้อง GROUP BY MealDetails ⋈ Meals ทุก request:
+# - miss: query ครั้งเดียวต่อผู้ใช้ (GROUP BY food_id) แล้วเก็บเป็น array ขนาดเล็ก
+# - save_meal_to_db / save_meals_to_db เรียก record() หลัง commit (write-through)
+#   ผู้ใช้ที่ไม่อยู่ใน cache ไม่ถูกเพิ่ม (miss ครั้งถัดไปโหลดจาก DB ครบอยู่แล้ว)
+# - จำกัดจำนวนผู้ใช้ (LRU) และอายุ entry: มื้อที่บันทึกผ่าน worker อื่นของ gunicorn
+#   เห็นใน worker นี้ภายใน FOOD_HISTORY_CACHE_TTL_S
+# ชื่ออาหารอ่านจาก food_catalog ตอนใช้ (แก้ชื่ออาหารไม่ต้อง invalidate)
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+
+from flask_app.db_pool import get_pool
+from flask_app.food_catalog import food_catalog
+
+logger = logging.getLogger(__name__)
+
+# จำนวนผู้ใช้สูงสุดใน cache (0 = ปิด)
+FOOD_HISTORY_CACHE_USERS = int(os.getenv('FOOD_HISTORY_CACHE_USERS', '10000'))
+FOOD_HISTORY_CACHE_TTL_S = float(os.getenv('FOOD_HISTORY_CACHE_TTL_S', '300'))
+
+
+class _History:
+    """ประวัติของผู้ใช้หนึ่งคน (immutable) food_ids/days เรียงวันล่าสุดก่อน days = date.toordinal()"""
+
+    __slots__ = ("food_ids", "days", "expires_at")
+
+    def __init__(self, food_ids, days, expires_at):
+        food_ids = np.asarray(food_ids, dtype=np.int64)
+        days = np.asarray(days, dtype=np.int32)
+        order = np.lexsort((food_ids, -days))
+        self.food_ids = food_ids[order]
+        self.days = days[order]
+        self.expires_at = expires_at
+
+    def merged(self, items, expires_at):
+        """ประวัติชุดใหม่ที่รวม [(food_id, day), ...] (food_id เดิมเก็บวันที่ล่าสุด)"""
+        latest = dict(zip(self.food_ids.tolist(), self.days.tolist()))
+        for food_id, day in items:
+            if day > latest.get(food_id, -1):
+                latest[food_id] = day
+        return _History(list(latest), list(latest.values()), expires_at)
+
+
+class FoodHistoryCache:
+    def __init__(self, max_users=FOOD_HISTORY_CACHE_USERS, ttl_s=FOOD_HISTORY_CACHE_TTL_S, catalog=food_catalog):
+        self.max_users = int(max_users)
+        self.ttl = float(ttl_s)
+        self.catalog = catalog
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # user_id -> _History
+        # ผู้ใช้ที่กำลังโหลดจาก DB -> มื้อที่ record() ระหว่างนั้น (รวมเข้าผลโหลด กัน query อ่านก่อน commit)
+        self._loading = {}
+
+        # metrics
+        self._hits = 0
+        self._misses = 0
+        self._expirations = 0
+        self._evictions = 0
+        self._write_throughs = 0
+        self._load_errors = 0
+
+    @property
+    def enabled(self):
+        return self.max_users > 0 and self.ttl > 0
+
+    def _reinit_after_fork(self):
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    # -------------------------------------------------
+    # Loading
+    # -------------------------------------------------
+    def _query(self, user_id):
+        with get_pool().connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT md.food_id, MAX(m.date) AS latest_date
+                FROM MealDetails md
+                JOIN Meals m ON md.meal_id = m.meal_id
+                WHERE m.user_id = %s
+                GROUP BY md.food_id
+            """, (user_id,))
+            rows = cur.fetchall()
+            cur.close()
+        return [(food_id, latest_date.toordinal()) for food_id, latest_date in rows]
+
+    def _put_locked(self, user_id, history):
+        self._entries[user_id] = history
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _history(self, user_id):
+        if not self.enabled:
+            self._misses += 1
+            items = self._query(user_id)
+            return _History([f for f, _ in items], [d for _, d in items], 0.0)
+
+        now = time.monotonic()
+        with self._lock:
+            history = self._entries.get(user_id)
+            if history is not None and history.expires_at <= now:
+                del self._entries[user_id]
+                self._expirations += 1
+                history = None
+            if history is not None:
+                self._entries.move_to_end(user_id)
+                self._hits += 1
+                return history
+            self._misses += 1
+            pending = self._loading.setdefault(user_id, [])
+
+        try:
+            items = self._query(user_id)
+        except Exception:
+            with self._lock:
+                self._loading.pop(user_id, None)
+                self._load_errors += 1
+            raise
+
+        with self._lock:
+            self._loading.pop(user_id, None)
+            history = _History([], [], 0.0).merged(items + pending, time.monotonic() + self.ttl)
+            self._put_locked(user_id, history)
+        return history
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def food_names(self, user_id):
+        """ชื่ออาหารที่ผู้ใช้เคยกิน (ไม่ซ้ำ ล่าสุดก่อน) เหมือน query เดิมที่ join Foods"""
+        history = self._history(user_id)
+        foods = self.catalog.get_many_by_id(history.food_ids.tolist())
+        names = []
+        seen = set()
+        for food_id in history.food_ids.tolist():
+            food = foods.get(food_id)
+            if food is not None and food['food_name'] not in seen:
+                seen.add(food['food_name'])
+                names.append(food['food_name'])
+        return names
+
+    def record(self, user_id, food_ids, day=None):
+        """
+        write-through หลัง commit มื้ออาหาร (เรียกจาก save path)
+        อัปเดตเฉพาะผู้ใช้ที่อยู่ใน cache หรือกำลังโหลดอยู่ คืน True ถ้า cache ถูกแก้
+        """
+        if not self.enabled:
+            return False
+        day = (day or date.today()).toordinal()
+        items = [(int(food_id), day) for food_id in food_ids]
+        with self._lock:
+            pending = self._loading.get(user_id)
+            if pending is not None:
+                pending.extend(items)
+            history = self._entries.get(user_id)
+            if history is None:
+                return pending is not None
+            # ไม่ต่ออายุ entry: write-through ไม่เห็นมื้อที่บันทึกผ่าน worker อื่น
+            self._entries[user_id] = history.merged(items, history.expires_at)
+            self._entries.move_to_end(user_id)
+            self._write_throughs += 1
+            return True
+
+    def invalidate(self, user_id=None):
+        """ลบผู้ใช้หนึ่งคน (หรือทั้งหมดเมื่อ user_id=None) ออกจาก cache"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "users": len(self._entries),
+                "max_users": self.max_users,
+                "ttl_s": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "expirations": self._expirations,
+                "evictions": self._evictions,
+                "write_throughs": self._write_throughs,
+                "load_errors": self._load_errors,
+            }
+
+
+# cache ที่ใช้ร่วมกันทั้ง process
+food_history = FoodHistoryCache()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=food_history._reinit_after_fork)
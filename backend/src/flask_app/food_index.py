@@ -0,0 +1,384 @@
+# File: backend/src/flask_app/food_index.py
+# Purpose: TF-IDF index (char n-gram) ของชื่ออาหาร สำหรับ FoodRecommendationSystem
+#
+# - index ผูกกับ version ของ Foods catalog (MAX(updated_at), COUNT(*))
+# - บันทึก vectorizer + sparse matrix + แถวอาหารลงไฟล์ (joblib) startup จึงโหลดได้ทันทีโดยไม่ต้อง fit ใหม่
+# - background refresher ตรวจ version ของ catalog ถ้าเปลี่ยน (admin เพิ่ม/แก้อาหาร) จะ build ใหม่
+#   แล้วสลับ index ทั้งก้อน request ที่กำลังทำงานใช้ index เดิมต่อจนจบ
+# - build ครั้งแรกเป็น single-flight: request ที่มาพร้อมกันรอ build เดียวกัน
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from flask_app.food_catalog import food_catalog
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]  # backend
+
+FOOD_INDEX_PATH = Path(os.getenv(
+    'FOOD_INDEX_PATH', str(PROJECT_ROOT / 'models' / 'recommendation_model' / 'food_tfidf_index.joblib')
+))
+# รอบตรวจ version ของ catalog (เทียบในหน่วยความจำ ไม่ query DB เพิ่ม) 0 = ไม่ refresh
+FOOD_INDEX_REFRESH_S = float(os.getenv('FOOD_INDEX_REFRESH_S', '60'))
+
+# เปลี่ยนเมื่อรูปแบบไฟล์หรือ parameter ของ vectorizer เปลี่ยน (ไฟล์เก่าจะถูก build ใหม่)
+INDEX_FORMAT = 1
+VECTORIZER_PARAMS = {
+    'analyzer': 'char',
+    'ngram_range': (1, 3),
+    'lowercase': True,
+    'strip_accents': 'unicode',
+    'dtype': np.float32,
+}
+
+
+def catalog_version_key(version):
+    """(MAX(updated_at), COUNT(*)) -> string ที่เก็บลงไฟล์และเทียบกันได้"""
+    max_updated_at, count = version
+    return f"{max_updated_at.isoformat() if max_updated_at else 'none'}:{count}"
+
+
+class FoodIndex:
+    """
+    index หนึ่งชุด (immutable หลังสร้าง) แถวที่ i ของ matrix คือ foods[i]
+    แถวของ matrix ถูก L2-normalize โดย TfidfVectorizer แล้ว cosine similarity จึงเป็นแค่ dot product
+    ค่าที่ใช้ตอน scoring เก็บแบบ columnar (ids, calories float32, name -> row) ไม่ต้องวน dict ต่อแถว
+    """
+
+    __slots__ = ("version", "vectorizer", "matrix", "foods", "built_at", "ids", "calories", "row_by_name")
+
+    def __init__(self, version, vectorizer, matrix, foods, built_at):
+        self.version = version
+        self.vectorizer = vectorizer
+        self.matrix = matrix.tocsr()
+        self.foods = foods
+        self.built_at = built_at
+
+        self.ids = np.fromiter((food['food_id'] for food in foods), dtype=np.int64, count=len(foods))
+        self.calories = np.fromiter(
+            (np.nan if food['calories'] is None else float(food['calories']) for food in foods),
+            dtype=np.float32, count=len(foods),
+        )
+        self.row_by_name = {food['food_name']: row for row, food in enumerate(foods)}
+
+    # -------------------------------------------------
+    # Scoring
+    # -------------------------------------------------
+    def rows_for_names(self, names):
+        """(rows ของชื่อที่อยู่ใน index, ชื่อที่ไม่อยู่ใน index)"""
+        rows, unknown = [], []
+        for name in names:
+            row = self.row_by_name.get(name)
+            if row is None:
+                unknown.append(name)
+            else:
+                rows.append(row)
+        return rows, unknown
+
+    def profile(self, rows, unknown=()):
+        """
+        mean ของเวกเตอร์อาหารที่เคยทาน (เท่ากับ vectorizer.transform(history).mean(axis=0))
+        ใช้แถวที่คำนวณไว้แล้ว ชื่อที่ไม่อยู่ใน index (catalog เปลี่ยนหลัง build) ค่อย transform
+        """
+        total = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        if rows:
+            total += np.asarray(self.matrix[rows].sum(axis=0)).ravel()
+        if unknown:
+            total += np.asarray(self.vectorizer.transform(list(unknown)).sum(axis=0)).ravel()
+        count = len(rows) + len(unknown)
+        return total / count if count else total
+
+    def similarities(self, profile):
+        """cosine similarity ของ profile กับอาหารทุกแถว"""
+        norm = np.linalg.norm(profile)
+        if norm == 0:
+            return np.zeros(self.matrix.shape[0], dtype=np.float32)
+        return self.matrix @ (profile / norm)
+
+    def top_foods(self, scores, top_n, exclude_rows=(), max_calories=None):
+        """
+        เลือก top_n แถวที่ score สูงสุด ตัดแถวใน exclude_rows และอาหารที่ calories > max_calories
+        คืน [(row, score), ...] เรียงจาก score มากไปน้อย
+        """
+        if top_n <= 0:
+            return []
+        masked = np.array(scores, dtype=np.float32, copy=True)
+        if max_calories is not None:
+            # nan (ไม่มีค่า calories) ไม่ผ่านเงื่อนไข <= จึงถูกตัดด้วย
+            masked[~(self.calories <= np.float32(max_calories))] = -np.inf
+        if len(exclude_rows):
+            masked[np.asarray(exclude_rows, dtype=np.intp)] = -np.inf
+
+        valid = int(np.count_nonzero(masked > -np.inf))
+        top_n = min(top_n, valid)
+        if top_n == 0:
+            return []
+        if top_n < len(masked):
+            candidates = np.argpartition(-masked, top_n - 1)[:top_n]
+        else:
+            candidates = np.arange(len(masked))
+        candidates = candidates[np.argsort(-masked[candidates], kind='stable')]
+        return [(int(row), float(masked[row])) for row in candidates]
+
+    # -------------------------------------------------
+    # Batch scoring (หลายผู้ใช้พร้อมกัน)
+    # -------------------------------------------------
+    def history_matrix(self, histories):
+        """
+        histories: list ของ list ชื่ออาหาร (หนึ่ง list ต่อผู้ใช้ ห้ามว่าง)
+        คืน (H, profiles)
+          H        - sparse (ผู้ใช้ x อาหาร) ค่า 1/len(history) ที่แถวอาหารที่เคยทาน
+          profiles - sparse (ผู้ใช้ x feature) = H @ matrix (mean ของเวกเตอร์อาหารที่เคยทาน)
+        """
+        user_rows, food_rows, weights = [], [], []
+        unknown_users, unknown_names, unknown_weights = [], [], []
+        for user, names in enumerate(histories):
+            weight = 1.0 / len(names)
+            for name in names:
+                row = self.row_by_name.get(name)
+                if row is None:
+                    unknown_users.append(user)
+                    unknown_names.append(name)
+                    unknown_weights.append(weight)
+                else:
+                    user_rows.append(user)
+                    food_rows.append(row)
+                    weights.append(weight)
+
+        history = sparse.csr_matrix((np.asarray(weights, dtype=np.float32), (user_rows, food_rows)),
+                                    shape=(len(histories), self.matrix.shape[0]))
+        profiles = history @ self.matrix
+        if unknown_names:
+            assign = sparse.csr_matrix(
+                (np.asarray(unknown_weights, dtype=np.float32), (unknown_users, range(len(unknown_names)))),
+                shape=(len(histories), len(unknown_names)),
+            )
+            profiles = profiles + assign @ self.vectorizer.transform(unknown_names)
+        return history, profiles
+
+    def batch_similarities(self, profiles):
+        """cosine similarity (ผู้ใช้ x อาหาร) dense float32 จาก sparse matrix product ครั้งเดียว"""
+        norms = np.sqrt(np.asarray(profiles.multiply(profiles).sum(axis=1)).ravel())
+        inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+        normalized = sparse.diags(inverse.astype(np.float32)) @ profiles
+        # matrix (sparse) @ profiles.T (dense) เร็วกว่า sparse @ sparse เพราะผลลัพธ์เกือบ dense อยู่แล้ว
+        return np.ascontiguousarray((self.matrix @ normalized.T.toarray()).T, dtype=np.float32)
+
+    def batch_top_foods(self, scores, top_n, history=None, max_calories=None):
+        """
+        เหมือน top_foods แต่ทีละหลายผู้ใช้ (แก้ scores in-place)
+        history: sparse (ผู้ใช้ x อาหาร) แถวที่ไม่เป็นศูนย์จะถูกตัด
+        max_calories: array แคลอรีที่เหลือต่อผู้ใช้
+        คืน list (ต่อผู้ใช้) ของ [(row, score), ...]
+        """
+        users, foods = scores.shape
+        top_n = min(top_n, foods)
+        if top_n <= 0 or users == 0:
+            return [[] for _ in range(users)]
+        if max_calories is not None:
+            ceiling = np.asarray(max_calories, dtype=np.float32)[:, None]
+            scores[~(self.calories[None, :] <= ceiling)] = -np.inf
+        if history is not None:
+            scores[history.nonzero()] = -np.inf
+
+        if top_n < foods:
+            candidates = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+        else:
+            candidates = np.tile(np.arange(foods), (users, 1))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        return [
+            [(int(row), float(score)) for row, score in zip(rows, row_scores) if score > -np.inf]
+            for rows, row_scores in zip(candidates, candidate_scores)
+        ]
+
+    # -------------------------------------------------
+    # Build / persist
+    # -------------------------------------------------
+    @classmethod
+    def build(cls, version, foods):
+        if not foods:
+            raise RuntimeError("No food data found in database")
+        vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+        matrix = vectorizer.fit_transform([food['food_name'] for food in foods])
+        return cls(version, vectorizer, matrix, foods, datetime.now())
+
+    def save(self, path):
+        """เขียนไฟล์ชั่วคราวแล้ว os.replace (process อื่นไม่เห็นไฟล์ที่เขียนไม่ครบ)"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            joblib.dump({
+                'format': INDEX_FORMAT,
+                'params': VECTORIZER_PARAMS,
+                'version': self.version,
+                'vectorizer': self.vectorizer,
+                'matrix': self.matrix,
+                'foods': self.foods,
+                'built_at': self.built_at,
+            }, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    @classmethod
+    def load(cls, path):
+        """โหลดจากไฟล์ คืน None ถ้าไฟล์เป็นรูปแบบเก่า"""
+        data = joblib.load(path)
+        if data.get('format') != INDEX_FORMAT or data.get('params') != VECTORIZER_PARAMS:
+            return None
+        return cls(data['version'], data['vectorizer'], data['matrix'], data['foods'], data['built_at'])
+
+
+class FoodIndexStore:
+    def __init__(self, path=FOOD_INDEX_PATH, refresh_interval=FOOD_INDEX_REFRESH_S, catalog=food_catalog):
+        self.path = Path(path)
+        self.refresh_interval = refresh_interval
+        self.catalog = catalog
+
+        self._index = None
+        self._build_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refresher = None
+
+        # metrics
+        self._loaded_from = None
+        self._builds = 0
+        self._build_seconds = None
+        self._refresh_errors = 0
+        self._last_error = None
+
+    # -------------------------------------------------
+    # Build / persist
+    # -------------------------------------------------
+    def _build(self, version, foods):
+        started = time.perf_counter()
+        index = FoodIndex.build(catalog_version_key(version), foods)
+        self._build_seconds = round(time.perf_counter() - started, 3)
+        self._builds += 1
+        try:
+            index.save(self.path)
+        except OSError as e:
+            # ใช้ index ในหน่วยความจำต่อได้ แค่ startup ครั้งหน้าต้อง build ใหม่
+            logger.warning("Food index not persisted to %s: %s", self.path, e)
+        logger.info("✅ Food index built: %d foods (version %s) in %.2fs",
+                    len(foods), index.version, self._build_seconds)
+        return index
+
+    def _load_or_build(self):
+        if self.path.exists():
+            try:
+                index = FoodIndex.load(self.path)
+                if index is not None:
+                    self._loaded_from = 'disk'
+                    logger.info("✅ Food index loaded from %s: %d foods (version %s)",
+                                self.path.name, len(index.foods), index.version)
+                    return index
+                logger.info("Food index file %s has an old format, rebuilding", self.path.name)
+            except Exception as e:
+                logger.warning("Food index file %s unreadable, rebuilding: %s", self.path, e)
+
+        # โหลดอย่างเดียว (อาจรันใน gunicorn master) refresher ของ catalog เริ่มเมื่อใช้งานจริง
+        version, foods = self.catalog.versioned_foods(start_refresher=False)
+        self._loaded_from = 'build'
+        return self._build(version, foods)
+
+    def refresh(self):
+        """build ใหม่ถ้า version ของ catalog ต่างจาก index ปัจจุบัน คืน True ถ้าสลับ index"""
+        version, foods = self.catalog.versioned_foods()
+        key = catalog_version_key(version)
+        current = self._index
+        if current is not None and current.version == key:
+            return False
+        with self._build_lock:
+            current = self._index
+            if current is not None and current.version == key:
+                return False
+            self._index = self._build(version, foods)
+        return True
+
+    def _refresh_loop(self):
+        # ตรวจครั้งแรกทันที: ไฟล์ที่โหลดตอน startup อาจเก่ากว่า catalog ใน DB
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                self._refresh_errors += 1
+                self._last_error = str(e)
+                logger.error("Food index refresh failed: %s", e)
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def _reinit_after_fork(self):
+        """ใน process ลูกหลัง fork: index ใช้ต่อได้ แต่ refresher thread ต้องเริ่มใหม่"""
+        self._build_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refresher = None
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def get(self):
+        """index ปัจจุบัน (โหลด/build ครั้งแรกแบบ single-flight และเริ่ม refresher)"""
+        index = self._index
+        if index is not None and (self._refresher is not None or self.refresh_interval <= 0):
+            return index
+        with self._build_lock:
+            if self._index is None:
+                self._index = self._load_or_build()
+            if self.refresh_interval > 0 and self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="food-index-refresh", daemon=True
+                )
+                self._refresher.start()
+            return self._index
+
+    def preload(self):
+        """โหลด/build index โดยไม่เริ่ม refresher thread (gunicorn master ก่อน fork, worker เริ่มเองใน get())"""
+        with self._build_lock:
+            if self._index is None:
+                self._index = self._load_or_build()
+            return self._index
+
+    def invalidate(self):
+        """ขอให้ตรวจ version ใหม่โดยเร็ว"""
+        if self._refresher is not None and self._refresher.is_alive():
+            self._wake.set()
+        else:
+            self.refresh()
+
+    def stats(self):
+        index = self._index
+        return {
+            "loaded": index is not None,
+            "size": len(index.foods) if index else 0,
+            "version": index.version if index else None,
+            "built_at": index.built_at.isoformat() if index else None,
+            "loaded_from": self._loaded_from,
+            "builds": self._builds,
+            "last_build_seconds": self._build_seconds,
+            "refresh_errors": self._refresh_errors,
+            "last_error": self._last_error,
+            "refresh_interval_s": self.refresh_interval,
+            "path": str(self.path),
+        }
+
+
+# index ที่ใช้ร่วมกันทั้ง process
+food_index = FoodIndexStore()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=food_index._reinit_after_fork)
@@ -0,0 +1,106 @@
+# File: backend/src/flask_app/food_recommend_batch.py
+# Purpose: Batch job แนะนำอาหารให้ผู้ใช้จำนวนมาก (เช่น push "กินอะไรดีกับแคลอรีที่เหลือ" ตอนเย็น)
+#
+# ใช้ FoodRecommendationSystem.recommend_foods_batch (query แบบ set-based + sparse matrix product)
+# แทนการเรียก /api/food-recommend/<userId> ทีละคน ผลลัพธ์เขียนเป็น JSON Lines หนึ่งบรรทัดต่อผู้ใช้
+#
+# ตัวอย่าง (จาก backend/src):
+#   python -m flask_app.food_recommend_batch --user-ids 1,2,3
+#   python -m flask_app.food_recommend_batch --active-days 7 --output recs.jsonl
+#   python -m flask_app.food_recommend_batch --user-file users.txt --top-n 5 --only-success
+
+import argparse
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from flask_app.db_pool import get_pool
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]  # backend
+sys.path.insert(0, str(PROJECT_ROOT / 'models' / 'recommendation_model'))
+
+from food_recommend import FoodRecommendationSystem  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# ผู้ใช้จำนวนนี้ต่อรอบของ recommend_foods_batch (ผลของแต่ละรอบเขียนออกก่อนเริ่มรอบถัดไป)
+JOB_CHUNK_USERS = 5000
+
+
+def active_user_ids(days):
+    """ผู้ใช้ที่บันทึกมื้ออาหารภายใน days วันล่าสุด"""
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT DISTINCT user_id FROM Meals
+            WHERE date >= CURDATE() - INTERVAL %s DAY
+            ORDER BY user_id
+        """, (days,))
+        rows = cur.fetchall()
+        cur.close()
+    return [row[0] for row in rows]
+
+
+def _read_user_file(path):
+    with open(path, encoding='utf-8') as f:
+        return [int(line) for line in (line.strip() for line in f) if line]
+
+
+def run_batch(user_ids, date=None, top_n=3, output=sys.stdout, only_success=False):
+    """รัน batch ทั้งหมดแล้วเขียน JSON Lines คืนสรุป {'users', 'success', 'seconds'}"""
+    recommender = FoodRecommendationSystem()
+    started = time.perf_counter()
+    summary = {'users': 0, 'success': 0}
+    for start in range(0, len(user_ids), JOB_CHUNK_USERS):
+        results = recommender.recommend_foods_batch(user_ids[start:start + JOB_CHUNK_USERS], date, top_n)
+        for user_id, result in results.items():
+            summary['users'] += 1
+            summary['success'] += bool(result['success'])
+            if only_success and not result['success']:
+                continue
+            output.write(json.dumps({'user_id': user_id, **result}, ensure_ascii=False) + "\n")
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    logger.info("✅ Food recommendation batch: %d users, %d with recommendations in %.2fs",
+                summary['users'], summary['success'], summary['seconds'])
+    return summary
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch food recommendations for many users (JSON Lines)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--user-ids", help="comma-separated user ids")
+    source.add_argument("--user-file", help="ไฟล์ user id บรรทัดละหนึ่ง")
+    source.add_argument("--active-days", type=int, help="ผู้ใช้ที่บันทึกมื้ออาหารภายใน N วัน")
+    parser.add_argument("--date", type=_parse_date, help="YYYY-MM-DD ของ DailyCalories (default: วันนี้)")
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--output", help="ไฟล์ผลลัพธ์ (default: stdout)")
+    parser.add_argument("--only-success", action="store_true", help="เขียนเฉพาะผู้ใช้ที่ได้คำแนะนำ")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s in %(module)s: %(message)s")
+
+    if args.user_ids:
+        user_ids = [int(value) for value in args.user_ids.split(',') if value.strip()]
+    elif args.user_file:
+        user_ids = _read_user_file(args.user_file)
+    else:
+        user_ids = active_user_ids(args.active_days)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            summary = run_batch(user_ids, args.date, args.top_n, output, args.only_success)
+    else:
+        summary = run_batch(user_ids, args.date, args.top_n, sys.stdout, args.only_success)
+    print(summary, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
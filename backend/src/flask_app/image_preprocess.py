@@ -0,0 +1,67 @@
+# File: backend/src/flask_app/image_preprocess.py
+# Purpose: Decode + preprocess ภาพสำหรับโมเดล food detect (PIL + numpy เท่านั้น)
+#
+# ภาพจากมือถือ 12+ MP ถูก resize ลงเหลือ 224x224 อยู่ดี จึง decode แบบลดขนาด:
+# - ตรวจขนาดจาก header ก่อน decode (ปฏิเสธ decompression bomb โดยไม่ต้อง decode ทั้งภาพ)
+# - JPEG ใช้ draft mode ให้ decoder ย่อ 1/2, 1/4, 1/8 ระหว่าง decode
+#   โดยเลือก scale ที่เล็กที่สุดที่ยังได้ด้านละ >= 224px
+
+import io
+import os
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+# เทียบเท่า transforms.Resize((224, 224)) + ToTensor() + Normalize(ImageNet)
+# แต่ใช้ numpy ล้วน เพื่อไม่ต้อง import torch เมื่อใช้ onnx backend
+IMAGE_SIZE = 224
+IMAGE_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGE_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# จำนวน pixel สูงสุดที่ยอมรับ (อ่านจาก header ก่อน decode)
+FOOD_IMAGE_MAX_PIXELS = int(os.getenv('FOOD_IMAGE_MAX_PIXELS', str(50_000_000)))
+FOOD_IMAGE_REDUCED_DECODE = os.getenv('FOOD_IMAGE_REDUCED_DECODE', 'true').lower() == 'true'
+
+
+class InvalidImageError(ValueError):
+    """ไฟล์ที่อัปโหลดไม่ใช่ภาพที่ decode ได้ หรือใหญ่เกินกำหนด"""
+
+
+def preprocess_image(image):
+    """PIL RGB image -> numpy float32 (3, 224, 224)"""
+    resized = image.resize((IMAGE_SIZE, IMAGE_SIZE), Image.BILINEAR)
+    array = np.asarray(resized, dtype=np.float32) / 255.0
+    array = (array - IMAGE_MEAN) / IMAGE_STD
+    return np.ascontiguousarray(array.transpose(2, 0, 1))
+
+
+def open_image(content, max_pixels=FOOD_IMAGE_MAX_PIXELS, reduced=FOOD_IMAGE_REDUCED_DECODE):
+    """
+    bytes -> PIL RGB image
+    Image.open อ่านแค่ header จึงตรวจขนาดได้ก่อน decode จริงใน convert()
+    """
+    try:
+        image = Image.open(content if hasattr(content, 'read') else io.BytesIO(content))
+    except Image.DecompressionBombError:
+        raise InvalidImageError(f'Image too large (max {max_pixels} pixels)')
+    except UnidentifiedImageError:
+        raise InvalidImageError('Invalid image file')
+
+    width, height = image.size
+    if width <= 0 or height <= 0:
+        raise InvalidImageError('Invalid image file')
+    if width * height > max_pixels:
+        raise InvalidImageError(f'Image too large ({width}x{height}, max {max_pixels} pixels)')
+
+    if reduced and image.format == 'JPEG':
+        image.draft('RGB', (IMAGE_SIZE, IMAGE_SIZE))
+
+    try:
+        return image.convert('RGB')
+    except (OSError, Image.DecompressionBombError):
+        raise InvalidImageError('Invalid image file')
+
+
+def decode_image(content, max_pixels=FOOD_IMAGE_MAX_PIXELS, reduced=FOOD_IMAGE_REDUCED_DECODE):
+    """bytes -> array ที่พร้อมเข้าโมเดล"""
+    return preprocess_image(open_image(content, max_pixels, reduced))
@@ -0,0 +1,158 @@
+# File: backend/src/flask_app/inference_backends.py
+# Purpose: Inference backend ของโมเดล food detect (เลือกตอน startup)
+#   torch - eager PyTorch (รองรับ quantization none/static)
+#   onnx  - ONNX Runtime (CPUExecutionProvider) ไม่ต้อง import torch ใน process ที่ serve
+#
+# ทุก backend รับ batch เป็น numpy float32 รูป (N, 3, 224, 224) ที่ normalize แล้ว
+# และคืน logits เป็น numpy (N, num_classes)
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def softmax(logits):
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class InferenceBackend:
+    name = "base"
+
+    def forward(self, batch):
+        """batch: np.ndarray (N, 3, H, W) float32 -> logits np.ndarray (N, num_classes)"""
+        raise NotImplementedError
+
+    def predict_proba(self, batch):
+        return softmax(self.forward(batch))
+
+
+# ============================================
+# Eager PyTorch
+# ============================================
+def _strip_prefix(state_dict, prefixes=('module.', 'backbone.')):
+    cleaned = {}
+    for k, v in state_dict.items():
+        for p in prefixes:
+            if k.startswith(p):
+                k = k[len(p):]
+        cleaned[k] = v
+    return cleaned
+
+
+class TorchBackend(InferenceBackend):
+    name = "torch"
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def forward(self, batch):
+        import torch
+        tensor = torch.from_numpy(np.ascontiguousarray(batch)).to(self.device)
+        with torch.no_grad():
+            logits = self.model(tensor)
+        return logits.float().cpu().numpy()
+
+    @staticmethod
+    def load_fp32_model(model_path, num_classes, device):
+        import torch
+        import torch.nn as nn
+        from torchvision.models import efficientnet_b0
+
+        if not model_path.exists():
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+
+        model = efficientnet_b0(pretrained=False)
+        model.classifier[1] = nn.Linear(model.classifier[1].in_features, num_classes)
+
+        checkpoint_raw = torch.load(model_path, map_location=device)
+        checkpoint = checkpoint_raw.get('state_dict', checkpoint_raw)
+
+        load_result = model.load_state_dict(_strip_prefix(checkpoint), strict=False)
+        if getattr(load_result, 'missing_keys', None):
+            logger.warning("Missing keys: %s", load_result.missing_keys)
+        if getattr(load_result, 'unexpected_keys', None):
+            logger.warning("Unexpected keys: %s", load_result.unexpected_keys)
+
+        model.to(device)
+        model.eval()
+        return model
+
+    @classmethod
+    def load(cls, model_path, int8_model_path, num_classes, quantization='none'):
+        """
+        quantization (INT8 รันบน CPU เท่านั้น)
+          none    - fp32 ตามเดิม
+          static  - โหลด TorchScript INT8 ที่ผ่าน training/food_classification_model/quantize_model.py แล้ว
+        ไม่มีโหมด dynamic: EfficientNet-B0 มี nn.Linear แค่ classifier ตัวเดียว quantize_dynamic จึงแทบไม่ต่างจาก fp32
+        """
+        import torch
+
+        if quantization == 'none':
+            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            model = cls.load_fp32_model(model_path, num_classes, device)
+        elif quantization == 'static':
+            device = torch.device('cpu')
+            if not int8_model_path.exists():
+                raise FileNotFoundError(f"Quantized model file not found: {int8_model_path}")
+            model = torch.jit.load(str(int8_model_path), map_location=device)
+            model.eval()
+        else:
+            raise ValueError(f"Invalid quantization mode: {quantization}")
+
+        logger.info("✅ Torch backend loaded on %s (quantization=%s)", device, quantization)
+        return cls(model, device)
+
+
+# ============================================
+# ONNX Runtime
+# ============================================
+class OnnxRuntimeBackend(InferenceBackend):
+    name = "onnx"
+
+    def __init__(self, session):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        batch_dim = session.get_inputs()[0].shape[0]
+        # ไฟล์ export เก่า (food_model_web.onnx) fix batch = 1 ไว้
+        self.fixed_batch_size = batch_dim if isinstance(batch_dim, int) else None
+
+    def _run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+    def forward(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if self.fixed_batch_size == 1 and len(batch) > 1:
+            return np.concatenate([self._run(batch[i:i + 1]) for i in range(len(batch))])
+        return self._run(batch)
+
+    @classmethod
+    def load(cls, onnx_path, intra_op_threads=0):
+        import onnxruntime as ort
+
+        if not onnx_path.exists():
+            raise FileNotFoundError(f"ONNX model file not found: {onnx_path}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+
+        session = ort.InferenceSession(str(onnx_path), sess_options=options,
+                                       providers=['CPUExecutionProvider'])
+        backend = cls(session)
+        if backend.fixed_batch_size is not None:
+            logger.warning("ONNX model has fixed batch size %s - re-export with export_onnx.py "
+                           "for batched inference", backend.fixed_batch_size)
+        logger.info("✅ ONNX Runtime backend loaded: %s", onnx_path.name)
+        return backend
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+}
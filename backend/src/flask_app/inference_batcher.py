@@ -0,0 +1,188 @@
+# File: backend/src/flask_app/inference_batcher.py
+# Purpose: Dynamic micro-batching สำหรับ forward pass ของโมเดล
+# รวม request ที่เข้ามาพร้อมกันเป็น batch เดียว เพื่อลด overhead ต่อครั้งของ CPU inference
+
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# batcher ทั้งหมดใน process (ใช้ reset หลัง fork)
+_batchers = weakref.WeakSet()
+
+
+class _PendingItem:
+    """งานหนึ่งชิ้นที่รอเข้า batch (หนึ่ง item ต่อหนึ่ง caller)"""
+
+    __slots__ = ("item", "enqueued_at", "done", "result", "error")
+
+    def __init__(self, item):
+        self.item = item
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Scheduler สำหรับรวม request เป็น batch
+    - caller เรียก submit(item) แล้ว block จนได้ผลของตัวเอง
+    - worker thread ดึง item จาก queue รวมได้สูงสุด max_batch_size ชิ้น
+      หรือรอไม่เกิน max_wait_ms นับจาก item แรกของ batch
+    - run_batch(items) ต้องคืน list ผลลัพธ์ที่มีลำดับตรงกับ items
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=10.0, name="inference"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.run_batch = run_batch
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        # metrics
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._last_batch_size = 0
+        self._batch_size_counts = {}
+        self._latencies_ms = deque(maxlen=1000)
+
+        _batchers.add(self)
+
+    def _reinit_after_fork(self):
+        """ใน process ลูกหลัง fork: worker thread ของ parent ไม่ได้ตามมา และ lock/queue อาจค้างสถานะ"""
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    # -------------------------------------------------
+    # Worker thread
+    # -------------------------------------------------
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._loop, name=f"{self.name}-batcher", daemon=True
+                )
+                self._thread.start()
+                logger.info(
+                    "✅ MicroBatcher '%s' started (max_batch_size=%d, max_wait_ms=%.1f)",
+                    self.name, self.max_batch_size, self.max_wait * 1000,
+                )
+
+    def _collect_batch(self):
+        """รอ item แรก แล้วเก็บเพิ่มจนเต็ม batch หรือหมดเวลา max_wait"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                results = self.run_batch([p.item for p in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"run_batch returned {len(results)} results for {len(batch)} items"
+                    )
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                logger.exception("MicroBatcher '%s' batch failed: %s", self.name, e)
+                for pending in batch:
+                    pending.error = e
+            finally:
+                self._record_batch(batch)
+                for pending in batch:
+                    pending.done.set()
+
+    def _record_batch(self, batch):
+        now = time.perf_counter()
+        size = len(batch)
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._last_batch_size = size
+            self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+            if batch[0].error is not None:
+                self._errors += size
+            for pending in batch:
+                self._latencies_ms.append((now - pending.enqueued_at) * 1000)
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def submit(self, item, timeout=None):
+        """ส่ง item เข้า queue และรอผลลัพธ์ของ item นั้น"""
+        self._ensure_started()
+        pending = _PendingItem(item)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError(f"Inference timed out after {timeout}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        """สถิติสำหรับปรับ max_batch_size / max_wait_ms เทียบกับ p99 latency"""
+        with self._stats_lock:
+            latencies = sorted(self._latencies_ms)
+            batches = self._batches
+            items = self._items
+            result = {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "queue_depth": self._queue.qsize(),
+                "batches": batches,
+                "items": items,
+                "errors": self._errors,
+                "last_batch_size": self._last_batch_size,
+                "avg_batch_size": round(items / batches, 3) if batches else 0.0,
+                "batch_size_histogram": {
+                    str(k): v for k, v in sorted(self._batch_size_counts.items())
+                },
+            }
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        result["latency_ms"] = {"p50": percentile(0.50), "p99": percentile(0.99)}
+        return result
+
+
+def _reinit_batchers_after_fork():
+    for batcher in list(_batchers):
+        batcher._reinit_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_batchers_after_fork)
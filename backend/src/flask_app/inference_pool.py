@@ -0,0 +1,362 @@
+# File: backend/src/flask_app/inference_pool.py
+# Purpose: Inference process pool แยกจาก HTTP worker
+#
+# HTTP worker ทำแค่รับไฟล์ + decode/preprocess แล้วส่ง tensor ให้ process ชุดนี้รัน forward pass
+# จำนวน process และ intra-op thread ต่อ process ตั้งแยกจากจำนวน HTTP worker/thread
+# (เปิด connection ถูก ๆ ได้มากโดยไม่แย่ง core กับ inference)
+#
+# ข้อมูลไม่ถูก pickle: input/output ของแต่ละ slot อยู่ใน shared memory (anonymous mmap
+# ที่ process ลูกได้รับตอน fork) สิ่งที่ผ่าน queue มีแค่ (slot, จำนวนภาพ)
+#
+#   caller                                   inference process
+#   acquire slot -> เขียน input ลง slot
+#   ส่ง (slot, n) ทาง pipe         ------->  รับ (slot, n)
+#                                            forward(input ของ slot) -> เขียน logits ลง slot
+#   done[slot].acquire()           <-------  done[slot].release()
+#   อ่าน logits -> คืน slot
+#
+# primitive ทั้งหมด (Pipe / Semaphore / Lock / mmap) ใช้ข้าม fork ได้ pool ที่สร้างใน
+# gunicorn master จึงใช้ร่วมกันได้ทุก HTTP worker ต้องใช้ start method แบบ fork (Linux/macOS)
+
+import atexit
+import logging
+import mmap
+import multiprocessing
+import os
+import signal
+import time
+
+import numpy as np
+
+from flask_app.inference_backends import InferenceBackend
+
+logger = logging.getLogger(__name__)
+
+# สถานะของ process ใน pool
+_LOADING, _READY, _FAILED = 0, 1, -1
+# ผลของ slot
+_OK, _ERROR = 0, 1
+# counter ต่อ process: tasks, items, errors, busy_ms
+_COUNTERS = 4
+# process ใน pool ตรวจว่า parent ยังอยู่ทุก ๆ กี่วินาทีเมื่อไม่มีงาน
+_PARENT_CHECK_S = 1.0
+_IDLE = object()
+
+
+def _pid_alive(pid):
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class InferencePool(InferenceBackend):
+    """
+    Backend ที่ส่ง forward pass ไปรันใน process pool (ใช้แทน backend ปกติได้ทุกที่)
+    - load_backend(threads) ถูกเรียกใน process ลูกแต่ละตัว คืน InferenceBackend ของ process นั้น
+    - warmup(backend) (ถ้ามี) รันใน process ลูกหลังโหลดเสร็จ ก่อนรับงาน
+    - batch ที่ใหญ่กว่า slot_batch_size ถูกแบ่งเป็นหลาย slot และรันขนานกันได้หลาย process
+    """
+
+    name = "pool"
+
+    def __init__(self, load_backend, processes, threads=1, num_classes=100, slots=0,
+                 slot_batch_size=8, input_shape=(3, 224, 224), timeout_s=30.0, warmup=None):
+        if processes < 1:
+            raise ValueError("processes must be >= 1")
+        self.load_backend = load_backend
+        self.warmup = warmup
+        self.processes = int(processes)
+        self.threads = max(1, int(threads))
+        self.num_classes = int(num_classes)
+        self.num_slots = int(slots) or 2 * self.processes
+        self.slot_batch_size = int(slot_batch_size)
+        self.input_shape = tuple(input_shape)
+        self.timeout = float(timeout_s)
+
+        self._input_bytes = self.slot_batch_size * int(np.prod(self.input_shape)) * 4
+        self._output_bytes = self.slot_batch_size * self.num_classes * 4
+        self._slot_bytes = self._input_bytes + self._output_bytes
+
+        self._buffer = None
+        self._workers = []
+        self._owner_pid = None
+
+    # -------------------------------------------------
+    # Lifecycle (process ที่สร้าง pool)
+    # -------------------------------------------------
+    def start(self, ready_timeout=None):
+        """fork process ทั้งหมดแล้วรอจนทุกตัวโหลดโมเดล + warmup เสร็จ"""
+        if not hasattr(os, 'fork'):
+            raise RuntimeError("Inference pool requires os.fork (Linux/macOS)")
+        ctx = multiprocessing.get_context('fork')
+
+        self._buffer = mmap.mmap(-1, self.num_slots * self._slot_bytes)
+        self._task_reader, self._task_writer = ctx.Pipe(duplex=False)
+        self._task_rlock = ctx.Lock()
+        self._task_wlock = ctx.Lock()
+        self._done = [ctx.Semaphore(0) for _ in range(self.num_slots)]
+        self._free = ctx.Semaphore(self.num_slots)
+        self._slot_lock = ctx.Lock()
+        self._busy = ctx.Array('b', self.num_slots, lock=False)
+        self._abandoned = ctx.Array('b', self.num_slots, lock=False)
+        self._status = ctx.Array('i', self.num_slots, lock=False)
+        self._state = ctx.Array('i', self.processes, lock=False)
+        self._pids = ctx.Array('i', self.processes, lock=False)
+        self._counters = ctx.Array('d', self.processes * _COUNTERS, lock=False)
+        self._owner_pid = os.getpid()
+
+        # ใช้ os.fork ตรง ๆ (ไม่ใช่ multiprocessing.Process): gunicorn worker ที่ fork จาก master
+        # จะได้ไม่ถือว่า process ใน pool เป็นลูกของตัวเองแล้ว terminate ทิ้งตอน worker exit
+        started = time.perf_counter()
+        for index in range(self.processes):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    self._worker_main(index)
+                except BaseException:
+                    logger.exception("Inference process %d crashed", index)
+                finally:
+                    os._exit(0)
+            self._pids[index] = pid
+            self._workers.append(pid)
+        atexit.register(self.close)
+
+        deadline = None if ready_timeout is None else time.monotonic() + ready_timeout
+        while True:
+            states = list(self._state)
+            if _FAILED in states:
+                self.close()
+                raise RuntimeError("Inference pool process failed to load the model (see log)")
+            if all(state == _READY for state in states):
+                break
+            dead = [pid for pid, state in zip(self._workers, states)
+                    if state == _LOADING and not self._child_alive(pid)]
+            if dead:
+                self.close()
+                raise RuntimeError(f"Inference pool process exited during startup: pid {dead}")
+            if deadline is not None and time.monotonic() > deadline:
+                self.close()
+                raise TimeoutError(f"Inference pool not ready after {ready_timeout}s")
+            time.sleep(0.05)
+
+        logger.info("✅ Inference pool ready in %.2fs (processes=%d, threads/process=%d, slots=%d x %d images)",
+                    time.perf_counter() - started, self.processes, self.threads,
+                    self.num_slots, self.slot_batch_size)
+        return self
+
+    @staticmethod
+    def _child_alive(pid):
+        try:
+            return os.waitpid(pid, os.WNOHANG) == (0, 0)
+        except ChildProcessError:
+            # ถูก reap ไปแล้ว (เช่น gunicorn arbiter waitpid(-1))
+            return False
+
+    def close(self, timeout=5.0):
+        """หยุด process ใน pool (มีผลเฉพาะใน process ที่สร้าง pool)"""
+        if os.getpid() != self._owner_pid or not self._workers:
+            return
+        workers, self._workers = self._workers, []
+        alive = [pid for pid in workers if self._child_alive(pid)]
+        for _ in alive:
+            self._put_task(None)
+        deadline = time.monotonic() + timeout
+        while alive and time.monotonic() < deadline:
+            alive = [pid for pid in alive if self._child_alive(pid)]
+            time.sleep(0.05)
+        for pid in alive:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+    # -------------------------------------------------
+    # Task channel (ส่งแค่ (slot, n) ผ่าน pipe)
+    # -------------------------------------------------
+    def _put_task(self, task):
+        with self._task_wlock:
+            self._task_writer.send(task)
+
+    def _get_task(self, poll_s):
+        """คืน task ถัดไป หรือ _IDLE ถ้าไม่มีงานภายใน poll_s วินาที"""
+        if not self._task_rlock.acquire(timeout=poll_s):
+            return _IDLE
+        try:
+            if not self._task_reader.poll(poll_s):
+                return _IDLE
+            return self._task_reader.recv()
+        finally:
+            self._task_rlock.release()
+
+    # -------------------------------------------------
+    # Shared-memory views
+    # -------------------------------------------------
+    def _input_view(self, slot, n):
+        return np.ndarray((n,) + self.input_shape, dtype=np.float32,
+                          buffer=self._buffer, offset=slot * self._slot_bytes)
+
+    def _output_view(self, slot, n):
+        return np.ndarray((n, self.num_classes), dtype=np.float32,
+                          buffer=self._buffer, offset=slot * self._slot_bytes + self._input_bytes)
+
+    # -------------------------------------------------
+    # Inference process
+    # -------------------------------------------------
+    def _worker_main(self, index):
+        # signal handler ของ parent (gunicorn arbiter / werkzeug reloader) ไม่ควรทำงานใน process นี้
+        # Ctrl+C ไปถึงทั้ง process group: ให้ parent เป็นคนปิด pool
+        for name in ('SIGTERM', 'SIGHUP', 'SIGQUIT', 'SIGUSR1', 'SIGUSR2', 'SIGCHLD', 'SIGWINCH', 'SIGTTIN', 'SIGTTOU'):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        try:
+            backend = self.load_backend(self.threads)
+            if self.warmup is not None:
+                self.warmup(backend)
+        except Exception as e:
+            logger.exception("❌ Inference process %d failed to load model: %s", index, e)
+            self._state[index] = _FAILED
+            return
+
+        self._state[index] = _READY
+        counters = index * _COUNTERS
+
+        while True:
+            task = self._get_task(_PARENT_CHECK_S)
+            if task is _IDLE:
+                if os.getppid() != self._owner_pid:
+                    # process ที่สร้าง pool ตายไปแล้ว (เช่น kill -9) ไม่มีใครส่งงานมาอีก
+                    break
+                continue
+            if task is None:
+                break
+            slot, n = task
+            started = time.perf_counter()
+            try:
+                self._output_view(slot, n)[:] = backend.forward(self._input_view(slot, n))
+                self._status[slot] = _OK
+            except Exception as e:
+                logger.exception("Inference process %d batch failed: %s", index, e)
+                self._status[slot] = _ERROR
+                self._counters[counters + 2] += 1
+            self._counters[counters] += 1
+            self._counters[counters + 1] += n
+            self._counters[counters + 3] += (time.perf_counter() - started) * 1000
+            self._complete(slot)
+
+    def _complete(self, slot):
+        with self._slot_lock:
+            if self._abandoned[slot]:
+                # caller หมดเวลารอไปแล้ว: คืน slot เอง
+                self._abandoned[slot] = 0
+                self._busy[slot] = 0
+                self._free.release()
+            else:
+                self._done[slot].release()
+
+    # -------------------------------------------------
+    # Caller (HTTP worker)
+    # -------------------------------------------------
+    def _acquire_slot(self, deadline):
+        if not self._free.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise TimeoutError(f"No free inference slot after {self.timeout}s")
+        with self._slot_lock:
+            for slot in range(self.num_slots):
+                if not self._busy[slot]:
+                    self._busy[slot] = 1
+                    return slot
+        raise RuntimeError("Inference slot accounting is inconsistent")
+
+    def _release_slot(self, slot):
+        with self._slot_lock:
+            self._busy[slot] = 0
+        self._free.release()
+
+    def _wait_slot(self, slot, deadline):
+        if self._done[slot].acquire(timeout=max(0.0, deadline - time.monotonic())):
+            return True
+        with self._slot_lock:
+            # process อาจเพิ่งเสร็จระหว่างที่เรารอ lock
+            if self._done[slot].acquire(block=False):
+                return True
+            self._abandoned[slot] = 1
+        return False
+
+    def forward(self, batch):
+        """batch: (N, 3, H, W) float32 -> logits (N, num_classes) แบ่งเป็น chunk ละไม่เกินหนึ่ง slot"""
+        if self._owner_pid is None:
+            raise RuntimeError("Inference pool is not started")
+        batch = np.asarray(batch, dtype=np.float32)
+        deadline = time.monotonic() + self.timeout
+        outputs = np.empty((len(batch), self.num_classes), dtype=np.float32)
+
+        submitted = []  # (slot, start, n)
+        try:
+            for start in range(0, len(batch), self.slot_batch_size):
+                chunk = batch[start:start + self.slot_batch_size]
+                slot = self._acquire_slot(deadline)
+                try:
+                    self._input_view(slot, len(chunk))[:] = chunk
+                    self._put_task((slot, len(chunk)))
+                except BaseException:
+                    self._release_slot(slot)
+                    raise
+                submitted.append((slot, start, len(chunk)))
+
+            failed = False
+            while submitted:
+                slot, start, n = submitted[0]
+                if not self._wait_slot(slot, deadline):
+                    submitted.pop(0)
+                    raise TimeoutError(f"Inference timed out after {self.timeout}s")
+                if self._status[slot] == _OK:
+                    outputs[start:start + n] = self._output_view(slot, n)
+                else:
+                    failed = True
+                submitted.pop(0)
+                self._release_slot(slot)
+            if failed:
+                raise RuntimeError("Inference pool batch failed")
+            return outputs
+        finally:
+            # chunk ที่ส่งไปแล้วแต่ยังไม่ได้รอ (error/timeout ระหว่างทาง): ให้ process คืน slot เอง
+            for slot, _, _ in submitted:
+                if not self._wait_slot(slot, time.monotonic()):
+                    continue
+                self._release_slot(slot)
+
+    # -------------------------------------------------
+    # Metrics
+    # -------------------------------------------------
+    def stats(self):
+        if self._owner_pid is None:
+            return {"processes": self.processes, "started": False}
+        per_process = []
+        for index in range(self.processes):
+            tasks, items, errors, busy_ms = self._counters[index * _COUNTERS:(index + 1) * _COUNTERS]
+            per_process.append({
+                "pid": self._pids[index],
+                "alive": _pid_alive(self._pids[index]),
+                "ready": self._state[index] == _READY,
+                "tasks": int(tasks),
+                "items": int(items),
+                "errors": int(errors),
+                "avg_forward_ms": round(busy_ms / tasks, 3) if tasks else 0.0,
+            })
+        return {
+            "processes": self.processes,
+            "threads_per_process": self.threads,
+            "alive": sum(1 for p in per_process if p["alive"]),
+            "slots": self.num_slots,
+            "slot_batch_size": self.slot_batch_size,
+            "slots_in_use": sum(1 for busy in self._busy if busy),
+            "per_process": per_process,
+        }
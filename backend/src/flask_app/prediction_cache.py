@@ -0,0 +1,168 @@
+# File: backend/src/flask_app/prediction_cache.py
+# Purpose: LRU cache ผลการ predict (จำกัดทั้งจำนวนและอายุ) key = hash ของไฟล์ที่อัปโหลด + model version
+# ผู้ใช้มักอัปโหลดรูปเดิมซ้ำ (retry บนเน็ตมือถือ / แก้แล้วส่งใหม่)
+# request ที่มี key เดียวกันเข้ามาพร้อมกันจะรอผลจาก inference ครั้งเดียว (in-flight coalescing)
+
+import os
+import hashlib
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_caches = weakref.WeakSet()
+
+
+def content_key(content, model_version):
+    """sha256 ของ bytes ที่อัปโหลด ผูกกับ model version (เปลี่ยนโมเดลแล้ว cache เดิมใช้ไม่ได้)"""
+    digest = hashlib.sha256(content).hexdigest()
+    return f"{model_version}:{digest}"
+
+
+class _InFlight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PredictionCache:
+    def __init__(self, max_entries=1024, ttl_s=600.0):
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl_s)
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}
+
+        # metrics
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._expirations = 0
+
+        _caches.add(self)
+
+    def _reinit_after_fork(self):
+        """ใน process ลูกหลัง fork: lock อาจถูกถือค้างไว้โดย thread ของ parent ที่ไม่ได้ตามมา"""
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl > 0
+
+    def _get_locked(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._entries[key]
+            self._expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put_locked(self, key, value, now):
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def get(self, key):
+        """คืน value หรือ None ถ้าไม่มี/หมดอายุ"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._get_locked(key, time.monotonic())
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._put_locked(key, value, time.monotonic())
+
+    def get_or_compute(self, key, compute):
+        """
+        คืนค่าจาก cache ถ้ามี ถ้าไม่มีจะเรียก compute() ครั้งเดียวต่อ key
+        caller อื่นที่ขอ key เดียวกันระหว่างนั้นจะรอผลเดียวกัน
+        exception จาก compute จะส่งต่อให้ทุก caller และไม่ถูก cache
+        """
+        if not self.enabled:
+            return compute()
+
+        with self._lock:
+            entry = self._get_locked(key, time.monotonic())
+            if entry is not None:
+                self._hits += 1
+                return entry[1]
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                inflight = self._inflight[key] = _InFlight()
+                owner = True
+                self._misses += 1
+            else:
+                owner = False
+                self._coalesced += 1
+
+        if not owner:
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.result
+
+        try:
+            inflight.result = compute()
+            with self._lock:
+                self._put_locked(key, inflight.result, time.monotonic())
+            return inflight.result
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            inflight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._inflight),
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+
+def _reinit_caches_after_fork():
+    for cache in list(_caches):
+        cache._reinit_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_caches_after_fork)
@@ -0,0 +1,205 @@
+# File: backend/src/flask_app/recommendation_refresh.py
+# Purpose: Job refresh ตาราง Recommendations แบบ incremental (ดู flask_app.recommendation_store)
+#
+# แต่ละรอบคำนวณใหม่เฉพาะผู้ใช้ที่ข้อมูลเปลี่ยนตั้งแต่ watermark ของรอบก่อน (ตาราง RefreshWatermarks)
+#   food  - MealDetails ที่ meal_detail_id ใหม่กว่า watermark + DailyCalories ของวันนี้ที่ updated_at ใหม่กว่า
+#   sport - ActivityDetail ที่ activity_detail_id ใหม่กว่า watermark
+# รอบแรก (ยังไม่มี watermark) หรือ --full คำนวณทุกผู้ใช้ที่มีประวัติ
+# ผลของแต่ละกลุ่มผู้ใช้ commit ทันที watermark เขียนหลังกลุ่มสุดท้าย (ล้มกลางทางรอบหน้าทำซ้ำจากจุดเดิม)
+#
+# ตัวอย่าง (จาก backend/src):
+#   python -m flask_app.recommendation_refresh                 # รอบเดียว ทั้ง food และ sport
+#   python -m flask_app.recommendation_refresh --kind food --full
+#   python -m flask_app.recommendation_refresh --loop 300      # รันค้างไว้ ทุก 5 นาที
+
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from flask_app.db_pool import get_pool
+from flask_app.recommendation_store import recommendation_store, KIND_FOOD, KIND_SPORT
+from flask_app.refresh_state import read_watermarks, write_watermarks
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]  # backend
+sys.path.insert(0, str(PROJECT_ROOT / 'models' / 'recommendation_model'))
+
+from food_recommend import FoodRecommendationSystem  # noqa: E402
+from sport_recommend import SportRecommendationSystem  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_MEAL_DETAIL = 'recommendations.food.meal_detail_id'
+WATERMARK_DAILY_UPDATED = 'recommendations.food.daily_updated_at'
+WATERMARK_ACTIVITY_DETAIL = 'recommendations.sport.activity_detail_id'
+
+# DailyCalories ที่ updated_at ก่อนเริ่มรอบไม่เกินเท่านี้ถูกตรวจซ้ำในรอบถัดไป
+# (transaction ที่ UPDATE ไปแล้วแต่ commit หลังรอบนี้อ่านข้อมูล)
+REFRESH_OVERLAP_S = 60
+# ผู้ใช้ต่อรอบของ recommend_*_batch และต่อ transaction ที่เขียนลง Recommendations
+REFRESH_CHUNK_USERS = 1000
+
+
+def _fetch_column(cur, query, params=()):
+    cur.execute(query, params)
+    return [row[0] for row in cur.fetchall()]
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _write_chunk(kind, entries, computed_at, watermarks=None):
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        recommendation_store.put_many(kind, entries, computed_at, cur=cur)
+        if watermarks:
+            write_watermarks(cur, watermarks)
+        conn.commit()
+        cur.close()
+
+
+def _plan(kind, full):
+    """
+    อ่าน watermark แล้วหาผู้ใช้ที่ต้องคำนวณใหม่
+    คืน (db_now, user_ids, watermark ใหม่ที่จะเขียนเมื่อรอบนี้เสร็จ)
+    """
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        # เวลาของ DB ก่อนอ่านข้อมูลใด ๆ = computed_at ของทุกแถวในรอบนี้ และ watermark ของ DailyCalories
+        cur.execute("SELECT NOW()")
+        db_now = cur.fetchone()[0]
+
+        if kind == KIND_FOOD:
+            marks = read_watermarks(cur, [WATERMARK_MEAL_DETAIL, WATERMARK_DAILY_UPDATED])
+            upto = _fetch_column(cur, "SELECT COALESCE(MAX(meal_detail_id), 0) FROM MealDetails")[0]
+            if full or WATERMARK_MEAL_DETAIL not in marks or WATERMARK_DAILY_UPDATED not in marks:
+                user_ids = _fetch_column(cur, "SELECT DISTINCT user_id FROM Meals ORDER BY user_id")
+            else:
+                user_ids = _fetch_column(cur, """
+                    SELECT m.user_id
+                    FROM MealDetails md
+                    JOIN Meals m ON m.meal_id = md.meal_id
+                    WHERE md.meal_detail_id > %s AND md.meal_detail_id <= %s
+                    UNION
+                    SELECT user_id FROM DailyCalories
+                    WHERE date = %s AND updated_at >= %s
+                """, (int(marks[WATERMARK_MEAL_DETAIL]), upto,
+                      datetime.now().strftime('%Y-%m-%d'), marks[WATERMARK_DAILY_UPDATED]))
+            daily_since = db_now - timedelta(seconds=REFRESH_OVERLAP_S)
+            watermarks = {WATERMARK_MEAL_DETAIL: upto, WATERMARK_DAILY_UPDATED: daily_since.isoformat(sep=' ')}
+        else:
+            marks = read_watermarks(cur, [WATERMARK_ACTIVITY_DETAIL])
+            upto = _fetch_column(cur, "SELECT COALESCE(MAX(activity_detail_id), 0) FROM ActivityDetail")[0]
+            if full or WATERMARK_ACTIVITY_DETAIL not in marks:
+                user_ids = _fetch_column(cur, """
+                    SELECT DISTINCT a.user_id
+                    FROM Activity a
+                    JOIN ActivityDetail ad ON a.activity_id = ad.activity_id
+                    ORDER BY a.user_id
+                """)
+            else:
+                user_ids = _fetch_column(cur, """
+                    SELECT DISTINCT a.user_id
+                    FROM ActivityDetail ad
+                    JOIN Activity a ON a.activity_id = ad.activity_id
+                    WHERE ad.activity_detail_id > %s AND ad.activity_detail_id <= %s
+                """, (int(marks[WATERMARK_ACTIVITY_DETAIL]), upto))
+            watermarks = {WATERMARK_ACTIVITY_DETAIL: upto}
+        cur.close()
+    return db_now, sorted(set(user_ids)), watermarks
+
+
+def refresh_food(recommender, full=False, top_n=None):
+    """คำนวณผลแนะนำอาหาร (ของวันนี้) ใหม่ให้ผู้ใช้ที่เปลี่ยน คืนสรุป {'kind', 'users', 'success'}"""
+    top_n = top_n or recommendation_store.top_n
+    db_now, user_ids, watermarks = _plan(KIND_FOOD, full)
+    for_date = datetime.now().date()
+    summary = {'kind': KIND_FOOD, 'users': len(user_ids), 'success': 0}
+    chunks = list(_chunks(user_ids, REFRESH_CHUNK_USERS)) or [[]]
+    for i, chunk in enumerate(chunks):
+        results = recommender.recommend_foods_batch(chunk, date=for_date.isoformat(), top_n=top_n)
+        summary['success'] += sum(1 for result in results.values() if result['success'])
+        entries = [(user_id, for_date, top_n, None, result) for user_id, result in results.items()]
+        _write_chunk(KIND_FOOD, entries, db_now, watermarks if i == len(chunks) - 1 else None)
+    return summary
+
+
+def refresh_sport(recommender, full=False, top_n=None, k_neighbors=5):
+    """คำนวณผลแนะนำกีฬาใหม่ให้ผู้ใช้ที่เปลี่ยน (ดึง activity ใหม่เข้า sport matrix ครั้งเดียวต่อกลุ่ม)"""
+    top_n = top_n or recommendation_store.top_n
+    db_now, user_ids, watermarks = _plan(KIND_SPORT, full)
+    summary = {'kind': KIND_SPORT, 'users': len(user_ids), 'success': 0}
+    chunks = list(_chunks(user_ids, REFRESH_CHUNK_USERS)) or [[]]
+    for i, chunk in enumerate(chunks):
+        results = recommender.recommend_sports_batch(chunk, top_n=top_n, k_neighbors=k_neighbors)
+        summary['success'] += sum(1 for result in results.values() if result['success'])
+        entries = [(user_id, None, top_n, k_neighbors, result) for user_id, result in results.items()]
+        _write_chunk(KIND_SPORT, entries, db_now, watermarks if i == len(chunks) - 1 else None)
+    return summary
+
+
+def _db_settings():
+    return dict(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        database=os.getenv('DB_NAME', 'calories_app')
+    )
+
+
+def run_once(kinds, full=False, top_n=None, k_neighbors=5, recommenders=None):
+    """refresh ทุก kind ใน kinds คืน list ของสรุป (kind ที่ล้มจะถูก log แล้วทำ kind ถัดไป)"""
+    if recommenders is None:
+        recommenders = {}
+    summaries = []
+    for kind in kinds:
+        started = time.perf_counter()
+        try:
+            if kind == KIND_FOOD:
+                if kind not in recommenders:
+                    recommenders[kind] = FoodRecommendationSystem(**_db_settings())
+                summary = refresh_food(recommenders[kind], full, top_n)
+            else:
+                if kind not in recommenders:
+                    recommenders[kind] = SportRecommendationSystem(**_db_settings())
+                summary = refresh_sport(recommenders[kind], full, top_n, k_neighbors)
+        except Exception as e:
+            logger.exception("Recommendation refresh (%s) failed: %s", kind, e)
+            continue
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+        logger.info("✅ Recommendation refresh (%s): %d users, %d with recommendations in %.2fs",
+                    kind, summary['users'], summary['success'], summary['seconds'])
+        summaries.append(summary)
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally refresh precomputed recommendations")
+    parser.add_argument("--kind", choices=[KIND_FOOD, KIND_SPORT, "all"], default="all")
+    parser.add_argument("--full", action="store_true", help="คำนวณใหม่ทุกผู้ใช้ ไม่ใช้ watermark")
+    parser.add_argument("--top-n", type=int, help="จำนวนที่เก็บต่อผู้ใช้ (default: RECOMMEND_STORE_TOP_N)")
+    parser.add_argument("--k-neighbors", type=int, default=5)
+    parser.add_argument("--loop", type=float, default=0, help="รันซ้ำทุก N วินาที (0 = รอบเดียว)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s in %(module)s: %(message)s")
+
+    kinds = [KIND_FOOD, KIND_SPORT] if args.kind == "all" else [args.kind]
+    recommenders = {}
+    full = args.full
+    while True:
+        summaries = run_once(kinds, full, args.top_n, args.k_neighbors, recommenders)
+        print(summaries, file=sys.stderr)
+        if args.loop <= 0:
+            return 0 if len(summaries) == len(kinds) else 1
+        full = False
+        time.sleep(args.loop)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,9 +3,6 @@ from flask import Blueprint, request, jsonify, current_app
 import os
 import sys
 from pathlib import Path
-from functools import wraps
-import jwt
-from jwt import ExpiredSignatureError, InvalidTokenError
 
 # ============================================
 # Path setup
@@ -20,31 +17,18 @@ sys.path.insert(0, str(MODELS_DIR))
 # ============================================
 try:
     from food_recommend import FoodRecommendationSystem
-    from sport_recommend import SportRecommendationSystem
+    from sport_recommend import SportRecommendationSystem, ENGINES, ENGINE_KNN, ENGINE_ITEM
 except ImportError as e:
     raise ImportError(f"Cannot import recommendation models: {e}")
 
 # ============================================
-# Auth decorator
+# Auth decorator (ใช้ร่วมกันทุก blueprint)
 # ============================================
-def require_auth(f):
-    @wraps(f)
-    def wrapper(*args, **kwargs):
-        auth_header = request.headers.get("Authorization", None)
-        if not auth_header or not auth_header.startswith("Bearer "):
-            return jsonify({"success": False, "message": "Invalid or missing token"}), 401
-
-        token = auth_header.split(" ")[1]
-        try:
-            payload = jwt.decode(token, os.getenv("JWT_SECRET"), algorithms=["HS256"])
-            request.user_id = payload["id"]
-        except ExpiredSignatureError:
-            return jsonify({"success": False, "message": "Token expired"}), 401
-        except InvalidTokenError:
-            return jsonify({"success": False, "message": "Invalid token"}), 401
+from flask_app.auth import require_auth, require_internal_token, verify_user_access
+from flask_app.recommendation_store import recommendation_store, parse_for_date, KIND_FOOD, KIND_SPORT
 
-        return f(*args, **kwargs)
-    return wrapper
+# จำนวนผู้ใช้สูงสุดต่อ request ของ batch endpoint (job ใหญ่กว่านี้ใช้ CLI flask_app.food_recommend_batch)
+RECOMMEND_BATCH_MAX_USERS = int(os.getenv('RECOMMEND_BATCH_MAX_USERS', '5000'))
 
 # ============================================
 # Blueprint setup
@@ -68,15 +52,6 @@ sport_recommender = SportRecommendationSystem(
     database=os.getenv('DB_NAME', 'calories_app')
 )
 
-# ============================================
-# Helper
-# ============================================
-def verify_user_access(user_id_from_token, user_id_from_path):
-    try:
-        return int(user_id_from_token) == int(user_id_from_path)
-    except (TypeError, ValueError):
-        return False
-
 # ============================================
 # Routes
 # ============================================
@@ -94,13 +69,53 @@ def recommend_food(userId):
         except ValueError:
             top_n = 3
 
-        result = food_recommender.recommend_foods(user_id=userId, date=date, top_n=top_n)
+        for_date = parse_for_date(date)
+        if for_date is None or for_date != parse_for_date(None):
+            # store มีแถวเดียวต่อผู้ใช้ของวันนี้ (job refresh คำนวณวันนี้) วันอื่นคำนวณสดและไม่เขียนทับแถวของวันนี้
+            result = food_recommender.recommend_foods(user_id=userId, date=date, top_n=top_n)
+        else:
+            # lookup ใน store ก่อน (miss แล้วค่อยคำนวณสดและเขียนกลับ)
+            result = recommendation_store.serve(
+                KIND_FOOD, userId,
+                lambda n: food_recommender.recommend_foods(user_id=userId, date=for_date.isoformat(), top_n=n),
+                top_n, for_date=for_date
+            )
         return jsonify(result), (200 if result.get('success') else 404)
 
     except Exception as e:
         current_app.logger.exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# ---------- Food (batch, internal) ----------
+@recommendation_bp.route('/api/internal/food-recommend/batch', methods=['POST'])
+@require_internal_token
+def recommend_food_batch():
+    """แนะนำอาหารให้หลายผู้ใช้ในครั้งเดียว body: {"user_ids": [...], "top_n": 3, "date": "YYYY-MM-DD"}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        user_ids = data.get('user_ids')
+        if not isinstance(user_ids, list) or not user_ids:
+            return jsonify({'success': False, 'message': 'user_ids must be a non-empty list'}), 400
+        if len(user_ids) > RECOMMEND_BATCH_MAX_USERS:
+            return jsonify({'success': False,
+                            'message': f'Too many user_ids (max {RECOMMEND_BATCH_MAX_USERS})'}), 400
+        try:
+            user_ids = [int(user_id) for user_id in user_ids]
+            top_n = int(data.get('top_n', 3))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'user_ids and top_n must be integers'}), 400
+
+        results = food_recommender.recommend_foods_batch(user_ids, date=data.get('date'), top_n=top_n)
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'results': [{'user_id': user_id, **result} for user_id, result in results.items()]
+        }), 200
+
+    except Exception as e:
+        current_app.logger.exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ---------- Sport ----------
 @recommendation_bp.route('/api/sport-recommend/<int:userId>', methods=['GET'])
 @require_auth
@@ -114,8 +129,19 @@ def recommend_sport(userId):
             k_neighbors = int(request.args.get('k_neighbors', 5))
         except ValueError:
             top_n, k_neighbors = 3, 5
-
-        result = sport_recommender.recommend_sports(user_id=userId, top_n=top_n, k_neighbors=k_neighbors)
+        engine = request.args.get('engine', ENGINE_KNN)
+        if engine not in ENGINES:
+            return jsonify({'success': False, 'message': f"engine must be one of: {', '.join(ENGINES)}"}), 400
+
+        if engine == ENGINE_ITEM:
+            # item-item อ่านจาก list ที่คำนวณไว้แล้วในหน่วยความจำ ไม่ผ่าน store (store เก็บผลของ knn)
+            result = sport_recommender.recommend_sports(user_id=userId, top_n=top_n, engine=engine)
+        else:
+            result = recommendation_store.serve(
+                KIND_SPORT, userId,
+                lambda n: sport_recommender.recommend_sports(user_id=userId, top_n=n, k_neighbors=k_neighbors),
+                top_n, k_neighbors=k_neighbors
+            )
         return jsonify(result), (200 if result.get('success') else 404)
 
     except Exception as e:
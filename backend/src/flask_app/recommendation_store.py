@@ -0,0 +1,175 @@
+# File: backend/src/flask_app/recommendation_store.py
+# Purpose: ผลแนะนำอาหาร/กีฬาที่คำนวณไว้ล่วงหน้า (ตาราง Recommendations หนึ่งแถวต่อ user ต่อ kind)
+#
+# /api/food-recommend และ /api/sport-recommend อ่านจาก store ด้วย lookup ตาม primary key ครั้งเดียว
+# ถ้าไม่มีแถว / หมดอายุ / พารามิเตอร์ไม่ตรง จะคำนวณสดแล้วเขียนกลับ (write-through) ให้ request ถัดไป
+# job flask_app.recommendation_refresh คำนวณใหม่เฉพาะผู้ใช้ที่มีมื้ออาหาร/กิจกรรมใหม่ตั้งแต่รอบก่อน
+#
+# ผลแนะนำอาหารขึ้นกับแคลอรีที่เหลือของวัน (for_date) แถวจึงถือว่าเก่าทันทีเมื่อ DailyCalories
+# ของวันนั้นถูกแก้หลัง computed_at (บันทึกมื้อ, เพิ่มกิจกรรม, ตั้งเป้าใหม่) ตรวจใน query lookup เดียวกัน
+
+import os
+import json
+import logging
+from datetime import datetime
+
+from flask_app.db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+RECOMMEND_STORE_ENABLED = os.getenv('RECOMMEND_STORE_ENABLED', 'true').lower() == 'true'
+# จำนวนรายการที่เก็บต่อผู้ใช้ (request ที่ top_n ไม่เกินนี้ตัดจากแถวเดียวกันได้)
+RECOMMEND_STORE_TOP_N = int(os.getenv('RECOMMEND_STORE_TOP_N', '10'))
+# แถวที่เก่ากว่านี้ถือว่า miss (กันผลค้างจากการลบข้อมูลที่ watermark ตรวจไม่เห็น)
+RECOMMEND_STORE_MAX_AGE_S = float(os.getenv('RECOMMEND_STORE_MAX_AGE_S', '86400'))
+
+KIND_FOOD = 'food'
+KIND_SPORT = 'sport'
+
+# คืนหนึ่งแถวเสมอ (NOW() ของ DB ใช้เป็น computed_at ของผลที่คำนวณสดต่อจากนี้)
+_LOOKUP_QUERY = """
+    SELECT NOW() AS db_now, r.for_date, r.top_n, r.k_neighbors, r.payload, r.computed_at,
+           dc.updated_at AS daily_updated_at
+    FROM (SELECT 1) AS probe
+    LEFT JOIN Recommendations r ON r.user_id = %s AND r.kind = %s
+    LEFT JOIN DailyCalories dc ON dc.user_id = r.user_id AND dc.date = r.for_date
+"""
+
+_UPSERT_QUERY = """
+    INSERT INTO Recommendations (user_id, kind, for_date, top_n, k_neighbors, payload, computed_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        for_date = VALUES(for_date), top_n = VALUES(top_n), k_neighbors = VALUES(k_neighbors),
+        payload = VALUES(payload), computed_at = VALUES(computed_at)
+"""
+
+
+def parse_for_date(date):
+    """'YYYY-MM-DD' หรือ None (= วันนี้ เหมือน recommend_foods) เป็น date, รูปแบบผิดคืน None"""
+    if date is None:
+        return datetime.now().date()
+    try:
+        return datetime.strptime(date, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _with_freshness(result, top_n, computed_at, source):
+    result = dict(result)
+    if 'recommendations' in result:
+        result['recommendations'] = list(result['recommendations'])[:top_n]
+    result['computed_at'] = computed_at.isoformat() if computed_at else None
+    result['source'] = source
+    return result
+
+
+class RecommendationStore:
+    def __init__(self, top_n=RECOMMEND_STORE_TOP_N, max_age_s=RECOMMEND_STORE_MAX_AGE_S,
+                 enabled=RECOMMEND_STORE_ENABLED):
+        self.top_n = int(top_n)
+        self.max_age_s = float(max_age_s)
+        self.enabled = enabled
+
+        # metrics
+        self._hits = 0
+        self._misses = {"absent": 0, "expired": 0, "stale": 0, "params": 0}
+        self._lookup_errors = 0
+        self._write_errors = 0
+        self._rows_written = 0
+
+    # -------------------------------------------------
+    # Read path
+    # -------------------------------------------------
+    def _lookup(self, user_id, kind):
+        with get_pool().connection() as conn:
+            cur = conn.cursor(dictionary=True)
+            cur.execute(_LOOKUP_QUERY, (user_id, kind))
+            row = cur.fetchone()
+            cur.close()
+        return row
+
+    def _miss_reason(self, row, top_n, for_date, k_neighbors):
+        if row['payload'] is None:
+            return "absent"
+        if (row['db_now'] - row['computed_at']).total_seconds() > self.max_age_s:
+            return "expired"
+        if row['daily_updated_at'] is not None and row['daily_updated_at'] >= row['computed_at']:
+            return "stale"
+        if row['top_n'] < top_n or row['for_date'] != for_date or row['k_neighbors'] != k_neighbors:
+            return "params"
+        return None
+
+    def serve(self, kind, user_id, compute, top_n, for_date=None, k_neighbors=None):
+        """
+        ผลแนะนำของ user จาก store หรือคำนวณสดด้วย compute(top_n) เมื่อ miss
+        ผลลัพธ์มี computed_at (เวลาที่คำนวณ) และ source ('store' | 'live') เพิ่มจากของ recommender
+        """
+        if not self.enabled or top_n < 1:
+            return _with_freshness(compute(top_n), top_n, datetime.now(), 'live')
+
+        try:
+            row = self._lookup(user_id, kind)
+            reason = self._miss_reason(row, top_n, for_date, k_neighbors)
+            stored = json.loads(row['payload']) if reason is None else None
+        except Exception as e:
+            # ตารางยังไม่ถูกสร้าง / DB มีปัญหา / payload เสีย: ยังตอบได้ด้วยการคำนวณสด
+            self._lookup_errors += 1
+            logger.warning("Recommendation store lookup failed: %s", e)
+            return _with_freshness(compute(top_n), top_n, datetime.now(), 'live')
+
+        if reason is None:
+            self._hits += 1
+            return _with_freshness(stored, top_n, row['computed_at'], 'store')
+
+        self._misses[reason] += 1
+        stored_top_n = max(top_n, self.top_n)
+        result = compute(stored_top_n)
+        # ผลที่ไม่สำเร็จจาก path นี้อาจมาจาก DB error ที่ recommender กลืนไว้ จึงไม่เขียนลง store
+        if result.get('success'):
+            try:
+                self.put_many(kind, [(user_id, for_date, stored_top_n, k_neighbors, result)], row['db_now'])
+            except Exception as e:
+                self._write_errors += 1
+                logger.warning("Recommendation store write failed: %s", e)
+        return _with_freshness(result, top_n, row['db_now'], 'live')
+
+    # -------------------------------------------------
+    # Write path
+    # -------------------------------------------------
+    def put_many(self, kind, entries, computed_at, cur=None):
+        """
+        upsert [(user_id, for_date, top_n, k_neighbors, result), ...]
+        computed_at ควรเป็นเวลาของ DB ก่อนเริ่มอ่านข้อมูลที่ใช้คำนวณ
+        ถ้าส่ง cur มา ผู้เรียก commit เอง (เช่น job ที่เขียน watermark ใน transaction เดียวกัน)
+        """
+        rows = [(user_id, kind, for_date, top_n, k_neighbors, json.dumps(result, ensure_ascii=False), computed_at)
+                for user_id, for_date, top_n, k_neighbors, result in entries]
+        if not rows:
+            return
+        if cur is not None:
+            cur.executemany(_UPSERT_QUERY, rows)
+        else:
+            with get_pool().connection() as conn:
+                own_cur = conn.cursor()
+                own_cur.executemany(_UPSERT_QUERY, rows)
+                conn.commit()
+                own_cur.close()
+        self._rows_written += len(rows)
+
+    def stats(self):
+        lookups = self._hits + sum(self._misses.values())
+        return {
+            "enabled": self.enabled,
+            "top_n": self.top_n,
+            "max_age_s": self.max_age_s,
+            "hits": self._hits,
+            "misses": dict(self._misses),
+            "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+            "lookup_errors": self._lookup_errors,
+            "write_errors": self._write_errors,
+            "rows_written": self._rows_written,
+        }
+
+
+# store ที่ใช้ร่วมกันทั้ง process
+recommendation_store = RecommendationStore()
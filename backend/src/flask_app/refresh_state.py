@@ -0,0 +1,26 @@
+# File: backend/src/flask_app/refresh_state.py
+# Purpose: Watermark ของ job แบบ incremental (ตาราง RefreshWatermarks: name -> value)
+#
+# job อ่าน watermark ของรอบก่อน ประมวลผลเฉพาะแถวที่ใหม่กว่า แล้วเขียน watermark ใหม่
+# ใน transaction เดียวกับผลลัพธ์ (ถ้า job ล้มกลางทาง รอบถัดไปจะเริ่มจาก watermark เดิม)
+# value เก็บเป็น string ผู้เรียกแปลงชนิดเอง (id ล่าสุด, timestamp, catalog version)
+
+
+def read_watermarks(cur, names):
+    """{name: value} ของ watermark ที่มีอยู่แล้ว (ชื่อที่ยังไม่เคยเขียนจะไม่อยู่ใน dict)"""
+    names = list(names)
+    if not names:
+        return {}
+    placeholders = ', '.join(['%s'] * len(names))
+    cur.execute(f"SELECT name, value FROM RefreshWatermarks WHERE name IN ({placeholders})", names)
+    return {row[0]: row[1] for row in cur.fetchall()}
+
+
+def write_watermarks(cur, values):
+    """upsert {name: value} (ไม่ commit ให้ผู้เรียก commit พร้อมผลลัพธ์)"""
+    if not values:
+        return
+    cur.executemany("""
+        INSERT INTO RefreshWatermarks (name, value) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE value = VALUES(value)
+    """, [(name, None if value is None else str(value)) for name, value in values.items()])
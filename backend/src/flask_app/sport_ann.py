@@ -0,0 +1,484 @@
+# File: backend/src/flask_app/sport_ann.py
+# Purpose: Approximate nearest-neighbour index (random-projection LSH) ของผู้ใช้ สำหรับ sport KNN
+#
+# exact KNN ใน SportMatrix.neighbors ต้องคูณกับทุกผู้ใช้ที่เล่นกีฬาร่วมกัน (กีฬายอดนิยม = เกือบทุกคน)
+# index นี้ hash เวกเตอร์ (b_u * idf) ของผู้ใช้ด้วย hyperplane สุ่ม tables ชุด ชุดละ bits บิต
+# ผู้ใช้ที่ code ตรงกัน (หรือต่างกันไม่เกิน probes บิต) ในตารางใดตารางหนึ่งเป็น candidate
+# แล้วเรียง candidate ด้วย cosine similarity จริงจาก SportMatrix.rerank
+#
+# - build offline แล้วบันทึกเป็น .npz (python -m flask_app.sport_ann build) startup โหลดจากไฟล์
+#   แล้ว hash ซ้ำเฉพาะผู้ใช้ที่มี activity ใหม่กว่า watermark ของไฟล์
+# - ระหว่างทำงาน ผู้ใช้ที่ matrix อัปเดต (listener ของ sport_matrix) ถูก hash ใหม่เข้า delta
+#   (copy-on-write) เมื่อ delta ใหญ่เกิน SPORT_ANN_COMPACT_FRACTION จะ build main ใหม่
+# - hyperplane ของแต่ละกีฬาสุ่มจาก (seed, sport_id) กีฬาใหม่จึง hash ได้โดยไม่ต้อง build ใหม่
+# - recall/latency ปรับได้ตอน query: SPORT_ANN_PROBES (0-2) และ SPORT_ANN_MAX_CANDIDATES
+#   ตอน build: SPORT_ANN_TABLES / SPORT_ANN_BITS ตรวจด้วย python -m flask_app.sport_ann evaluate
+#
+# ใช้เมื่อจำนวนผู้ใช้ใน matrix >= SPORT_ANN_MIN_USERS (น้อยกว่านั้น exact เร็วกว่า)
+# ค่า default จาก benchmarks/sport_ann_benchmark.py (60 กีฬา, 12 x 14 บิต, probes=1, p50 ต่อ query):
+#   ผู้ใช้ 300k: exact 3.8 ms, ANN 4.2 ms | 500k: exact 7.4 ms, ANN 5.1 ms | 1M: exact 15.2 ms, ANN 5.8 ms
+#   probes=0 เร็วกว่า (2.3-2.5 ms) แต่ recall@5 ~0.92, probes=2 ช้ากว่า 1 โดย recall ไม่เพิ่ม (~0.97-0.98)
+# ข้อมูลจริงตรวจจุดตัดใหม่ด้วย python -m flask_app.sport_ann evaluate
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+import statistics
+from datetime import datetime
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+
+from flask_app.db_pool import get_pool
+from flask_app.sport_matrix import sport_matrix
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]  # backend
+
+SPORT_ANN_PATH = Path(os.getenv(
+    'SPORT_ANN_PATH', str(PROJECT_ROOT / 'models' / 'recommendation_model' / 'sport_ann_index.npz')
+))
+SPORT_ANN_MIN_USERS = int(os.getenv('SPORT_ANN_MIN_USERS', '500000'))
+SPORT_ANN_TABLES = int(os.getenv('SPORT_ANN_TABLES', '12'))
+SPORT_ANN_BITS = int(os.getenv('SPORT_ANN_BITS', '14'))
+SPORT_ANN_SEED = int(os.getenv('SPORT_ANN_SEED', '0'))
+SPORT_ANN_PROBES = int(os.getenv('SPORT_ANN_PROBES', '1'))
+SPORT_ANN_MAX_CANDIDATES = int(os.getenv('SPORT_ANN_MAX_CANDIDATES', '2000'))
+SPORT_ANN_COMPACT_FRACTION = float(os.getenv('SPORT_ANN_COMPACT_FRACTION', '0.05'))
+# โหลด/build index ไม่สำเร็จ (เช่น DB ล่มชั่วคราว) ใช้ exact ไปก่อนแล้วลองใหม่หลังเวลานี้
+SPORT_ANN_RETRY_S = float(os.getenv('SPORT_ANN_RETRY_S', '300'))
+
+# เปลี่ยนเมื่อรูปแบบไฟล์หรือวิธี hash เปลี่ยน (ไฟล์เก่าจะถูก build ใหม่)
+INDEX_FORMAT = 1
+
+
+def _planes(sport_ids, n_planes, seed):
+    """hyperplane ของกีฬาแต่ละชนิด (แถวละ sport_id) สุ่มจาก (seed, sport_id) ค่าเดิมทุกครั้ง"""
+    planes = np.empty((len(sport_ids), n_planes), dtype=np.float32)
+    for i, sport_id in enumerate(sport_ids):
+        planes[i] = np.random.default_rng([seed, int(sport_id)]).standard_normal(n_planes)
+    return planes
+
+
+def hash_users(matrix, rows, idf, tables, bits, seed, planes=None):
+    """
+    codes (len(rows), tables) ของผู้ใช้ใน matrix: บิตที่ b ของตาราง t = sign(<b_u * idf, plane_tb>)
+    idf = {sport_id: idf} ที่ตรึงไว้ตอน build (กีฬาที่ไม่มีตอน build ใช้ idf สูงสุด = มีคนเล่นน้อย)
+    คืน (codes, planes) ส่ง planes กลับมาเพื่อใช้ซ้ำกับ matrix ที่มีชุดกีฬาเดียวกัน
+    """
+    if planes is None:
+        default_idf = max(idf.values()) if idf else 1.0
+        weights = np.array([idf.get(sport_id, default_idf) for sport_id in matrix.sport_ids], dtype=np.float32)
+        planes = _planes(matrix.sport_ids, tables * bits, seed) * weights[:, None]
+    rows = np.asarray(rows, dtype=np.int64)
+    signs = np.asarray(matrix.by_user[rows] @ planes > 0).reshape(len(rows), tables, bits)
+    return (signs * (1 << np.arange(bits)).astype(np.uint32)).sum(axis=2, dtype=np.uint32), planes
+
+
+def _probe_offsets(bits, probes):
+    """XOR mask ของ code ที่ต่างจาก code ของผู้ใช้ไม่เกิน probes บิต (multi-probe LSH) แยกตามระยะ"""
+    return [np.array([sum(1 << b for b in flipped) for flipped in combinations(range(bits), radius)],
+                     dtype=np.uint32)
+            for radius in range(probes + 1)]
+
+
+class SportAnnIndex:
+    """
+    index หนึ่งชุด (immutable หลังสร้าง)
+    main: ต่อตาราง t มี codes ที่เรียงแล้ว (sorted_codes[t]) และตำแหน่งผู้ใช้ (order[t]) ค้นด้วย searchsorted
+    delta: ผู้ใช้ที่ถูก hash ใหม่หลัง build {t: {code: (user_id, ...)}} แถวเดิมของเขาใน main ถูกข้าม (stale)
+    """
+
+    __slots__ = ("tables", "bits", "seed", "idf", "user_ids", "sorted_codes", "order", "stale",
+                 "delta", "delta_codes", "watermark", "built_at", "_plane_cache")
+
+    def __init__(self, tables, bits, seed, idf, user_ids, codes, watermark, built_at):
+        self.tables = tables
+        self.bits = bits
+        self.seed = seed
+        self.idf = idf                        # {sport_id: idf} ที่ใช้ hash (คงที่ตลอดอายุ index)
+        by_id = np.argsort(np.asarray(user_ids, dtype=np.int64), kind='stable')
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)[by_id]   # เรียงตาม user_id (searchsorted)
+        codes = np.asarray(codes, dtype=np.uint32).reshape(-1, tables)[by_id]
+        self.order = np.argsort(codes, axis=0, kind='stable').T.astype(np.int32)
+        self.sorted_codes = np.take_along_axis(codes.T, self.order, axis=1)
+        self.stale = np.zeros(len(self.user_ids), dtype=bool)
+        self.delta = {t: {} for t in range(tables)}
+        self.delta_codes = {}                 # user_id -> codes (tables,) ของ delta
+        self.watermark = watermark
+        self.built_at = built_at
+        self._plane_cache = {}
+
+    # -------------------------------------------------
+    # Build / incremental update
+    # -------------------------------------------------
+    def hash_rows(self, matrix, rows):
+        """codes (len(rows), tables) ตาม hyperplane และ idf ของ index"""
+        key = tuple(matrix.sport_ids)
+        codes, planes = hash_users(matrix, rows, self.idf, self.tables, self.bits, self.seed,
+                                   self._plane_cache.get(key))
+        self._plane_cache = {key: planes}
+        return codes
+
+    @classmethod
+    def build(cls, matrix, tables=SPORT_ANN_TABLES, bits=SPORT_ANN_BITS, seed=SPORT_ANN_SEED):
+        if not 0 < bits <= 32:
+            raise ValueError("bits must be between 1 and 32")
+        idf = {sport_id: float(np.sqrt(matrix.idf_sq[col])) for col, sport_id in enumerate(matrix.sport_ids)}
+        codes, _ = hash_users(matrix, np.arange(len(matrix.user_ids)), idf, tables, bits, seed)
+        return cls(tables, bits, seed, idf, matrix.user_ids, codes, matrix.watermark, datetime.now())
+
+    def with_updates(self, matrix, user_ids, watermark=None):
+        """index ชุดใหม่ที่ hash user_ids ใหม่จาก matrix (main ใช้ร่วมกับชุดเดิม, delta/stale ถูก copy)"""
+        rows, ids = [], []
+        for user_id in user_ids:
+            row = matrix.user_row.get(user_id)
+            if row is not None:
+                rows.append(row)
+                ids.append(user_id)
+        updated = object.__new__(SportAnnIndex)
+        for name in ("tables", "bits", "seed", "idf", "user_ids", "sorted_codes", "order", "built_at",
+                     "_plane_cache"):
+            setattr(updated, name, getattr(self, name))
+        updated.watermark = self.watermark if watermark is None else watermark
+        updated.stale = self.stale.copy()
+        updated.delta = {t: dict(buckets) for t, buckets in self.delta.items()}
+        updated.delta_codes = dict(self.delta_codes)
+        if not ids:
+            return updated
+
+        positions = np.searchsorted(self.user_ids, ids) if len(self.user_ids) else np.zeros(len(ids), dtype=int)
+        codes = self.hash_rows(matrix, rows)
+        for user_id, position, user_codes in zip(ids, positions, codes):
+            if position < len(self.user_ids) and self.user_ids[position] == user_id:
+                updated.stale[position] = True
+            old = updated.delta_codes.get(user_id)
+            for t in range(self.tables):
+                if old is not None:
+                    bucket = tuple(u for u in updated.delta[t].get(int(old[t]), ()) if u != user_id)
+                    if bucket:
+                        updated.delta[t][int(old[t])] = bucket
+                    else:
+                        updated.delta[t].pop(int(old[t]), None)
+                code = int(user_codes[t])
+                updated.delta[t][code] = updated.delta[t].get(code, ()) + (user_id,)
+            updated.delta_codes[user_id] = user_codes
+        return updated
+
+    # -------------------------------------------------
+    # Query
+    # -------------------------------------------------
+    def candidates(self, codes, probes=SPORT_ANN_PROBES, max_candidates=SPORT_ANN_MAX_CANDIDATES):
+        """
+        user_id ของ candidate จาก bucket ที่ code ห่างไม่เกิน probes บิต
+        ไล่ทีละระยะ (bucket ตรงกันของทุกตารางก่อน แล้วจึงห่าง 1 บิต ...) หยุดเมื่อได้ครบ max_candidates
+        """
+        per_bucket = max(1, max_candidates // self.tables)
+        found = []
+        total = 0
+        for masks in _probe_offsets(self.bits, probes):
+            for t in range(self.tables):
+                probe_codes = np.bitwise_xor(np.uint32(codes[t]), masks)
+                if len(self.user_ids):
+                    lo = np.searchsorted(self.sorted_codes[t], probe_codes, side='left')
+                    hi = np.searchsorted(self.sorted_codes[t], probe_codes, side='right')
+                    lengths = np.minimum(hi - lo, per_bucket)
+                    if lengths.any():
+                        # ช่วง [lo, lo + length) ของทุก bucket ต่อกันเป็น index เดียว
+                        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+                        positions = self.order[t][np.repeat(lo, lengths) + offsets]
+                        positions = positions[~self.stale[positions]]
+                        found.append(self.user_ids[positions])
+                        total += len(positions)
+                delta = self.delta[t]
+                if delta:
+                    for code in probe_codes.tolist():
+                        bucket = delta.get(code)
+                        if bucket:
+                            found.append(np.array(bucket[:per_bucket], dtype=np.int64))
+                            total += min(len(bucket), per_bucket)
+            if total >= max_candidates:
+                break
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        candidates, hits = np.unique(np.concatenate(found), return_counts=True)
+        if len(candidates) > max_candidates:
+            # ผู้ใช้ที่ชนหลายตารางมีแนวโน้มใกล้กว่า
+            candidates = candidates[np.argsort(-hits, kind='stable')[:max_candidates]]
+        return candidates
+
+    def neighbors(self, matrix, row, k, probes=SPORT_ANN_PROBES, max_candidates=SPORT_ANN_MAX_CANDIDATES):
+        """k neighbor โดยประมาณ (ใช้แทน SportMatrix.neighbors) คืน [(row, sim)]"""
+        user_id = matrix.user_ids[row]
+        codes = self.delta_codes.get(user_id)
+        if codes is None:
+            codes = self.hash_rows(matrix, [row])[0]
+        candidate_ids = self.candidates(codes, probes, max_candidates)
+        rows = [matrix.user_row.get(int(candidate)) for candidate in candidate_ids]
+        return matrix.rerank(row, [r for r in rows if r is not None], k)
+
+    @property
+    def size(self):
+        return int(len(self.user_ids) - self.stale.sum() + len(self.delta_codes))
+
+    # -------------------------------------------------
+    # Persist
+    # -------------------------------------------------
+    def save(self, path):
+        """เขียนไฟล์ชั่วคราวแล้ว rename (ผู้อ่านไม่เห็นไฟล์ที่เขียนไม่ครบ) delta ถูกรวมเข้า main ก่อนบันทึก"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        keep = ~self.stale
+        user_ids = np.concatenate([self.user_ids[keep], np.array(list(self.delta_codes), dtype=np.int64)])
+        codes = np.zeros((len(self.user_ids), self.tables), dtype=np.uint32)
+        if len(self.user_ids):
+            np.put_along_axis(codes.T, self.order, self.sorted_codes, axis=1)
+        delta_codes = np.array(list(self.delta_codes.values()), dtype=np.uint32).reshape(-1, self.tables)
+        codes = np.concatenate([codes[keep], delta_codes])
+        sport_ids = np.array(list(self.idf), dtype=np.int64)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, format=INDEX_FORMAT, tables=self.tables, bits=self.bits, seed=self.seed,
+                 watermark=self.watermark, user_ids=user_ids, codes=codes,
+                 sport_ids=sport_ids, idf=np.array([self.idf[s] for s in sport_ids], dtype=np.float64))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """โหลดจากไฟล์ คืน None ถ้ารูปแบบไฟล์เก่า"""
+        with np.load(path) as data:
+            if int(data['format']) != INDEX_FORMAT:
+                return None
+            idf = dict(zip(data['sport_ids'].tolist(), data['idf'].tolist()))
+            return cls(int(data['tables']), int(data['bits']), int(data['seed']), idf,
+                       data['user_ids'], data['codes'], int(data['watermark']),
+                       datetime.fromtimestamp(os.path.getmtime(path)))
+
+
+def _users_changed_since(watermark):
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT DISTINCT a.user_id
+            FROM ActivityDetail ad
+            JOIN Activity a ON a.activity_id = ad.activity_id
+            WHERE ad.activity_detail_id > %s
+        """, (watermark,))
+        rows = cur.fetchall()
+        cur.close()
+    return [row[0] for row in rows]
+
+
+class SportAnnStore:
+    def __init__(self, path=SPORT_ANN_PATH, min_users=SPORT_ANN_MIN_USERS, matrix_store=sport_matrix,
+                 compact_fraction=SPORT_ANN_COMPACT_FRACTION, retry_interval=SPORT_ANN_RETRY_S):
+        self.path = Path(path)
+        self.min_users = min_users
+        self.matrix_store = matrix_store
+        self.compact_fraction = compact_fraction
+        self.retry_interval = retry_interval
+
+        self._index = None
+        self._lock = threading.Lock()
+        # ครั้งถัดไปที่ลองโหลด index ได้ (time.monotonic) หลังโหลดไม่สำเร็จ
+        self._next_attempt = 0.0
+
+        # metrics
+        self._loaded_from = None
+        self._builds = 0
+        self._updates = 0
+        self._users_rehashed = 0
+        self._ann_queries = 0
+        self._exact_queries = 0
+        self._errors = 0
+        self._last_error = None
+
+        matrix_store.add_listener(self._on_matrix_update)
+
+    # -------------------------------------------------
+    # Loading / updating
+    # -------------------------------------------------
+    def _build(self, matrix):
+        started = time.perf_counter()
+        index = SportAnnIndex.build(matrix)
+        self._builds += 1
+        logger.info("✅ Sport ANN index built: %d users (%d tables x %d bits) in %.2fs",
+                    len(matrix.user_ids), index.tables, index.bits, time.perf_counter() - started)
+        return index
+
+    def _load_or_build(self, matrix):
+        if self.path.exists():
+            try:
+                index = SportAnnIndex.load(self.path)
+                if index is not None:
+                    changed = _users_changed_since(index.watermark) if index.watermark < matrix.watermark else []
+                    index = index.with_updates(matrix, changed, watermark=matrix.watermark)
+                    self._loaded_from = 'disk'
+                    logger.info("✅ Sport ANN index loaded from %s: %d users, %d re-hashed",
+                                self.path.name, index.size, len(changed))
+                    return index
+                logger.info("Sport ANN index file %s has an old format, rebuilding", self.path.name)
+            except Exception as e:
+                logger.warning("Sport ANN index file %s unreadable, rebuilding: %s", self.path, e)
+        self._loaded_from = 'build'
+        return self._build(matrix)
+
+    def _on_matrix_update(self, matrix, changed_user_ids):
+        """listener ของ sport_matrix: hash ใหม่เฉพาะผู้ใช้ที่เปลี่ยน (full rebuild ของ matrix ไม่ต้องทำอะไร
+        เพราะ index อ้างผู้ใช้ด้วย user_id ไม่ใช่ row)"""
+        index = self._index
+        if index is None or not changed_user_ids:
+            return
+        with self._lock:
+            index = self._index.with_updates(matrix, changed_user_ids, watermark=matrix.watermark)
+            if len(index.delta_codes) > self.compact_fraction * max(1, len(index.user_ids)):
+                index = self._build(matrix)
+            self._index = index
+            self._updates += 1
+            self._users_rehashed += len(changed_user_ids)
+
+    def _reinit_after_fork(self):
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def get_for(self, matrix):
+        """
+        index ที่ใช้กับ matrix นี้ หรือ None (ผู้ใช้น้อยกว่า min_users / โหลดไม่สำเร็จ = ใช้ exact)
+        โหลดไม่สำเร็จจะลองใหม่เมื่อครบ retry_interval
+        """
+        if len(matrix.user_ids) < self.min_users:
+            self._exact_queries += 1
+            return None
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None and time.monotonic() >= self._next_attempt:
+                    try:
+                        self._index = self._load_or_build(matrix)
+                    except Exception as e:
+                        self._next_attempt = time.monotonic() + self.retry_interval
+                        self._errors += 1
+                        self._last_error = str(e)
+                        logger.error("Sport ANN index load failed, using exact KNN (retry in %.0fs): %s",
+                                     self.retry_interval, e)
+                index = self._index
+        if index is None:
+            self._exact_queries += 1
+        else:
+            self._ann_queries += 1
+        return index
+
+    def stats(self):
+        index = self._index
+        return {
+            "loaded": index is not None,
+            "users": index.size if index else 0,
+            "delta_users": len(index.delta_codes) if index else 0,
+            "tables": index.tables if index else SPORT_ANN_TABLES,
+            "bits": index.bits if index else SPORT_ANN_BITS,
+            "probes": SPORT_ANN_PROBES,
+            "max_candidates": SPORT_ANN_MAX_CANDIDATES,
+            "min_users": self.min_users,
+            "retry_interval_s": self.retry_interval,
+            "watermark": index.watermark if index else None,
+            "loaded_from": self._loaded_from,
+            "builds": self._builds,
+            "updates": self._updates,
+            "users_rehashed": self._users_rehashed,
+            "ann_queries": self._ann_queries,
+            "exact_queries": self._exact_queries,
+            "errors": self._errors,
+            "last_error": self._last_error,
+            "path": str(self.path),
+        }
+
+
+# index ที่ใช้ร่วมกันทั้ง process
+sport_ann = SportAnnStore()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=sport_ann._reinit_after_fork)
+
+
+# ============================================
+# Evaluation (recall@k เทียบกับ exact)
+# ============================================
+def evaluate_recall(matrix, index, rows, k=5, probes=SPORT_ANN_PROBES, max_candidates=SPORT_ANN_MAX_CANDIDATES):
+    """
+    recall@k ของ index เทียบกับ SportMatrix.neighbors (exact)
+    neighbor จาก ANN นับว่าถูกถ้า similarity ไม่น้อยกว่าอันดับ k ของ exact (ผู้ใช้ที่คะแนนเท่ากันแทนกันได้)
+    """
+    hits = expected = 0
+    exact_ms, ann_ms = [], []
+    for row in rows:
+        started = time.perf_counter()
+        exact = matrix.neighbors(row, k)
+        exact_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        approx = index.neighbors(matrix, row, k, probes, max_candidates)
+        ann_ms.append((time.perf_counter() - started) * 1000)
+        if not exact:
+            continue
+        threshold = exact[-1][1] - 1e-6
+        hits += sum(1 for _, sim in approx if sim >= threshold)
+        expected += len(exact)
+    return {
+        'users': len(rows),
+        'k': k,
+        'probes': probes,
+        'max_candidates': max_candidates,
+        'recall': round(hits / expected, 4) if expected else None,
+        'exact_p50_ms': round(statistics.median(exact_ms), 3) if exact_ms else None,
+        'ann_p50_ms': round(statistics.median(ann_ms), 3) if ann_ms else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build / evaluate the sport ANN index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build จาก Activity ใน DB แล้วบันทึกไฟล์")
+    build.add_argument("--tables", type=int, default=SPORT_ANN_TABLES)
+    build.add_argument("--bits", type=int, default=SPORT_ANN_BITS)
+    build.add_argument("--seed", type=int, default=SPORT_ANN_SEED)
+    build.add_argument("--output", default=str(SPORT_ANN_PATH))
+    evaluate = sub.add_parser("evaluate", help="recall@k และ latency เทียบกับ exact KNN")
+    evaluate.add_argument("--index", default=str(SPORT_ANN_PATH), help="ไฟล์ index (ไม่มีไฟล์ = build ในหน่วยความจำ)")
+    evaluate.add_argument("--sample", type=int, default=500)
+    evaluate.add_argument("--k", type=int, default=5)
+    evaluate.add_argument("--probes", default=str(SPORT_ANN_PROBES), help="เช่น 0,1,2")
+    evaluate.add_argument("--max-candidates", type=int, default=SPORT_ANN_MAX_CANDIDATES)
+    evaluate.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s in %(module)s: %(message)s")
+    matrix = sport_matrix.latest()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        index = SportAnnIndex.build(matrix, args.tables, args.bits, args.seed)
+        index.save(args.output)
+        print({'users': index.size, 'tables': index.tables, 'bits': index.bits, 'watermark': index.watermark,
+               'seconds': round(time.perf_counter() - started, 2), 'output': args.output}, file=sys.stderr)
+        return 0
+
+    index = SportAnnIndex.load(args.index) if Path(args.index).exists() else None
+    if index is None:
+        index = SportAnnIndex.build(matrix)
+    else:
+        changed = _users_changed_since(index.watermark) if index.watermark < matrix.watermark else []
+        index = index.with_updates(matrix, changed, watermark=matrix.watermark)
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(len(matrix.user_ids), size=min(args.sample, len(matrix.user_ids)), replace=False)
+    for probes in (int(value) for value in args.probes.split(',')):
+        print(evaluate_recall(matrix, index, rows.tolist(), args.k, probes, args.max_candidates))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+# File: backend/src/flask_app/sport_item.py
+# Purpose: Item-item sport recommender (co-occurrence ของกีฬา) ใช้กับ /api/sport-recommend?engine=item
+#
+# - ตาราง SportCooccurrence เก็บจำนวนผู้ใช้ที่เคยเล่นทั้งกีฬา a และ b (a <= b, a = b คือจำนวนผู้เล่นของกีฬานั้น)
+# - similarity(a, b) = cooccur(a, b) / sqrt(users(a) * users(b)) (cosine ของคอลัมน์กีฬาในเมทริกซ์ผู้ใช้ x กีฬา)
+# - ตาราง SportNeighbors เก็บ top-M กีฬาที่ใกล้ที่สุดของแต่ละกีฬา (SPORT_ITEM_TOP_M)
+# - แนะนำ = รวม similarity จาก list ของกีฬาที่ผู้ใช้เคยเล่น O(|history| x M) ไม่ขึ้นกับจำนวนผู้ใช้
+#
+# job (python -m flask_app.sport_item) บวก count เฉพาะคู่ (user, sport) ใหม่จาก ActivityDetail ที่ใหม่กว่า
+# watermark แล้วคำนวณ list ใหม่จากตาราง count (ขนาด กีฬา x กีฬา) ทั้งหมดใน transaction เดียวกับ watermark
+# การลบ/แก้ activity ไม่ถูกหักออก และแถวที่ commit ช้ากว่ารอบที่อ่าน (id ต่ำกว่า watermark) ไม่ถูกนับ
+# --loop จึงนับใหม่ทั้งหมดทุก --full-every วินาที (SPORT_ITEM_FULL_EVERY_S) เพื่อแก้ count ที่คลาดไป
+# server อ่าน SportNeighbors เข้าหน่วยความจำ และโหลดใหม่เมื่อ job เขียนชุดใหม่ (computed_at เปลี่ยน)
+#
+# ตัวอย่าง (จาก backend/src):
+#   python -m flask_app.sport_item                 # รอบเดียว (รอบแรกนับทั้งหมด)
+#   python -m flask_app.sport_item --full --top-m 30
+#   python -m flask_app.sport_item --loop 300                     # นับใหม่ทั้งหมดวันละครั้ง (default)
+#   python -m flask_app.sport_item --loop 300 --full-every 21600
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+from itertools import combinations
+
+import numpy as np
+from scipy import sparse
+
+from flask_app.db_pool import get_pool
+from flask_app.refresh_state import read_watermarks, write_watermarks
+from flask_app.sport_matrix import MSG_NO_HISTORY, MSG_NO_NEW_SPORTS
+
+logger = logging.getLogger(__name__)
+
+# จำนวนกีฬาใกล้เคียงที่เก็บต่อกีฬา
+SPORT_ITEM_TOP_M = int(os.getenv('SPORT_ITEM_TOP_M', '20'))
+# รอบตรวจว่า job เขียน SportNeighbors ชุดใหม่หรือยัง (0 = ไม่ตรวจ)
+SPORT_ITEM_REFRESH_S = float(os.getenv('SPORT_ITEM_REFRESH_S', '60'))
+# รอบนับ co-occurrence ใหม่ทั้งหมดของ job แบบ --loop (0 = ไม่นับใหม่)
+SPORT_ITEM_FULL_EVERY_S = float(os.getenv('SPORT_ITEM_FULL_EVERY_S', '86400'))
+
+WATERMARK_ACTIVITY_DETAIL = 'sport_item.activity_detail_id'
+# กัน job สองตัวบวก count ซ้ำกัน (MySQL named lock)
+JOB_LOCK_NAME = 'sport_item_refresh'
+# user id ต่อ query (IN) ตอนอ่านประวัติเดิมของผู้ใช้ที่มีกิจกรรมใหม่
+QUERY_CHUNK_USERS = 1000
+
+MSG_NO_MODEL = 'ยังไม่มีข้อมูล item-item ของกีฬา (รัน python -m flask_app.sport_item)'
+
+
+# ============================================
+# Co-occurrence / neighbour lists (ไม่แตะ DB)
+# ============================================
+def cooccurrence_counts(pairs):
+    """{(a, b): จำนวนผู้ใช้} (a <= b) จากคู่ (user_id, sport_id) ไม่ซ้ำ ทั้งหมด"""
+    if not pairs:
+        return {}
+    users, sports = zip(*pairs)
+    user_index = {user_id: i for i, user_id in enumerate(sorted(set(users)))}
+    sport_ids = sorted(set(sports))
+    sport_index = {sport_id: i for i, sport_id in enumerate(sport_ids)}
+    played = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.int64),
+         ([user_index[u] for u in users], [sport_index[s] for s in sports])),
+        shape=(len(user_index), len(sport_ids))
+    )
+    played.data[:] = 1
+    counts = sparse.triu(played.T @ played).tocoo()
+    return {(sport_ids[a], sport_ids[b]): int(n) for a, b, n in zip(counts.row, counts.col, counts.data)}
+
+
+def cooccurrence_increments(old_pairs, new_pairs):
+    """
+    count ที่ต้องบวกเพิ่มเมื่อผู้ใช้ได้คู่ใหม่ new_pairs
+    old_pairs = กีฬาที่ผู้ใช้เหล่านั้นเคยเล่นก่อนหน้า (คู่ใน new_pairs ที่มีอยู่แล้วไม่ถูกนับซ้ำ)
+    """
+    old = {}
+    for user_id, sport_id in old_pairs:
+        old.setdefault(user_id, set()).add(sport_id)
+    added = {}
+    for user_id, sport_id in new_pairs:
+        if sport_id not in old.get(user_id, ()):
+            added.setdefault(user_id, set()).add(sport_id)
+
+    increments = {}
+    for user_id, sports in added.items():
+        before = old.get(user_id, set())
+        for sport_id in sports:
+            increments[(sport_id, sport_id)] = increments.get((sport_id, sport_id), 0) + 1
+            for other in before:
+                key = (min(sport_id, other), max(sport_id, other))
+                increments[key] = increments.get(key, 0) + 1
+        for key in combinations(sorted(sports), 2):
+            increments[key] = increments.get(key, 0) + 1
+    return increments
+
+
+def neighbor_lists(counts, top_m=SPORT_ITEM_TOP_M):
+    """{sport_id: [(neighbor_sport_id, similarity), ...]} เรียง similarity มากก่อน (เท่ากันเรียงตาม id)"""
+    users = {a: n for (a, b), n in counts.items() if a == b}
+    candidates = {}
+    for (a, b), n in counts.items():
+        if a == b or n <= 0 or not users.get(a) or not users.get(b):
+            continue
+        similarity = n / float(np.sqrt(users[a] * users[b]))
+        candidates.setdefault(a, []).append((b, similarity))
+        candidates.setdefault(b, []).append((a, similarity))
+    return {sport_id: sorted(items, key=lambda x: (-x[1], x[0]))[:top_m]
+            for sport_id, items in candidates.items()}
+
+
+# ============================================
+# Refresh job
+# ============================================
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _pairs_between(cur, since, upto):
+    cur.execute("""
+        SELECT DISTINCT a.user_id, ad.sport_id
+        FROM ActivityDetail ad
+        JOIN Activity a ON a.activity_id = ad.activity_id
+        WHERE ad.activity_detail_id > %s AND ad.activity_detail_id <= %s
+    """, (since, upto))
+    return cur.fetchall()
+
+
+def _pairs_of_users(cur, user_ids, upto):
+    pairs = []
+    for chunk in _chunks(user_ids, QUERY_CHUNK_USERS):
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cur.execute(f"""
+            SELECT DISTINCT a.user_id, ad.sport_id
+            FROM Activity a
+            JOIN ActivityDetail ad ON a.activity_id = ad.activity_id
+            WHERE a.user_id IN ({placeholders}) AND ad.activity_detail_id <= %s
+        """, (*chunk, upto))
+        pairs.extend(cur.fetchall())
+    return pairs
+
+
+def refresh(full=False, top_m=SPORT_ITEM_TOP_M):
+    """
+    บวก count จากกิจกรรมใหม่ (หรือนับใหม่ทั้งหมดเมื่อ full / ยังไม่มี watermark) แล้วเขียน SportNeighbors ชุดใหม่
+    คืนสรุป {'mode', 'new_pairs', 'sports', 'watermark'} หรือ None ถ้ามี job อื่นกำลังทำงาน
+    """
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT GET_LOCK(%s, 0)", (JOB_LOCK_NAME,))
+        if not cur.fetchone()[0]:
+            cur.close()
+            logger.warning("Sport item refresh skipped: another job holds the lock")
+            return None
+        try:
+            cur.execute("SELECT NOW()")
+            computed_at = cur.fetchone()[0]
+            marks = read_watermarks(cur, [WATERMARK_ACTIVITY_DETAIL])
+            cur.execute("SELECT COALESCE(MAX(activity_detail_id), 0) FROM ActivityDetail")
+            upto = cur.fetchone()[0]
+
+            if full or WATERMARK_ACTIVITY_DETAIL not in marks:
+                mode = 'full'
+                pairs = _pairs_between(cur, 0, upto)
+                increments = cooccurrence_counts(pairs)
+                cur.execute("DELETE FROM SportCooccurrence")
+                upsert = "INSERT INTO SportCooccurrence (sport_a, sport_b, users) VALUES (%s, %s, %s)"
+            else:
+                mode = 'incremental'
+                since = int(marks[WATERMARK_ACTIVITY_DETAIL])
+                pairs = _pairs_between(cur, since, upto) if upto > since else []
+                old_pairs = _pairs_of_users(cur, sorted({user_id for user_id, _ in pairs}), since)
+                increments = cooccurrence_increments(old_pairs, pairs)
+                upsert = """
+                    INSERT INTO SportCooccurrence (sport_a, sport_b, users) VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE users = users + VALUES(users)
+                """
+            if increments:
+                cur.executemany(upsert, [(a, b, n) for (a, b), n in increments.items()])
+
+            # list ขึ้นกับจำนวนผู้เล่นของทุกกีฬา จึงคำนวณใหม่จากตาราง count ทั้งหมด (กีฬา x กีฬา ไม่ใช่ผู้ใช้)
+            if increments or mode == 'full':
+                cur.execute("SELECT sport_a, sport_b, users FROM SportCooccurrence")
+                lists = neighbor_lists({(a, b): n for a, b, n in cur.fetchall()}, top_m)
+                cur.execute("DELETE FROM SportNeighbors")
+                cur.executemany("""
+                    INSERT INTO SportNeighbors (sport_id, `rank`, neighbor_sport_id, score, computed_at)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, [(sport_id, rank, neighbor, score, computed_at)
+                      for sport_id, items in lists.items()
+                      for rank, (neighbor, score) in enumerate(items, start=1)])
+                sports = len(lists)
+            else:
+                sports = None
+            write_watermarks(cur, {WATERMARK_ACTIVITY_DETAIL: upto})
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (JOB_LOCK_NAME,))
+            cur.fetchall()
+            cur.close()
+    return {'mode': mode, 'new_pairs': len(pairs), 'sports': sports, 'watermark': upto}
+
+
+# ============================================
+# Serving
+# ============================================
+class SportItemModel:
+    """neighbour list ของทุกกีฬา (immutable หลังสร้าง) version = computed_at ของชุดที่ job เขียน"""
+
+    __slots__ = ("neighbors", "version", "loaded_at")
+
+    def __init__(self, neighbors, version, loaded_at):
+        self.neighbors = neighbors            # {sport_id: ((neighbor_sport_id, score), ...)}
+        self.version = version
+        self.loaded_at = loaded_at
+
+    def recommend(self, matrix, user_id, top_n=3):
+        """
+        กีฬาที่ใกล้กับประวัติของผู้ใช้ (ประวัติจาก SportMatrix) คะแนน = ผลรวม similarity
+        คืนผลรูปแบบเดียวกับ SportMatrix.recommend
+        """
+        if not self.neighbors:
+            return {'success': False, 'message': MSG_NO_MODEL}
+        row = matrix.user_row.get(user_id)
+        if row is None:
+            return {'success': False, 'message': MSG_NO_HISTORY}
+
+        history = {matrix.sport_ids[col] for col in matrix.sports_of(row).tolist()}
+        scores = {}
+        for sport_id in history:
+            for neighbor, score in self.neighbors.get(sport_id, ()):
+                if neighbor not in history:
+                    scores[neighbor] = scores.get(neighbor, 0.0) + score
+        if not scores:
+            return {'success': False, 'message': MSG_NO_NEW_SPORTS}
+
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:top_n]
+        return {
+            'success': True,
+            'user_id': user_id,
+            'recommendations': [matrix.sport_names.get(sport_id, str(sport_id)) for sport_id, _ in ranked],
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+def _fetch(query, params=()):
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        cur.close()
+    return rows
+
+
+class SportItemStore:
+    def __init__(self, refresh_interval=SPORT_ITEM_REFRESH_S):
+        self.refresh_interval = refresh_interval
+
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._refresher = None
+
+        # metrics
+        self._loads = 0
+        self._refresh_errors = 0
+        self._last_error = None
+
+    # -------------------------------------------------
+    # Loading / refreshing
+    # -------------------------------------------------
+    def _version(self):
+        computed_at, rows = _fetch("SELECT MAX(computed_at), COUNT(*) FROM SportNeighbors")[0]
+        return (computed_at.isoformat() if computed_at else None, int(rows))
+
+    def _load(self, version):
+        neighbors = {}
+        for sport_id, neighbor, score in _fetch("""
+            SELECT sport_id, neighbor_sport_id, score FROM SportNeighbors ORDER BY sport_id, `rank`
+        """):
+            neighbors.setdefault(sport_id, []).append((neighbor, float(score)))
+        self._loads += 1
+        logger.info("✅ Sport item neighbours loaded: %d sports (version %s)", len(neighbors), version[0])
+        return SportItemModel({sport_id: tuple(items) for sport_id, items in neighbors.items()},
+                              version, datetime.now())
+
+    def refresh(self):
+        """โหลดใหม่ถ้า job เขียนชุดใหม่แล้ว คืน True ถ้าสลับ model"""
+        version = self._version()
+        if self._model is not None and self._model.version == version:
+            return False
+        with self._load_lock:
+            if self._model is not None and self._model.version == version:
+                return False
+            self._model = self._load(version)
+            return True
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                self._refresh_errors += 1
+                self._last_error = str(e)
+                logger.error("Sport item refresh failed: %s", e)
+
+    def _reinit_after_fork(self):
+        self._load_lock = threading.Lock()
+        self._refresher = None
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def get(self):
+        """model ปัจจุบัน (โหลดครั้งแรกแบบ single-flight และเริ่ม refresher)"""
+        model = self._model
+        if model is not None and (self._refresher is not None or self.refresh_interval <= 0):
+            return model
+        with self._load_lock:
+            if self._model is None:
+                self._model = self._load(self._version())
+            if self.refresh_interval > 0 and self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="sport-item-refresh", daemon=True
+                )
+                self._refresher.start()
+            return self._model
+
+    def preload(self):
+        """โหลด neighbour list โดยไม่เริ่ม refresher thread (gunicorn master ก่อน fork, worker เริ่มเองใน get())"""
+        with self._load_lock:
+            if self._model is None:
+                self._model = self._load(self._version())
+            return self._model
+
+    def stats(self):
+        model = self._model
+        return {
+            "loaded": model is not None,
+            "sports": len(model.neighbors) if model else 0,
+            "version": model.version[0] if model else None,
+            "loaded_at": model.loaded_at.isoformat() if model else None,
+            "loads": self._loads,
+            "refresh_errors": self._refresh_errors,
+            "last_error": self._last_error,
+            "refresh_interval_s": self.refresh_interval,
+        }
+
+
+# model ที่ใช้ร่วมกันทั้ง process
+sport_item = SportItemStore()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=sport_item._reinit_after_fork)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the item-item sport co-occurrence model")
+    parser.add_argument("--full", action="store_true", help="นับ co-occurrence ใหม่ทั้งหมด ไม่ใช้ watermark")
+    parser.add_argument("--top-m", type=int, default=SPORT_ITEM_TOP_M, help="กีฬาใกล้เคียงที่เก็บต่อกีฬา")
+    parser.add_argument("--loop", type=float, default=0, help="รันซ้ำทุก N วินาที (0 = รอบเดียว)")
+    parser.add_argument("--full-every", type=float, default=SPORT_ITEM_FULL_EVERY_S,
+                        help="ใน --loop นับใหม่ทั้งหมดทุก N วินาที (รับการลบ/แถวที่ commit ช้า, 0 = ไม่นับใหม่)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s in %(module)s: %(message)s")
+
+    # --full ใช้กับรอบแรก (ถ้ารอบนั้นไม่สำเร็จเพราะ lock/error จะลองนับใหม่ทั้งหมดในรอบถัดไป)
+    pending_full = args.full
+    last_full = time.monotonic()
+    while True:
+        full = pending_full or (args.full_every > 0 and time.monotonic() - last_full >= args.full_every)
+        started = time.perf_counter()
+        try:
+            summary = refresh(full, args.top_m)
+        except Exception as e:
+            logger.exception("Sport item refresh failed: %s", e)
+            summary = None
+            if args.loop <= 0:
+                return 1
+        if summary is not None:
+            summary['seconds'] = round(time.perf_counter() - started, 3)
+            print(summary, file=sys.stderr)
+            if summary['mode'] == 'full':
+                pending_full = False
+                last_full = time.monotonic()
+        if args.loop <= 0:
+            return 0
+        time.sleep(args.loop)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+# File: backend/src/flask_app/sport_matrix.py
+# Purpose: sparse matrix ผู้ใช้ x กีฬา (ตาม sport_id) สำหรับ SportRecommendationSystem
+#
+# - build ครั้งเดียวจาก Activity ⋈ ActivityDetail แบบ aggregate (หนึ่งแถวต่อคู่ user, sport)
+# - background refresher อ่านเฉพาะ ActivityDetail ที่ activity_detail_id ใหม่กว่า watermark
+#   แล้วสร้าง matrix ชุดใหม่จากชุดเดิม + คู่ใหม่ (ไม่ query ทั้งตาราง ไม่ tokenize ชื่อกีฬาใหม่)
+# - document frequency ต่อกีฬาและจำนวนผู้ใช้ถูกบวกเพิ่มตามคู่ใหม่ IDF จึงไม่ต้องนับใหม่ทั้งตาราง
+# - build ใหม่ทั้งหมดตามรอบ SPORT_MATRIX_REBUILD_S (การลบ/แก้ activity ที่ watermark ตรวจไม่เห็น)
+#
+# น้ำหนักของผู้ใช้ u ต่อกีฬา s = idf(s) ถ้าเคยเล่น (เหมือน profile เดิมที่นับกีฬาแบบ DISTINCT)
+# cosine similarity ของผู้ใช้หนึ่งคนกับทุกคน = sparse row (b_u * idf^2) x matrix (กีฬา x ผู้ใช้) ครั้งเดียว
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+from scipy import sparse
+
+from flask_app.db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+# รอบดึง activity ใหม่ (0 = ไม่ refresh)
+SPORT_MATRIX_REFRESH_S = float(os.getenv('SPORT_MATRIX_REFRESH_S', '30'))
+# รอบ build ใหม่ทั้งหมด (0 = ไม่ build ใหม่)
+SPORT_MATRIX_REBUILD_S = float(os.getenv('SPORT_MATRIX_REBUILD_S', '86400'))
+# ผู้ใช้ที่ไม่อยู่ใน matrix (เพิ่งบันทึกกิจกรรมแรก) ทำให้ refresh ได้ไม่บ่อยกว่านี้
+SPORT_MATRIX_MISS_REFRESH_S = float(os.getenv('SPORT_MATRIX_MISS_REFRESH_S', '5'))
+
+MSG_NO_HISTORY = 'ไม่พบประวัติการออกกำลังกายของผู้ใช้นี้'
+MSG_NO_NEW_SPORTS = 'ไม่มีกีฬาใหม่ที่แนะนำได้'
+
+
+def _fetch(query, params=()):
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        cur.close()
+    return rows
+
+
+class SportMatrix:
+    """
+    matrix หนึ่งชุด (immutable หลังสร้าง) แถว = ผู้ใช้, คอลัมน์ = กีฬา, ค่า 1 = เคยเล่น
+    by_user (ผู้ใช้ x กีฬา) ใช้ดูกีฬาของ neighbor, by_sport (กีฬา x ผู้ใช้) ใช้หา similarity
+    """
+
+    __slots__ = ("user_ids", "user_row", "sport_ids", "sport_col", "sport_names", "by_user", "by_sport",
+                 "df", "idf_sq", "norms", "watermark", "built_at")
+
+    def __init__(self, user_ids, sport_ids, sport_names, by_user, df, watermark, built_at):
+        self.user_ids = user_ids
+        self.user_row = {user_id: row for row, user_id in enumerate(user_ids)}
+        self.sport_ids = sport_ids
+        self.sport_col = {sport_id: col for col, sport_id in enumerate(sport_ids)}
+        self.sport_names = sport_names
+        self.by_user = by_user
+        self.by_sport = by_user.T.tocsr()
+        self.df = df
+        self.watermark = watermark
+        self.built_at = built_at
+
+        # smooth IDF แบบเดียวกับ TfidfVectorizer: log((1 + n) / (1 + df)) + 1
+        n_users = len(user_ids)
+        idf = np.log((1.0 + n_users) / (1.0 + df)) + 1.0
+        self.idf_sq = (idf * idf).astype(np.float32)
+        # ||w_u|| ของทุกผู้ใช้ (w_u = b_u * idf)
+        self.norms = np.sqrt(by_user @ self.idf_sq).astype(np.float32)
+
+    # -------------------------------------------------
+    # Build / incremental update
+    # -------------------------------------------------
+    @classmethod
+    def build(cls, pairs, sport_names, watermark):
+        """pairs = [(user_id, sport_id), ...] ไม่ซ้ำ"""
+        user_ids = sorted({user_id for user_id, _ in pairs})
+        sport_ids = sorted({sport_id for _, sport_id in pairs} | set(sport_names))
+        empty = cls([], [], {}, sparse.csr_matrix((0, 0), dtype=np.float32), np.zeros(0), watermark, None)
+        return empty.apply(pairs, sport_names, watermark, user_ids=user_ids, sport_ids=sport_ids)
+
+    def apply(self, pairs, sport_names, watermark, user_ids=None, sport_ids=None):
+        """
+        matrix ชุดใหม่ = ชุดนี้ + pairs (คู่ที่มีอยู่แล้วถูกข้าม) ชุดเดิมไม่ถูกแก้ (request ที่ใช้อยู่อ่านต่อได้)
+        df บวกเฉพาะคู่ใหม่ ผู้ใช้/กีฬาใหม่ต่อท้าย row/คอลัมน์เดิม
+        """
+        user_ids = list(self.user_ids) + [u for u in (user_ids or []) if u not in self.user_row]
+        sport_ids = list(self.sport_ids) + [s for s in (sport_ids or []) if s not in self.sport_col]
+        user_row = {user_id: row for row, user_id in enumerate(user_ids)}
+        sport_col = {sport_id: col for col, sport_id in enumerate(sport_ids)}
+
+        new_rows, new_cols = [], []
+        existing = {}
+        for user_id, sport_id in pairs:
+            if user_id not in user_row:
+                user_row[user_id] = len(user_ids)
+                user_ids.append(user_id)
+            if sport_id not in sport_col:
+                sport_col[sport_id] = len(sport_ids)
+                sport_ids.append(sport_id)
+            row, col = user_row[user_id], sport_col[sport_id]
+            if row < self.by_user.shape[0] and col < self.by_user.shape[1]:
+                if row not in existing:
+                    existing[row] = set(self.by_user.indices[self.by_user.indptr[row]:self.by_user.indptr[row + 1]])
+                if col in existing[row]:
+                    continue
+                existing[row].add(col)
+            new_rows.append(row)
+            new_cols.append(col)
+
+        shape = (len(user_ids), len(sport_ids))
+        added = sparse.csr_matrix((np.ones(len(new_rows), dtype=np.float32), (new_rows, new_cols)), shape=shape)
+        # คู่ซ้ำภายใน pairs เองถูกรวมโดย csr_matrix จึงตัดให้เหลือ 1
+        added.data[:] = 1.0
+        base = self.by_user.copy()
+        base.resize(shape)
+        by_user = (base + added).tocsr()
+        by_user.sort_indices()
+
+        df = np.zeros(len(sport_ids))
+        df[:len(self.df)] = self.df
+        df += np.asarray(added.sum(axis=0)).ravel()
+
+        names = dict(self.sport_names)
+        names.update(sport_names)
+        return SportMatrix(user_ids, sport_ids, names, by_user, df, watermark, datetime.now())
+
+    # -------------------------------------------------
+    # Scoring
+    # -------------------------------------------------
+    def sports_of(self, row):
+        return self.by_user.indices[self.by_user.indptr[row]:self.by_user.indptr[row + 1]]
+
+    def _query(self, row):
+        """sparse row b_u * idf^2 ของผู้ใช้ row (dot กับแถว b_v = w_u . w_v)"""
+        cols = self.sports_of(row)
+        return sparse.csr_matrix((self.idf_sq[cols], cols, [0, len(cols)]), shape=(1, len(self.sport_ids)))
+
+    def _top_k(self, row, candidates, sims, k):
+        # ไม่รวมตัวเองและผู้ใช้ที่ไม่มีกีฬาร่วมกันเลย
+        keep = (candidates != row) & (sims > 0)
+        candidates, sims = candidates[keep], sims[keep]
+        if len(candidates) > k:
+            top = np.argpartition(-sims, k - 1)[:k]
+            candidates, sims = candidates[top], sims[top]
+        # similarity มากก่อน, เท่ากันเรียงตาม row (ผลคงที่ทุกครั้ง)
+        order = np.lexsort((candidates, -sims))
+        return [(int(candidates[i]), float(sims[i])) for i in order]
+
+    def neighbors(self, row, k):
+        """k ผู้ใช้ที่ cosine similarity สูงสุด (exact) คืน [(row, sim)]"""
+        if k <= 0 or len(self.sports_of(row)) == 0:
+            return []
+        scores = (self._query(row) @ self.by_sport).tocsr()
+        candidates = scores.indices
+        sims = scores.data / (self.norms[candidates] * self.norms[row])
+        return self._top_k(row, candidates, sims, k)
+
+    def rerank(self, row, candidates, k):
+        """k อันดับแรกจาก candidates (row ของผู้ใช้อื่น) ด้วย cosine similarity จริง (ใช้กับ ANN)"""
+        candidates = np.asarray(candidates, dtype=np.int64)
+        if k <= 0 or len(candidates) == 0:
+            return []
+        dots = self.by_user[candidates] @ np.asarray(self._query(row).todense()).ravel()
+        sims = dots / (self.norms[candidates] * self.norms[row])
+        return self._top_k(row, candidates, sims, k)
+
+    def recommend(self, user_id, top_n=3, k_neighbors=5, neighbor_index=None):
+        """
+        กีฬาที่ neighbor เล่นแต่ผู้ใช้ยังไม่เคย เรียงตามจำนวน neighbor ที่เล่น คืนผลรูปแบบเดียวกับ recommend_sports
+        neighbor_index (เช่น flask_app.sport_ann) ใช้หา neighbor แบบประมาณแทน exact ได้
+        """
+        row = self.user_row.get(user_id)
+        if row is None:
+            return {'success': False, 'message': MSG_NO_HISTORY}
+
+        history = set(self.sports_of(row).tolist())
+        counts = {}
+        if neighbor_index is not None:
+            neighbors = neighbor_index.neighbors(self, row, k_neighbors)
+        else:
+            neighbors = self.neighbors(row, k_neighbors)
+        for neighbor, _ in neighbors:
+            for col in self.sports_of(neighbor).tolist():
+                if col not in history:
+                    counts[col] = counts.get(col, 0) + 1
+        if not counts:
+            return {'success': False, 'message': MSG_NO_NEW_SPORTS}
+
+        ranked = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:top_n]
+        return {
+            'success': True,
+            'user_id': user_id,
+            'recommendations': [self.sport_names.get(self.sport_ids[col], str(self.sport_ids[col]))
+                                for col, _ in ranked],
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+class SportMatrixStore:
+    def __init__(self, refresh_interval=SPORT_MATRIX_REFRESH_S, rebuild_interval=SPORT_MATRIX_REBUILD_S,
+                 miss_refresh_interval=SPORT_MATRIX_MISS_REFRESH_S):
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.miss_refresh_interval = miss_refresh_interval
+
+        self._matrix = None
+        self._build_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refresher = None
+        self._last_refresh = 0.0
+        self._last_rebuild = 0.0
+        # fn(matrix, changed_user_ids) หลังสลับ matrix (changed_user_ids = None เมื่อ build ใหม่ทั้งหมด)
+        self._listeners = []
+
+        # metrics
+        self._builds = 0
+        self._build_seconds = None
+        self._updates = 0
+        self._pairs_applied = 0
+        self._refresh_errors = 0
+        self._last_error = None
+
+    # -------------------------------------------------
+    # Loading / refreshing
+    # -------------------------------------------------
+    def _sport_names(self):
+        return {sport_id: name for sport_id, name in _fetch("SELECT sport_id, sport_name FROM Sports")}
+
+    def _build(self):
+        started = time.perf_counter()
+        upto = _fetch("SELECT COALESCE(MAX(activity_detail_id), 0) FROM ActivityDetail")[0][0]
+        pairs = _fetch("""
+            SELECT DISTINCT a.user_id, ad.sport_id
+            FROM Activity a
+            JOIN ActivityDetail ad ON a.activity_id = ad.activity_id
+            WHERE ad.activity_detail_id <= %s
+        """, (upto,))
+        matrix = SportMatrix.build(pairs, self._sport_names(), upto)
+        self._build_seconds = round(time.perf_counter() - started, 3)
+        self._builds += 1
+        self._last_refresh = self._last_rebuild = time.monotonic()
+        logger.info("✅ Sport matrix built: %d users x %d sports (%d pairs, watermark %s) in %.2fs",
+                    len(matrix.user_ids), len(matrix.sport_ids), matrix.by_user.nnz, upto, self._build_seconds)
+        return matrix
+
+    def _swap(self, matrix, changed_user_ids):
+        self._matrix = matrix
+        for listener in self._listeners:
+            try:
+                listener(matrix, changed_user_ids)
+            except Exception as e:
+                logger.error("Sport matrix listener failed: %s", e)
+        return matrix
+
+    def refresh(self, full=False):
+        """
+        ดึงคู่ (user, sport) จาก ActivityDetail ที่ใหม่กว่า watermark แล้วสลับเป็น matrix ชุดใหม่
+        build ใหม่ทั้งหมดเมื่อ full=True หรือครบรอบ rebuild_interval คืนจำนวนคู่ที่อ่านได้
+        """
+        with self._build_lock:
+            current = self._matrix
+            if current is None or full or (
+                    self.rebuild_interval > 0 and time.monotonic() - self._last_rebuild >= self.rebuild_interval):
+                return self._swap(self._build(), None).by_user.nnz
+
+            self._last_refresh = time.monotonic()
+            upto = _fetch("SELECT COALESCE(MAX(activity_detail_id), 0) FROM ActivityDetail")[0][0]
+            if upto <= current.watermark:
+                return 0
+            pairs = _fetch("""
+                SELECT DISTINCT a.user_id, ad.sport_id
+                FROM ActivityDetail ad
+                JOIN Activity a ON a.activity_id = ad.activity_id
+                WHERE ad.activity_detail_id > %s AND ad.activity_detail_id <= %s
+            """, (current.watermark, upto))
+            names = self._sport_names() if any(s not in current.sport_col for _, s in pairs) else {}
+            self._swap(current.apply(pairs, names, upto), {user_id for user_id, _ in pairs})
+            self._updates += 1
+            self._pairs_applied += len(pairs)
+            logger.info("Sport matrix updated: %d new pairs (watermark %s)", len(pairs), upto)
+            return len(pairs)
+
+    def _refresh_loop(self):
+        while True:
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                self._refresh_errors += 1
+                self._last_error = str(e)
+                logger.error("Sport matrix refresh failed: %s", e)
+
+    def _reinit_after_fork(self):
+        """ใน process ลูกหลัง fork: matrix ใช้ต่อได้ แต่ refresher thread ต้องเริ่มใหม่"""
+        self._build_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refresher = None
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def get(self):
+        """matrix ปัจจุบัน (build ครั้งแรกแบบ single-flight และเริ่ม refresher)"""
+        matrix = self._matrix
+        if matrix is not None and (self._refresher is not None or self.refresh_interval <= 0):
+            return matrix
+        with self._build_lock:
+            if self._matrix is None:
+                self._swap(self._build(), None)
+            if self.refresh_interval > 0 and self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="sport-matrix-refresh", daemon=True
+                )
+                self._refresher.start()
+            return self._matrix
+
+    def preload(self):
+        """build matrix โดยไม่เริ่ม refresher thread (gunicorn master ก่อน fork, worker เริ่มเองใน get())"""
+        with self._build_lock:
+            if self._matrix is None:
+                self._swap(self._build(), None)
+            return self._matrix
+
+    def get_for_user(self, user_id):
+        """matrix ที่มี user_id (ถ้ายังไม่มี refresh แบบจำกัดความถี่ก่อน เช่น ผู้ใช้เพิ่งบันทึกกิจกรรมแรก)"""
+        matrix = self.get()
+        if user_id not in matrix.user_row and \
+                time.monotonic() - self._last_refresh >= self.miss_refresh_interval:
+            self.refresh()
+            matrix = self._matrix
+        return matrix
+
+    def add_listener(self, listener):
+        """เรียก listener(matrix, changed_user_ids) ทุกครั้งที่ matrix ถูกสลับ (ใน thread ที่ refresh)"""
+        self._listeners.append(listener)
+
+    def latest(self):
+        """matrix ที่ดึง activity ล่าสุดแล้ว (ไม่เริ่ม refresher thread เหมาะกับ batch job)"""
+        self.refresh()
+        return self._matrix
+
+    def invalidate(self):
+        """ขอให้ดึง activity ใหม่โดยเร็ว"""
+        if self._refresher is not None and self._refresher.is_alive():
+            self._wake.set()
+        else:
+            self.refresh()
+
+    def stats(self):
+        matrix = self._matrix
+        return {
+            "loaded": matrix is not None,
+            "users": len(matrix.user_ids) if matrix else 0,
+            "sports": len(matrix.sport_ids) if matrix else 0,
+            "pairs": int(matrix.by_user.nnz) if matrix else 0,
+            "watermark": matrix.watermark if matrix else None,
+            "built_at": matrix.built_at.isoformat() if matrix else None,
+            "builds": self._builds,
+            "last_build_seconds": self._build_seconds,
+            "incremental_updates": self._updates,
+            "pairs_applied": self._pairs_applied,
+            "refresh_errors": self._refresh_errors,
+            "last_error": self._last_error,
+            "refresh_interval_s": self.refresh_interval,
+            "rebuild_interval_s": self.rebuild_interval,
+        }
+
+
+# matrix ที่ใช้ร่วมกันทั้ง process
+sport_matrix = SportMatrixStore()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=sport_matrix._reinit_after_fork)
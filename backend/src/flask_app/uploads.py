@@ -0,0 +1,128 @@
+# File: backend/src/flask_app/uploads.py
+# Purpose: จัดการไฟล์ภาพที่อัปโหลดแบบผ่านครั้งเดียว (single pass) และจำกัดขนาด
+#
+# - จำกัดขนาด body ที่ระดับ request (MAX_CONTENT_LENGTH ต่อ endpoint) werkzeug จะปฏิเสธ
+#   ตั้งแต่ Content-Length หรือระหว่าง stream โดยไม่ต้องรับ body ให้ครบก่อน
+# - แต่ละไฟล์ถูกเขียนลง buffer ในหน่วยความจำ (ไม่ spool ลง temp file) ที่หยุดเก็บเมื่อเกิน
+#   UPLOAD_MAX_BYTES ทำให้ภาพใน batch ที่ใหญ่เกินได้ error ของตัวเอง
+# - buffer นี้ส่งต่อให้ hash/decoder ได้เลยโดยไม่ copy อีก
+# - ตรวจนามสกุล + magic bytes ที่นี่ที่เดียว
+
+import io
+import os
+
+from flask import Request, current_app
+
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', str(5 * 1024 * 1024)))
+# เผื่อ header ของ multipart + form field เล็ก ๆ ต่อหนึ่งไฟล์
+UPLOAD_PART_OVERHEAD_BYTES = 16 * 1024
+
+# นามสกุล -> magic bytes ที่ต้องขึ้นต้นไฟล์
+IMAGE_SIGNATURES = {
+    'jpg': (b'\xff\xd8\xff',),
+    'jpeg': (b'\xff\xd8\xff',),
+    'png': (b'\x89PNG\r\n\x1a\n',),
+}
+ALLOWED_EXTENSIONS = set(IMAGE_SIGNATURES)
+
+
+def max_request_bytes(max_files=1):
+    """ขนาด body สูงสุดของ request ที่มีไฟล์ได้ไม่เกิน max_files ไฟล์"""
+    return max_files * (UPLOAD_MAX_BYTES + UPLOAD_PART_OVERHEAD_BYTES)
+
+
+def upload_limit(max_bytes):
+    """
+    Decorator กำหนด MAX_CONTENT_LENGTH เฉพาะ endpoint (ใช้คู่กับ UploadRequest)
+    attribute ถูก copy ผ่าน functools.wraps จึงวางลำดับไหนก็ได้ใต้ @route
+    """
+    def decorator(f):
+        f.max_content_length = max_bytes
+        return f
+    return decorator
+
+
+class BoundedBuffer(io.BytesIO):
+    """BytesIO ที่หยุดเก็บข้อมูลเมื่อเกิน limit (ทิ้งส่วนที่เหลือโดยไม่กินหน่วยความจำ)"""
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.overflow = False
+
+    def write(self, data):
+        if self.overflow:
+            return len(data)
+        if self.tell() + len(data) > self.limit:
+            self.overflow = True
+            self.seek(0)
+            self.truncate()
+            return len(data)
+        return super().write(data)
+
+
+class UploadRequest(Request):
+    """Request ที่เก็บไฟล์อัปโหลดใน BoundedBuffer และใช้ limit ของ endpoint ถ้ามี"""
+
+    @property
+    def max_content_length(self):
+        if self.url_rule is not None:
+            view = current_app.view_functions.get(self.endpoint)
+            limit = getattr(view, 'max_content_length', None)
+            if limit is not None:
+                return limit
+        return super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return BoundedBuffer(UPLOAD_MAX_BYTES)
+
+
+def file_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+
+
+def upload_size(stream):
+    if isinstance(stream, io.BytesIO):
+        return stream.getbuffer().nbytes
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def validate_image_upload(file, max_bytes=UPLOAD_MAX_BYTES):
+    """
+    ตรวจไฟล์ภาพที่อัปโหลด (ชื่อ, นามสกุล, ขนาด, magic bytes) คืน error message หรือ None
+    ผ่านแล้ว file.stream จะอยู่ที่ตำแหน่ง 0 พร้อมส่งให้ upload_buffer()
+    """
+    if not file.filename:
+        return 'Uploaded file has no name'
+
+    ext = file_extension(file.filename)
+    if ext not in ALLOWED_EXTENSIONS:
+        return f"Allowed types: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
+
+    stream = file.stream
+    if getattr(stream, 'overflow', False) or upload_size(stream) > max_bytes:
+        return f'File too large. Max {max_bytes // (1024 * 1024)}MB'
+
+    stream.seek(0)
+    head = stream.read(16)
+    stream.seek(0)
+    if not head.startswith(IMAGE_SIGNATURES[ext]):
+        return 'File content does not match its extension'
+    return None
+
+
+def upload_buffer(file):
+    """
+    คืน BytesIO ของไฟล์ที่อัปโหลด (buffer เดิมของ request ถ้าเป็น BoundedBuffer)
+    ถ้า stream ไม่ใช่ BytesIO (เช่น request class ปกติที่ spool ลง temp file) จะอ่านเข้า memory ครั้งเดียว
+    """
+    stream = file.stream
+    if not isinstance(stream, io.BytesIO):
+        stream.seek(0)
+        stream = io.BytesIO(stream.read())
+    stream.seek(0)
+    return stream
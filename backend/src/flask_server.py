@@ -47,6 +47,12 @@ logger.info("✅ Flask Server starting...")
 # ==============================================
 app = Flask(__name__)
 
+# เก็บไฟล์อัปโหลดใน memory buffer ที่จำกัดขนาด (ไม่ spool ลง temp file)
+# และปฏิเสธ body ที่ใหญ่เกินตั้งแต่ระดับ request (endpoint ที่รับหลายไฟล์กำหนด limit เองด้วย @upload_limit)
+from flask_app.uploads import UploadRequest, max_request_bytes
+app.request_class = UploadRequest
+app.config["MAX_CONTENT_LENGTH"] = max_request_bytes(1)
+
 # ตั้งค่า CORS (อนุญาตทุก origin ชั่วคราว)
 allowed_origins = os.getenv("CORS_ORIGINS", "*")
 CORS(app, resources={r"/api/*": {"origins": allowed_origins}})
@@ -57,11 +63,21 @@ CORS(app, resources={r"/api/*": {"origins": allowed_origins}})
 try:
     from flask_app.food_detect_routes import food_detect_bp
     from flask_app.recommendation_routes import recommendation_bp
+    from flask_app.calorie_routes import calorie_bp
 
     app.register_blueprint(food_detect_bp)
     app.register_blueprint(recommendation_bp)
+    app.register_blueprint(calorie_bp)
     logger.info("✅ Blueprints registered successfully")
 
+    # โหลด + warmup โมเดลใน background เพื่อให้ bind port ได้ทันที (ดูสถานะที่ /api/ready)
+    # ยกเว้น INFERENCE_POOL_PROCESSES > 0: สร้าง pool แบบ blocking ตรงนี้ (main thread ก่อน serve)
+    # เพราะ os.fork ของ pool ต้องไม่เกิดขณะ thread ของ Flask ทำงานอยู่
+    # ถ้ารันผ่าน gunicorn.conf.py (pre-fork) master จะโหลดเองก่อน fork worker
+    if os.getenv("SERVER_PREFORK", "false").lower() != "true":
+        from flask_app.food_detect import start_model_loading
+        start_model_loading()
+
 except Exception as e:
     logger.exception("❌ Error registering blueprints: %s", e)
     raise
@@ -79,6 +95,45 @@ def health():
         "timestamp": datetime.now().isoformat()
     }), 200
 
+@app.route("/api/ready", methods=["GET"])
+def ready():
+    """Readiness probe: 200 เมื่อโมเดลโหลดและ warmup เสร็จแล้วเท่านั้น"""
+    from flask_app.food_detect import is_model_ready, model_status
+    return jsonify({
+        "ready": is_model_ready(),
+        "model": model_status
+    }), (200 if is_model_ready() else 503)
+
+from flask_app.auth import require_internal_token
+
+@app.route("/api/metrics", methods=["GET"])
+@require_internal_token
+def metrics():
+    """Runtime metrics สำหรับ monitoring / tuning (ต้องส่ง X-Internal-Token เหมือน /api/internal/*)"""
+    from flask_app.food_detect import inference_stats, prediction_cache_stats
+    from flask_app.db_pool import pool_stats
+    from flask_app.food_catalog import food_catalog
+    from flask_app.food_index import food_index
+    from flask_app.food_history import food_history
+    from flask_app.auth import auth_stats
+    from flask_app.recommendation_store import recommendation_store
+    from flask_app.sport_matrix import sport_matrix
+    from flask_app.sport_ann import sport_ann
+    from flask_app.sport_item import sport_item
+    return jsonify({
+        "auth": auth_stats(),
+        "inference": inference_stats(),
+        "prediction_cache": prediction_cache_stats(),
+        "db_pools": pool_stats(),
+        "food_catalog": food_catalog.stats(),
+        "food_index": food_index.stats(),
+        "food_history": food_history.stats(),
+        "recommendation_store": recommendation_store.stats(),
+        "sport_matrix": sport_matrix.stats(),
+        "sport_ann": sport_ann.stats(),
+        "sport_item": sport_item.stats()
+    }), 200
+
 # ==============================================
 # Error Handlers
 # ==============================================
@@ -98,6 +153,10 @@ def forbidden(error):
 def not_found(error):
     return jsonify({"error": "Not Found", "message": "The requested resource was not found"}), 404
 
+@app.errorhandler(413)
+def request_entity_too_large(error):
+    return jsonify({"error": "Payload Too Large", "message": "Request body exceeds the upload size limit"}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     """Handle internal server errors"""
@@ -114,7 +173,7 @@ def handle_exception(error):
     return jsonify({"error": "Server Error", "message": str(error)}), 500
 
 # ==============================================
-# Run Flask Server
+# Run Flask Server (dev) - production ใช้ gunicorn -c gunicorn.conf.py flask_server:app
 # ==============================================
 if __name__ == "__main__":
     port = int(os.getenv("FLASK_PORT", 5000))
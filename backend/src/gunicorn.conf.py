@@ -0,0 +1,137 @@
+# File: backend/src/gunicorn.conf.py
+# Purpose: Production launch แบบ pre-fork สำหรับ flask_server:app
+#
+#   cd backend/src && gunicorn -c gunicorn.conf.py flask_server:app
+#
+# master โหลดโมเดล (torch) + Foods catalog ครั้งเดียว (preload ไม่มี background thread) แล้ว fork worker ทั้งหมด
+# weight ของโมเดลจึงอยู่ใน memory page เดียวกัน (copy-on-write) ไม่ใช่หนึ่งชุดต่อ worker
+# จำนวน intra-op thread ต่อ worker ตั้งให้ workers x threads = จำนวน core ที่ใช้ได้
+# (python flask_server.py ยังใช้สำหรับ dev ได้เหมือนเดิม)
+#
+# ถ้าตั้ง INFERENCE_POOL_PROCESSES > 0 master จะสร้าง inference process pool ชุดเดียว
+# ที่ทุก worker ใช้ร่วมกัน worker จึงเป็น HTTP ล้วน (decode/preprocess) และไม่ต้องแบ่ง core ให้ inference
+
+import gc
+import logging
+import os
+
+# ให้ flask_server ไม่เริ่มโหลดโมเดลใน background thread (master โหลดเองใน when_ready)
+os.environ["SERVER_PREFORK"] = "true"
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def available_cpus():
+    """จำนวน core ที่ process ใช้ได้จริง (cpuset affinity + cgroup CPU quota ของ container)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+CPUS = available_cpus()
+
+bind = f"0.0.0.0:{os.getenv('FLASK_PORT', '5000')}"
+workers = int(os.getenv("SERVER_WORKERS", str(max(1, CPUS // 2))))
+# HTTP thread ต่อ worker: การรออัปโหลด/DB ใช้ thread ถูก ๆ ส่วน forward pass ถูกรวม batch ใน worker
+worker_class = "gthread"
+threads = int(os.getenv("SERVER_HTTP_THREADS", "8"))
+timeout = int(os.getenv("SERVER_TIMEOUT_S", "60"))
+preload_app = True
+
+# intra-op thread ต่อ worker ของ torch/ONNX Runtime (0 = แบ่ง core เท่า ๆ กัน)
+INFERENCE_THREADS_PER_WORKER = int(os.getenv("INFERENCE_THREADS_PER_WORKER", "0")) or max(1, CPUS // workers)
+SERVER_WORKER_WARMUP = os.getenv("SERVER_WORKER_WARMUP", "true").lower() == "true"
+
+
+def when_ready(server):
+    """รันใน master หลัง import app (preload_app) และก่อน fork worker ตัวแรก"""
+    from flask_app import food_detect
+    from flask_app.db_pool import close_all_pools
+    from flask_app.food_catalog import food_catalog
+
+    if food_detect.INFERENCE_POOL_PROCESSES > 0:
+        # fork inference process จาก master ก่อนมี HTTP worker (pool ถูกส่งต่อให้ worker ตอน fork)
+        food_detect.load_model()
+    elif food_detect.FOOD_INFERENCE_BACKEND == "torch":
+        import torch
+        # OpenMP thread pool ที่สร้างแล้วใน master ใช้ต่อใน process ลูกไม่ได้ (libgomp ค้างหลัง fork)
+        # จึงโหลด/warmup ใน master ด้วย thread เดียว แล้วให้แต่ละ worker ตั้งจำนวน thread เอง
+        torch.set_num_threads(1)
+        food_detect.load_model()
+    else:
+        # ONNX Runtime session ไม่ fork-safe แต่ละ worker สร้าง session ของตัวเองใน post_fork
+        try:
+            food_catalog.preload()
+        except Exception as e:
+            logger.warning("Food catalog preload failed: %s", e)
+
+    # ทุกอย่างด้านล่างใช้ preload() ที่โหลดอย่างเดียว: master ต้องไม่มี refresher thread ที่แตะ DB
+    # หรือสร้าง object ใหม่หลัง close_all_pools()/gc.freeze() (และ fork ของ worker ที่ respawn
+    # ต้องไม่เกิดกลาง refresh) worker แต่ละตัวเริ่ม refresher ของตัวเองเมื่อเรียก get() ครั้งแรก
+
+    # TF-IDF index ของ recommender (โหลดจากไฟล์ หรือ build ถ้ายังไม่มี) ให้ worker ใช้ร่วมกันแบบ copy-on-write
+    from flask_app.food_index import food_index
+    try:
+        food_index.preload()
+    except Exception as e:
+        logger.warning("Food index preload failed: %s", e)
+    # matrix ผู้ใช้ x กีฬา ของ sport recommender (worker อัปเดตต่อแบบ incremental จาก watermark)
+    from flask_app.sport_matrix import sport_matrix
+    from flask_app.sport_ann import sport_ann
+    try:
+        sport_matrix.preload()
+    except Exception as e:
+        logger.warning("Sport matrix preload failed: %s", e)
+    # ANN index ของ sport KNN (โหลดจากไฟล์ที่ build offline; ผู้ใช้น้อยกว่า SPORT_ANN_MIN_USERS ไม่โหลด)
+    try:
+        sport_ann.get_for(sport_matrix.preload())
+    except Exception as e:
+        logger.warning("Sport ANN index preload failed: %s", e)
+    # neighbour list ของ item-item engine (?engine=item) จากตาราง SportNeighbors
+    from flask_app.sport_item import sport_item
+    try:
+        sport_item.preload()
+    except Exception as e:
+        logger.warning("Sport item model preload failed: %s", e)
+
+    # connection ของ master ใช้ร่วมกับ worker ไม่ได้ ปิดก่อน fork
+    close_all_pools()
+    # ย้าย object ที่มีอยู่ไป permanent generation เพื่อไม่ให้ GC ของ worker แตะ (เขียน) page ที่แชร์กันอยู่
+    gc.freeze()
+    if food_detect.INFERENCE_POOL_PROCESSES > 0:
+        logger.info("Master ready (cpus=%d, workers=%d, inference pool=%d x %d threads, model=%s)",
+                    CPUS, workers, food_detect.INFERENCE_POOL_PROCESSES, food_detect.INFERENCE_POOL_THREADS,
+                    food_detect.model_status['status'])
+    else:
+        logger.info("Master ready (cpus=%d, workers=%d, inference threads/worker=%d, model=%s)",
+                    CPUS, workers, INFERENCE_THREADS_PER_WORKER, food_detect.model_status['status'])
+
+
+def post_fork(server, worker):
+    from flask_app import food_detect
+
+    if food_detect.INFERENCE_POOL_PROCESSES > 0:
+        # forward pass อยู่ใน inference pool ของ master, worker ไม่ต้องตั้ง thread/warmup
+        # ถ้า master สร้าง pool ไม่สำเร็จ worker ไม่สร้าง pool ของตัวเอง (/api/ready ตอบ 503, ดู log ของ master)
+        return
+
+    if food_detect.FOOD_INFERENCE_BACKEND == "torch":
+        import torch
+        torch.set_num_threads(INFERENCE_THREADS_PER_WORKER)
+        if food_detect.is_model_ready() and SERVER_WORKER_WARMUP:
+            # เตรียม kernel สำหรับจำนวน thread ใหม่ก่อนรับ request
+            food_detect.warmup_backend(food_detect.inference_backend)
+    elif not os.getenv("ONNX_INTRA_OP_THREADS"):
+        food_detect.ONNX_INTRA_OP_THREADS = INFERENCE_THREADS_PER_WORKER
+
+    if not food_detect.is_model_ready():
+        food_detect.start_model_loading()
@@ -0,0 +1,10 @@
+# File: backend/tests/conftest.py
+# รัน: cd backend && python -m pytest -q   (ไม่ต้องมี MySQL / โมเดล ทดสอบเฉพาะ logic ที่ไม่แตะ DB)
+
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+sys.path.insert(0, str(BACKEND_DIR / "src"))
+sys.path.insert(0, str(BACKEND_DIR / "training" / "food_classification_model"))
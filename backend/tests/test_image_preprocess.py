@@ -0,0 +1,58 @@
+# File: backend/tests/test_image_preprocess.py
+# decode JPEG แบบลดขนาด (draft mode) ต้องให้ array ใกล้เคียง decode เต็มความละเอียด
+# ใช้ค่า tolerance เดียวกับ training/food_classification_model/check_decode_parity.py
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+
+from flask_app.image_preprocess import IMAGE_SIZE, InvalidImageError, decode_image, open_image
+from check_decode_parity import MAX_MEAN_PIXEL_DIFF, MAX_PIXEL_DIFF, decode_pair, pixel_diff
+
+
+def photo_like_jpeg(width=1600, height=1200, seed=0):
+    """ภาพสังเคราะห์ที่มีทั้ง gradient ขอบวัตถุและ noise (ใกล้เคียงภาพถ่ายจากมือถือมากกว่าสีพื้น)"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    x, y = xx / width, yy / height
+    image = np.stack([
+        128 + 100 * np.sin(6 * x + 2 * y),
+        128 + 100 * np.cos(4 * y - 3 * x),
+        128 + 80 * np.sin(9 * x * y),
+    ], axis=-1)
+    for _ in range(40):
+        cy, cx, r = rng.integers(0, height), rng.integers(0, width), rng.integers(20, 150)
+        image[(yy - cy) ** 2 + (xx - cx) ** 2 < r * r] = rng.integers(0, 255, 3)
+    image += rng.normal(0, 6, image.shape)
+    pil = Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(1.5))
+    buffer = io.BytesIO()
+    pil.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def jpeg_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("images") / "meal.jpg"
+    path.write_bytes(photo_like_jpeg())
+    return path
+
+
+def test_reduced_decode_within_parity_tolerance(jpeg_path):
+    full, reduced, _, _ = decode_pair(jpeg_path)
+    assert full.shape == reduced.shape == (3, IMAGE_SIZE, IMAGE_SIZE)
+    max_diff, mean_diff = pixel_diff(full, reduced)
+    assert max_diff <= MAX_PIXEL_DIFF
+    assert mean_diff <= MAX_MEAN_PIXEL_DIFF
+
+
+def test_reduced_decode_keeps_at_least_model_resolution(jpeg_path):
+    image = open_image(jpeg_path.read_bytes(), reduced=True)
+    assert min(image.size) >= IMAGE_SIZE
+    assert image.size[0] < 1600  # draft mode ย่อระหว่าง decode จริง
+
+
+def test_oversized_image_rejected_from_header(jpeg_path):
+    with pytest.raises(InvalidImageError):
+        decode_image(jpeg_path.read_bytes(), max_pixels=1000)
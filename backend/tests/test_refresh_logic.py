@@ -0,0 +1,178 @@
+# File: backend/tests/test_refresh_logic.py
+# logic แบบ incremental/แบ่งงวดที่ไม่แตะ DB ต้องได้ผลเดียวกับการคำนวณใหม่ทั้งหมด
+# (sport matrix, co-occurrence ของ item-item, แผนอ่าน CalorieRollups, food history cache, top_foods)
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from flask_app.calorie_rollups import PERIOD_DAY, PERIOD_MONTH, PERIOD_WEEK, period_end, plan_range
+from flask_app.food_history import _History
+from flask_app.food_index import FoodIndex
+from flask_app.sport_item import cooccurrence_counts, cooccurrence_increments
+from flask_app.sport_matrix import SportMatrix
+
+
+def random_pairs(seed, users=40, sports=12, count=150):
+    rng = np.random.default_rng(seed)
+    return sorted({(int(rng.integers(1, users)), int(rng.integers(1, sports))) for _ in range(count)})
+
+
+# ============================================
+# SportMatrix.apply
+# ============================================
+def as_dict(matrix):
+    """{(user_id, sport_id): ค่า} ไม่ขึ้นกับลำดับ row/คอลัมน์"""
+    coo = matrix.by_user.tocoo()
+    return {(matrix.user_ids[r], matrix.sport_ids[c]): v for r, c, v in zip(coo.row, coo.col, coo.data)}
+
+
+def test_sport_matrix_apply_matches_full_build():
+    old = random_pairs(1)
+    new = random_pairs(2, users=50, sports=15, count=60) + old[:10]  # รวมคู่ที่มีอยู่แล้วและผู้ใช้/กีฬาใหม่
+    names = {sport_id: f"sport {sport_id}" for sport_id in range(1, 15)}
+
+    incremental = SportMatrix.build(old, names, 10).apply(new + new[:5], names, 20)
+    full = SportMatrix.build(sorted(set(old) | set(new)), names, 20)
+
+    assert as_dict(incremental) == as_dict(full)
+    assert set(as_dict(incremental).values()) == {1.0}
+    for sport_id in full.sport_ids:
+        assert incremental.df[incremental.sport_col[sport_id]] == full.df[full.sport_col[sport_id]]
+    for user_id in full.user_ids:
+        assert incremental.norms[incremental.user_row[user_id]] == \
+            pytest.approx(full.norms[full.user_row[user_id]])
+    assert incremental.watermark == 20
+
+
+def test_sport_matrix_apply_keeps_previous_matrix():
+    base = SportMatrix.build([(1, 1), (2, 2)], {1: 'a', 2: 'b'}, 1)
+    updated = base.apply([(1, 2), (3, 1)], {}, 2)
+
+    assert as_dict(base) == {(1, 1): 1.0, (2, 2): 1.0}
+    assert as_dict(updated) == {(1, 1): 1.0, (1, 2): 1.0, (2, 2): 1.0, (3, 1): 1.0}
+    # ผู้ใช้เดิมอยู่ row เดิม ผู้ใช้ใหม่ต่อท้าย
+    assert updated.user_ids == [1, 2, 3]
+
+
+# ============================================
+# cooccurrence_increments
+# ============================================
+def test_cooccurrence_increments_match_full_count():
+    old = random_pairs(3)
+    new = random_pairs(4, users=50, count=80)
+
+    users = {user_id for user_id, _ in new}
+    increments = cooccurrence_increments([p for p in old if p[0] in users], new)
+
+    expected = cooccurrence_counts(old)
+    for key, n in increments.items():
+        expected[key] = expected.get(key, 0) + n
+    assert expected == cooccurrence_counts(sorted(set(old) | set(new)))
+
+
+def test_cooccurrence_increments_skip_known_pairs():
+    assert cooccurrence_increments([(1, 1), (1, 2)], [(1, 1), (1, 2)]) == {}
+    assert cooccurrence_increments([(1, 1)], [(1, 2), (1, 2)]) == {(2, 2): 1, (1, 2): 1}
+
+
+# ============================================
+# plan_range
+# ============================================
+def expand(plan):
+    days = []
+    for period, start in plan:
+        day = start
+        while day <= period_end(period, start):
+            days.append(day)
+            day += timedelta(days=1)
+    return days
+
+
+@pytest.mark.parametrize("start, end", [
+    (date(2024, 1, 1), date(2024, 1, 1)),
+    (date(2024, 1, 3), date(2024, 1, 9)),
+    (date(2024, 1, 15), date(2024, 3, 20)),
+    (date(2023, 12, 28), date(2024, 3, 31)),
+    (date(2024, 2, 1), date(2024, 2, 29)),
+])
+def test_plan_range_covers_each_day_once(start, end):
+    plan = plan_range(start, end)
+    days = expand(plan)
+
+    assert sorted(days) == [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    assert len(days) == len(set(days))
+
+
+def test_plan_range_uses_largest_periods():
+    plan = plan_range(date(2024, 1, 15), date(2024, 3, 20))
+
+    assert (PERIOD_MONTH, date(2024, 2, 1)) in plan
+    assert [p for p in plan if p[0] == PERIOD_MONTH] == [(PERIOD_MONTH, date(2024, 2, 1))]
+    assert any(period == PERIOD_WEEK for period, _ in plan)
+    assert len(plan) < 20
+    for period, start in plan:
+        if period == PERIOD_WEEK:
+            assert start.weekday() == 0
+    assert {p for p, _ in plan} <= {PERIOD_DAY, PERIOD_WEEK, PERIOD_MONTH}
+
+
+# ============================================
+# _History.merged
+# ============================================
+def test_history_merged_keeps_latest_day():
+    history = _History([1, 2, 3], [10, 20, 15], expires_at=5.0)
+    merged = history.merged([(2, 18), (3, 30), (4, 12), (4, 25)], expires_at=9.0)
+
+    assert dict(zip(merged.food_ids.tolist(), merged.days.tolist())) == {1: 10, 2: 20, 3: 30, 4: 25}
+    assert merged.food_ids.tolist() == [3, 4, 2, 1]
+    assert merged.expires_at == 9.0
+    # ชุดเดิมไม่ถูกแก้
+    assert history.food_ids.tolist() == [2, 3, 1]
+
+
+def test_history_orders_same_day_by_food_id():
+    merged = _History([], [], 0).merged([(7, 3), (5, 3), (6, 4)], 0)
+    assert merged.food_ids.tolist() == [6, 5, 7]
+
+
+# ============================================
+# FoodIndex.top_foods
+# ============================================
+@pytest.fixture(scope="module")
+def food_index():
+    foods = [{'food_id': i, 'food_name': name, 'calories': calories}
+             for i, (name, calories) in enumerate([
+                 ("ข้าวผัดกุ้ง", 500), ("ข้าวผัดหมู", 550), ("ต้มยำกุ้ง", 200), ("ส้มตำ", 120),
+                 ("ผัดไทย", None), ("แกงเขียวหวาน", 400),
+             ], start=1)]
+    return FoodIndex.build(('v', len(foods)), foods)
+
+
+def test_top_foods_orders_by_score(food_index):
+    scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3, 0.2], dtype=np.float32)
+
+    assert [row for row, _ in food_index.top_foods(scores, 3)] == [1, 3, 2]
+    assert [row for row, _ in food_index.top_foods(scores, 100)] == [1, 3, 2, 4, 5, 0]
+    assert food_index.top_foods(scores, 0) == []
+
+
+def test_top_foods_excludes_rows_and_calories(food_index):
+    scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3, 0.2], dtype=np.float32)
+
+    result = food_index.top_foods(scores, 10, exclude_rows=[1, 3], max_calories=450)
+    # แถว 0 (500 kcal) เกิน, แถว 4 ไม่มีค่า calories จึงถูกตัด
+    assert result == [(2, pytest.approx(0.5)), (5, pytest.approx(0.2))]
+    # input ไม่ถูกแก้
+    assert scores[1] == np.float32(0.9)
+
+
+def test_top_foods_matches_batch(food_index):
+    rng = np.random.default_rng(0)
+    scores = rng.random((4, len(food_index.foods))).astype(np.float32)
+    ceilings = [100, 300, 450, 1000]
+
+    batch = food_index.batch_top_foods(scores.copy(), 3, max_calories=ceilings)
+    for user in range(4):
+        assert batch[user] == food_index.top_foods(scores[user], 3, max_calories=ceilings[user])
@@ -0,0 +1,136 @@
+# ------------------------------------------------------------
+# Check reduced-resolution JPEG decode (draft mode) against full decode
+# ------------------------------------------------------------
+# ฝั่ง server decode JPEG แบบลดขนาด (FOOD_IMAGE_REDUCED_DECODE=true) เพื่อลดเวลา/หน่วยความจำ
+# สคริปต์นี้เทียบผลกับการ decode เต็มความละเอียดบนชุด test:
+# - max |diff| ของ array หลัง preprocess
+# - top-1 agreement และ max |diff| ของ probability จากโมเดลจริง
+# ถ้า |diff| ของ array เกิน --max-pixel-diff / --max-mean-pixel-diff
+# หรือ top-1 agreement ต่ำกว่า --min-agreement จะ exit code = 1
+# (ส่วนเทียบ array รันอัตโนมัติใน backend/tests/test_image_preprocess.py ด้วย)
+#
+# ตัวอย่าง:
+#   python check_decode_parity.py --images ../../images/test \
+#       --model-path ../../models/food_classification_model/food_model.pth
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_SRC = Path(__file__).resolve().parents[2] / "src"
+sys.path.insert(0, str(BACKEND_SRC))
+
+from flask_app.image_preprocess import InvalidImageError, decode_image  # noqa: E402
+from flask_app.inference_backends import TorchBackend, OnnxRuntimeBackend  # noqa: E402
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg'}
+
+# |diff| ที่ยอมรับได้ของ array หลัง preprocess (หน่วยหลัง Normalize ImageNet, 0.1 ~ 6/255 ของ pixel)
+MAX_PIXEL_DIFF = 0.25
+MAX_MEAN_PIXEL_DIFF = 0.02
+
+
+def find_images(root, limit=None):
+    paths = sorted(p for p in Path(root).rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+    return paths[:limit] if limit else paths
+
+
+def decode_pair(path):
+    """คืน (full, reduced, เวลา decode full, เวลา decode reduced)"""
+    content = path.read_bytes()
+    started = time.perf_counter()
+    full = decode_image(content, reduced=False)
+    full_time = time.perf_counter() - started
+    started = time.perf_counter()
+    reduced = decode_image(content, reduced=True)
+    reduced_time = time.perf_counter() - started
+    return full, reduced, full_time, reduced_time
+
+
+def pixel_diff(full, reduced):
+    """คืน (max |diff|, mean |diff|) ของ array ที่ preprocess แล้ว"""
+    diff = np.abs(full - reduced)
+    return float(diff.max()), float(diff.mean())
+
+
+def load_backend(args):
+    if args.backend == 'onnx':
+        return OnnxRuntimeBackend.load(Path(args.onnx_path))
+    return TorchBackend.load(Path(args.model_path), None, args.num_classes)
+
+
+def main():
+    import test_model  # ต้องใช้ torch/sklearn เฉพาะตอนรันเป็นสคริปต์
+
+    parser = argparse.ArgumentParser(description="Compare reduced JPEG decode with full decode")
+    parser.add_argument("--images", default=test_model.TEST_DATA_PATH)
+    parser.add_argument("--model-path", default=test_model.MODEL_PATH)
+    parser.add_argument("--onnx-path", default="../../models/food_classification_model/food_model.onnx")
+    parser.add_argument("--backend", choices=['torch', 'onnx'], default='torch')
+    parser.add_argument("--num-classes", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    parser.add_argument("--max-pixel-diff", type=float, default=MAX_PIXEL_DIFF)
+    parser.add_argument("--max-mean-pixel-diff", type=float, default=MAX_MEAN_PIXEL_DIFF)
+    args = parser.parse_args()
+
+    paths = find_images(args.images, args.limit)
+    if not paths:
+        print(f"❌ No JPEG images found in {args.images}")
+        return 1
+
+    full_arrays, reduced_arrays = [], []
+    full_time = reduced_time = 0.0
+    max_pixel_diff = 0.0
+    mean_pixel_diff = 0.0
+    for path in paths:
+        try:
+            full, reduced, t_full, t_reduced = decode_pair(path)
+        except InvalidImageError as e:
+            print(f"  skip {path}: {e}")
+            continue
+        full_arrays.append(full)
+        reduced_arrays.append(reduced)
+        full_time += t_full
+        reduced_time += t_reduced
+        max_diff, mean_diff = pixel_diff(full, reduced)
+        max_pixel_diff = max(max_pixel_diff, max_diff)
+        mean_pixel_diff = max(mean_pixel_diff, mean_diff)
+
+    count = len(full_arrays)
+    print(f"Images: {count}")
+    print(f"Decode time (avg): full {full_time / count * 1000:.2f} ms, "
+          f"reduced {reduced_time / count * 1000:.2f} ms "
+          f"({full_time / max(reduced_time, 1e-9):.2f}x)")
+    print(f"Max |diff| after preprocess: {max_pixel_diff:.4f} (limit {args.max_pixel_diff}), "
+          f"worst mean |diff|: {mean_pixel_diff:.4f} (limit {args.max_mean_pixel_diff})")
+    if max_pixel_diff > args.max_pixel_diff or mean_pixel_diff > args.max_mean_pixel_diff:
+        print("❌ Reduced decode differs too much - keep FOOD_IMAGE_REDUCED_DECODE=false")
+        return 1
+
+    backend = load_backend(args)
+    agree = 0
+    max_prob_diff = 0.0
+    for start in range(0, count, args.batch_size):
+        full_probs = backend.predict_proba(np.stack(full_arrays[start:start + args.batch_size]))
+        reduced_probs = backend.predict_proba(np.stack(reduced_arrays[start:start + args.batch_size]))
+        agree += int((full_probs.argmax(axis=1) == reduced_probs.argmax(axis=1)).sum())
+        max_prob_diff = max(max_prob_diff, float(np.abs(full_probs - reduced_probs).max()))
+
+    agreement = agree / count
+    print(f"Top-1 agreement: {agreement * 100:.2f}% ({agree}/{count})")
+    print(f"Max |diff| of probabilities: {max_prob_diff:.4f}")
+
+    if agreement < args.min_agreement:
+        print(f"❌ Agreement below {args.min_agreement * 100:.2f}% - keep FOOD_IMAGE_REDUCED_DECODE=false")
+        return 1
+    print("✅ Reduced decode matches full decode")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# ------------------------------------------------------------
+# Export food_model.pth -> ONNX (dynamic batch) + numerical parity check
+# ------------------------------------------------------------
+# ไฟล์ food_model_web.onnx จาก train_efficientnet.py เดิม fix batch = 1
+# สคริปต์นี้ export ใหม่ให้ batch axis เป็น dynamic เพื่อใช้กับ
+# FOOD_INFERENCE_BACKEND=onnx (micro-batching ฝั่ง server)
+# แล้วเทียบ logits ของ ONNX Runtime กับ PyTorch ที่หลาย batch size
+# ถ้าต่างกันเกิน --atol หรือ argmax ไม่ตรงกัน จะลบไฟล์ที่ export และ exit code = 1
+#
+# ตัวอย่าง:
+#   python export_onnx.py --model-path ../../models/food_classification_model/food_model.pth
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import torch
+
+import test_model
+
+DEFAULT_OUTPUT = "../../models/food_classification_model/food_model.onnx"
+
+
+def export_dynamic_batch(model, output_path, opset=13):
+    """Export ONNX ที่ batch dimension เป็น dynamic"""
+    dummy_input = torch.randn(1, 3, 224, 224)
+    torch.onnx.export(
+        model,
+        dummy_input,
+        output_path,
+        export_params=True,
+        opset_version=opset,
+        do_constant_folding=True,
+        input_names=['input'],
+        output_names=['output'],
+        dynamic_axes={'input': {0: 'batch'}, 'output': {0: 'batch'}}
+    )
+
+
+def check_parity(model, onnx_path, batch_sizes=(1, 4, 8), atol=1e-3, seed=0):
+    """เทียบ logits ระหว่าง PyTorch (.pth) กับ ONNX Runtime คืน True ถ้าผ่านทุก batch size"""
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+    generator = torch.Generator().manual_seed(seed)
+
+    passed = True
+    for batch_size in batch_sizes:
+        inputs = torch.randn(batch_size, 3, 224, 224, generator=generator)
+        with torch.no_grad():
+            expected = model(inputs).numpy()
+        actual = session.run(None, {input_name: inputs.numpy()})[0]
+
+        max_diff = float(np.abs(expected - actual).max())
+        argmax_match = bool((expected.argmax(axis=1) == actual.argmax(axis=1)).all())
+        ok = max_diff <= atol and argmax_match
+        passed = passed and ok
+        print(f"{'✓' if ok else '✗'} batch={batch_size}: max |diff| = {max_diff:.2e}, "
+              f"argmax match = {argmax_match}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export food model to ONNX with dynamic batch axis")
+    parser.add_argument("--model-path", default=test_model.MODEL_PATH)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--atol", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    test_model.MODEL_PATH = args.model_path
+    model, _ = test_model.load_model()
+    model = model.cpu().eval()
+
+    print("Exporting ONNX...")
+    export_dynamic_batch(model, args.output, args.opset)
+    print(f"✓ ONNX model saved: {args.output}")
+
+    print("Checking numerical parity against PyTorch...")
+    if not check_parity(model, args.output, atol=args.atol):
+        os.remove(args.output)
+        if os.path.exists(args.output + ".data"):
+            os.remove(args.output + ".data")  # external weights (โมเดล > 2GB หรือ exporter รุ่นใหม่)
+        print("❌ Parity check failed - ONNX model removed")
+        return 1
+
+    print("✅ Parity check passed - enable with FOOD_INFERENCE_BACKEND=onnx")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
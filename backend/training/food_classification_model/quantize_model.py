@@ -0,0 +1,148 @@
+# ------------------------------------------------------------
+# INT8 post-training quantization + accuracy/latency gate
+# ------------------------------------------------------------
+# สร้างโมเดล INT8 (static PTQ, calibrate ด้วยภาพตัวอย่างจากโฟลเดอร์ train แบบ FX graph mode)
+# จาก food_model.pth แล้วเทียบกับ fp32 บน test set
+# ไม่บันทึก artifact และ exit code = 1 ถ้า
+# - accuracy ลดลงเกิน --max-accuracy-drop หรือ
+# - เร็วกว่า fp32 ไม่ถึง --min-speedup เท่า (INT8 ไม่ได้เร็วกว่าเสมอไป ขึ้นกับ CPU / oneDNN)
+#
+# ไม่มีโหมด dynamic: EfficientNet-B0 มี nn.Linear แค่ classifier ตัวเดียว
+# quantize_dynamic จึงไม่ลด latency หรือหน่วยความจำ
+#
+# ตัวอย่าง:
+#   python quantize_model.py --calib-dir ../images/train --test-dir ../images/test --min-speedup 1.1
+#
+# ฝั่ง server เปิดใช้ด้วย FOOD_MODEL_QUANTIZATION=static (โหลด food_model_int8.pt)
+
+import argparse
+import copy
+import random
+import sys
+import time
+
+import torch
+from torch.utils.data import DataLoader, Subset
+from torchvision import transforms, datasets
+
+import test_model
+
+DEFAULT_OUTPUT = "../../models/food_classification_model/food_model_int8.pt"
+
+
+def build_calibration_loader(calib_dir, samples_per_class=10, batch_size=32, seed=0):
+    """สุ่มภาพจากแต่ละคลาสในโฟลเดอร์ train เพื่อใช้ calibrate ค่า activation range"""
+    calib_transform = transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                             std=[0.229, 0.224, 0.225])
+    ])
+    dataset = datasets.ImageFolder(root=calib_dir, transform=calib_transform)
+
+    by_class = {}
+    for i, (_, label) in enumerate(dataset.samples):
+        by_class.setdefault(label, []).append(i)
+
+    rng = random.Random(seed)
+    indices = []
+    for label_indices in by_class.values():
+        rng.shuffle(label_indices)
+        indices.extend(label_indices[:samples_per_class])
+
+    print(f"Calibration set: {len(indices)} images from {len(by_class)} classes")
+    return DataLoader(Subset(dataset, indices), batch_size=batch_size, shuffle=False)
+
+
+def quantize_static(model, calib_loader, backend="x86"):
+    """Static PTQ (FX graph mode): prepare -> calibrate -> convert"""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    torch.backends.quantized.engine = backend
+    model = copy.deepcopy(model).cpu().eval()  # ไม่แก้ fp32 model เดิมที่ใช้วัด baseline
+    example_inputs = (torch.randn(1, 3, 224, 224),)
+    prepared = prepare_fx(model, get_default_qconfig_mapping(backend), example_inputs)
+
+    print("Calibrating...")
+    with torch.no_grad():
+        for images, _ in calib_loader:
+            prepared(images)
+
+    return convert_fx(prepared)
+
+
+def measure_latency(model, batch_size=1, iterations=30, warmup=5):
+    """เวลาเฉลี่ยต่อ forward pass (ms) บน CPU"""
+    inputs = torch.randn(batch_size, 3, 224, 224)
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(inputs)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            model(inputs)
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize food model to INT8 and verify accuracy")
+    parser.add_argument("--model-path", default=test_model.MODEL_PATH)
+    parser.add_argument("--test-dir", default=test_model.TEST_DATA_PATH)
+    parser.add_argument("--calib-dir", default="../images/train")
+    parser.add_argument("--calib-samples-per-class", type=int, default=10)
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01,
+                        help="top-1 accuracy ที่ยอมให้ลดลงได้ (absolute, 0.01 = 1%%)")
+    parser.add_argument("--min-speedup", type=float, default=1.0,
+                        help="fp32 latency / int8 latency ขั้นต่ำ (1.0 = ต้องไม่ช้ากว่า fp32, 0 = ไม่ตรวจ)")
+    parser.add_argument("--latency-batch-size", type=int, default=1)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    test_model.MODEL_PATH = args.model_path
+    test_model.TEST_DATA_PATH = args.test_dir
+    cpu = torch.device('cpu')
+
+    # 1. fp32 baseline
+    print("Loading fp32 model...")
+    fp32_model, _ = test_model.load_model()
+    fp32_model = fp32_model.to(cpu).eval()
+    y_true, y_pred, _ = test_model.evaluate_model(fp32_model, cpu)
+    fp32_acc = float((y_true == y_pred).mean())
+
+    # 2. quantize
+    calib_loader = build_calibration_loader(args.calib_dir, args.calib_samples_per_class)
+    int8_model = quantize_static(fp32_model, calib_loader)
+
+    y_true, y_pred, _ = test_model.evaluate_model(int8_model, cpu)
+    int8_acc = float((y_true == y_pred).mean())
+
+    # 3. latency
+    fp32_ms = measure_latency(fp32_model, args.latency_batch_size)
+    int8_ms = measure_latency(int8_model, args.latency_batch_size)
+
+    accuracy_delta = int8_acc - fp32_acc
+    speedup = fp32_ms / int8_ms
+    print("\n📊 Quantization report")
+    print(f"fp32 top-1:       {fp32_acc*100:.2f}%")
+    print(f"int8 top-1:       {int8_acc*100:.2f}%")
+    print(f"Accuracy delta:   {accuracy_delta*100:+.2f}% (max drop {args.max_accuracy_drop*100:.2f}%)")
+    print(f"Latency (bs={args.latency_batch_size}): fp32 {fp32_ms:.1f} ms, int8 {int8_ms:.1f} ms, "
+          f"speedup x{speedup:.2f} (min x{args.min_speedup:.2f})")
+
+    if -accuracy_delta > args.max_accuracy_drop:
+        print("❌ Accuracy regression exceeds threshold - quantized artifact rejected")
+        return 1
+    if speedup < args.min_speedup:
+        print("❌ INT8 model is not faster than required - quantized artifact rejected")
+        return 1
+
+    example = torch.randn(1, 3, 224, 224)
+    with torch.no_grad():
+        scripted = torch.jit.trace(int8_model, example)
+    scripted.save(args.output)
+    print(f"✅ Quantized model saved: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -109,10 +109,16 @@ def prepare_test_data():
     
     return test_loader, class_names
 
-def evaluate_model():
-    """Run evaluation and get predictions"""
-    print("Loading model...")
-    model, device = load_model()
+def evaluate_model(model=None, device=None):
+    """Run evaluation and get predictions
+
+    ส่ง model/device เข้ามาเองได้ (เช่นโมเดล INT8 จาก quantize_model.py)
+    ถ้าไม่ส่งจะโหลดจาก MODEL_PATH ตามเดิม
+    """
+    if model is None:
+        print("Loading model...")
+        model, device = load_model()
+    device = device or torch.device('cpu')
     
     print("Loading test data...")
     test_loader, class_names = prepare_test_data()
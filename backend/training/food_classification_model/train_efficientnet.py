@@ -225,7 +225,8 @@ def train_model():
             opset_version=11,
             do_constant_folding=True,
             input_names=['input'],
-            output_names=['output']
+            output_names=['output'],
+            dynamic_axes={'input': {0: 'batch'}, 'output': {0: 'batch'}}  # รองรับ batch หลายภาพ
         )
         print("✓ Web model saved: food_model_web.onnx")
     except Exception as e: